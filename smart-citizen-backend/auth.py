@@ -1,10 +1,13 @@
 import os
+import asyncio
 import jwt
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from utils.user_cache import get_user
 
 load_dotenv()
 
@@ -12,12 +15,16 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_secret")
 ALGORITHM = "HS256"
 
+# Password hashing settings: bcrypt work factor and how many hashes may run at once
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_MAX_CONCURRENCY = int(os.getenv("BCRYPT_MAX_CONCURRENCY", str(os.cpu_count() or 2)))
+
 # This tells FastAPI that the token is sent in the "Authorization: Bearer" header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 # 1. Function to Hash a Password
 def get_password_hash(password: str) -> str:
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -25,6 +32,47 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+# 2b. Does a stored hash use a different work factor than BCRYPT_ROUNDS?
+def password_needs_rehash(hashed_password: str) -> bool:
+    try:
+        # bcrypt format: $2b$<cost>$<salt+hash>
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+# --- Hashing executor ---
+# bcrypt takes ~250ms per call and releases the GIL, so async handlers run it on a
+# dedicated bounded pool instead of blocking the event loop.
+_hash_executor = ThreadPoolExecutor(max_workers=BCRYPT_MAX_CONCURRENCY, thread_name_prefix="bcrypt")
+_hash_metrics = {"in_flight": 0, "peak_in_flight": 0, "completed": 0}
+
+async def _run_in_hash_pool(func, *args):
+    _hash_metrics["in_flight"] += 1
+    _hash_metrics["peak_in_flight"] = max(_hash_metrics["peak_in_flight"], _hash_metrics["in_flight"])
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_metrics["in_flight"] -= 1
+        _hash_metrics["completed"] += 1
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_pool(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+def hashing_metrics() -> dict:
+    """Snapshot of the hashing pool; queue_depth = calls waiting for a free worker"""
+    in_flight = _hash_metrics["in_flight"]
+    return {
+        "workers": BCRYPT_MAX_CONCURRENCY,
+        "rounds": BCRYPT_ROUNDS,
+        "in_flight": in_flight,
+        "queue_depth": max(0, in_flight - BCRYPT_MAX_CONCURRENCY),
+        "peak_in_flight": _hash_metrics["peak_in_flight"],
+        "completed": _hash_metrics["completed"],
+    }
+
 # 3. Function to Create a Login Token (JWT)
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -57,4 +105,15 @@ def get_current_user_with_role(token: str = Depends(oauth2_scheme)):
             raise HTTPException(status_code=401, detail="Invalid token credentials")
         return {"nic": nic, "role": role}
     except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+
+
+# 6. Dependency: Full principal (NIC, role, hierarchy, display name)
+# Loaded once per request (FastAPI caches dependencies) and served from the user cache.
+async def get_current_principal(claims: dict = Depends(get_current_user_with_role)):
+    user = await get_user(claims["nic"])
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    user["nic"] = claims["nic"]
+    user["role"] = claims["role"]
+    return user
@@ -0,0 +1,73 @@
+"""
+Chatbot intent matching latency as the number of intents grows: the old linear
+substring chain vs. the compiled token index in utils/intents.py.
+
+    python benchmark_chat.py [messages]
+"""
+
+import random
+import sys
+import time
+from utils.intents import DEFAULT_INTENTS, IntentMatcher
+
+WORDS = ["permit", "renewal", "licence", "registration", "copy", "extract", "certificate", "report", "card", "approval"]
+
+
+def synthetic_intents(count):
+    rng = random.Random(7)
+    intents = list(DEFAULT_INTENTS)
+    for i in range(count - len(intents)):
+        name = f"service{i:05d} {rng.choice(WORDS)}"
+        intents.append({"name": name, "priority": 1, "keywords": [name], "response": f"About {name}"})
+    return intents
+
+
+def legacy_match(intents, message):
+    # The if/elif chain, generalized: every intent's keywords checked in turn with `in`
+    text = message.lower()
+    for intent in intents:
+        for keyword in intent["keywords"]:
+            phrases = [keyword] if isinstance(keyword, str) else keyword
+            if all(phrase in text for phrase in phrases):
+                return intent
+    return None
+
+
+def messages(intents, count):
+    rng = random.Random(11)
+    samples = [
+        "Hi, how do I renew my passport?",
+        "What documents do I need for this NIC application?",
+        "Which office issues a birth certificate copy",
+        "Can I pay the fee with LankaQR?",
+        "I want to ask something completely unrelated to any service at all",
+    ]
+    out = []
+    for i in range(count):
+        if i % 2:
+            keyword = rng.choice(intents)["keywords"][0]
+            phrase = keyword if isinstance(keyword, str) else " ".join(keyword)
+            out.append(f"How long does a {phrase} take to process?")
+        else:
+            out.append(rng.choice(samples))
+    return out
+
+
+def timed(match, batch):
+    start = time.perf_counter()
+    for message in batch:
+        match(message)
+    return (time.perf_counter() - start) / len(batch) * 1e6
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"⏱️  Classifying {count} messages per intent-set size...")
+    print(f"{'intents':>8} {'legacy µs/msg':>14} {'compiled µs/msg':>16}")
+    for size in (10, 100, 500, 1000, 5000):
+        intents = synthetic_intents(size)
+        batch = messages(intents, count)
+        matcher = IntentMatcher(intents)
+        legacy = timed(lambda message: legacy_match(intents, message), batch)
+        compiled = timed(matcher.match, batch)
+        print(f"{size:>8} {legacy:>14.1f} {compiled:>16.1f}")
@@ -0,0 +1,85 @@
+"""
+Streaming export memory check: pushes N synthetic applications through the /export
+pipeline (shape -> encode -> chunk) and reports throughput and peak RSS as it goes.
+Peak RSS should level off after the first batches whatever N is.
+
+    python benchmark_export.py [rows] [csv|ndjson] [batch_size]
+"""
+
+import asyncio
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from models import ApplicationExportOut
+from utils.export import stream_export
+
+
+class SyntheticCursor:
+    """Stands in for a Motor cursor: generates documents instead of holding them"""
+
+    def __init__(self, count):
+        self.count = count
+        self.start = datetime(2025, 1, 1)
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def close(self):
+        pass
+
+    def __aiter__(self):
+        return self._documents()
+
+    async def _documents(self):
+        for i in range(self.count):
+            yield {
+                "_id": ObjectId(), "service_type": "Birth Certificate", "applicant_nic": f"{199000000000 + i}",
+                "status": "Completed", "current_approval_stage": "completed",
+                "created_at": self.start + timedelta(seconds=i), "assigned_gs": "888888888V",
+                "assigned_ds": "777777777V", "province": "Western", "district": "Colombo",
+                "ds_division": "Colombo DS", "gs_section": "Wellawatta GS", "certificate_status": "ready",
+            }
+
+
+class SyntheticCollection:
+    def __init__(self, count):
+        self.count = count
+
+    def find(self, query, projection=None):
+        return SyntheticCursor(self.count)
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def main(count, fmt, batch_size):
+    response = stream_export(
+        SyntheticCollection(count), {}, [], ApplicationExportOut, None,
+        {"format": fmt, "batch_size": batch_size}, "benchmark",
+    )
+    checkpoints = {count * step // 10 for step in range(1, 11)}
+    written = rows = 0
+    start = time.perf_counter()
+    async for chunk in response.body_iterator:
+        written += len(chunk)
+        before, rows = rows, rows + chunk.count(b"\n")
+        for mark in sorted(m for m in checkpoints if before < m <= rows):
+            print(f"{mark:>10} rows   {written / 2**20:8.1f} MB written   peak RSS {peak_rss_mb():7.1f} MB")
+    elapsed = time.perf_counter() - start
+    print(f"✅ {count} rows in {elapsed:.1f}s ({count / elapsed:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    fmt = sys.argv[2] if len(sys.argv) > 2 else "csv"
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    print(f"⏱️  Exporting {count} rows as {fmt}, {batch_size} per batch...")
+    asyncio.run(main(count, fmt, batch_size))
@@ -0,0 +1,88 @@
+"""
+FAQ retrieval latency over a synthetic corpus: build time, index size and
+per-query latency of the NumPy sparse scoring in utils/faq.py.
+
+    python benchmark_faq.py [documents] [queries]
+"""
+
+import random
+import sys
+import time
+from utils.faq import FAQIndex, FAQ_ENTRIES
+
+WORDS = (
+    "birth marriage death certificate copy extract passport visa renewal licence vehicle revenue land deed "
+    "survey police clearance report character residency nic identity card replacement lost damaged payment "
+    "fee refund office division secretariat grama niladhari appointment documents upload status track approval "
+    "rejected delay urgent collect post courier translation english sinhala tamil pension tax business registration"
+).split()
+
+
+def vocabulary(rng, size=20000):
+    # Domain words plus pseudo-words, drawn with Zipf-like frequencies like real text
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = WORDS + ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+    cumulative, total = [], 0.0
+    for rank in range(len(words)):
+        total += 1 / (rank + 1)
+        cumulative.append(total)
+    return words, cumulative
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def synthetic_corpus(index, count, rng, words, weights):
+    for entry in FAQ_ENTRIES:
+        index.put(entry["id"], entry["question"], entry["answer"], f"{entry['question']} {entry['answer']}")
+    for i in range(count - len(FAQ_ENTRIES)):
+        title = " ".join(rng.choices(words, cum_weights=weights, k=4)).title()
+        body = " ".join(rng.choices(words, cum_weights=weights, k=rng.randint(20, 60)))
+        index.put(f"doc:{i}", title, body, f"{title} {body}")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = random.Random(3)
+    index = FAQIndex()
+
+    start = time.perf_counter()
+    words, weights = vocabulary(rng)
+    synthetic_corpus(index, count, rng, words, weights)
+    featurized = time.perf_counter()
+    index.assemble()
+    assembled = time.perf_counter()
+    print(f"⏱️  {count} documents: featurized in {featurized - start:.2f}s, matrix assembled in {assembled - featurized:.2f}s, "
+          f"{index.nbytes() / 2**20:.1f} MB of arrays")
+
+    samples = [entry["question"] for entry in FAQ_ENTRIES] + [
+        " ".join(rng.choices(words, cum_weights=weights, k=rng.randint(3, 12))) for _ in range(200)
+    ]
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        index.search(samples[i % len(samples)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"p50 {latencies[len(latencies) // 2]:.2f} ms   p99 {latencies[int(len(latencies) * 0.99)]:.2f} ms   "
+          f"max {latencies[-1]:.2f} ms over {queries} queries")
+
+    # The max above includes whatever else the machine was doing (preemption, other processes).
+    # Best of 5 runs per distinct query is the search's own cost; the interpreter's jitter is
+    # what the same loop shows for a fixed trivial workload.
+    compute = sorted(
+        min(timed(index.search, sample) for _ in range(5)) for sample in samples
+    )
+    jitter = sorted(timed(sum, range(3000)) for _ in range(queries))
+    print(f"search cost (best of 5): median {compute[len(compute) // 2]:.2f} ms, slowest query {compute[-1]:.2f} ms   "
+          f"| machine jitter on a ~0.05 ms no-op: max {jitter[-1]:.2f} ms")
+
+    # Incremental update: one document re-featurized and scored on the side, no re-assembly
+    start = time.perf_counter()
+    index.put("doc:0", "Passport Renewal", "Passport renewal takes 14 days", "Passport renewal takes 14 days")
+    top = index.search("how long does passport renewal take")[0]
+    print(f"✅ One-document update + next query: {(time.perf_counter() - start) * 1000:.1f} ms (top hit: {top['id']})")
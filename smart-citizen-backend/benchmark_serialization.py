@@ -0,0 +1,77 @@
+"""
+Serialization time of a 10k-item /api/ds/queue page: the old path (str() every _id,
+then jsonable_encoder + json.dumps) vs. orjson with native ObjectId/datetime encoding.
+
+    python benchmark_serialization.py [items] [rounds]
+"""
+
+import gzip
+import sys
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from utils import serialization
+from utils.serialization import FastJSONResponse, MsgPackResponse
+
+
+def queue_page(count):
+    # Shaped like the applications the DS queue returns
+    start = datetime(2025, 1, 1, 9, 0)
+    items = [{
+        "_id": ObjectId(),
+        "service_type": "Birth Certificate",
+        "applicant_nic": f"{199000000000 + i}",
+        "details": {"reason": "New registration", "address": f"{i} Galle Road, Colombo"},
+        "status": "Pending",
+        "created_at": start + timedelta(minutes=i),
+        "approval_level": "gs_ds",
+        "current_approval_stage": "ds",
+        "approval_chain": [{"level": "gs", "nic": "888888888V", "action": "Approved",
+                            "timestamp": start + timedelta(minutes=i, hours=1), "comments": ""}],
+        "assigned_gs": "888888888V",
+        "assigned_ds": "777777777V",
+        "province": "Western", "district": "Colombo", "ds_division": "Colombo DS", "gs_section": "Wellawatta GS",
+    } for i in range(count)]
+    return {"items": items, "next_cursor": None}
+
+
+def legacy(page):
+    # The pre-orjson route: copy-convert each _id, then FastAPI's encoder walk and stdlib json
+    items = [{**document, "_id": str(document["_id"])} for document in page["items"]]
+    return JSONResponse(jsonable_encoder({"items": items, "next_cursor": page["next_cursor"]})).body
+
+
+def fast(page):
+    return FastJSONResponse(page).body
+
+
+def msgpack_body(page):
+    return MsgPackResponse(page).body
+
+
+def run(name, serialize, page, rounds):
+    serialize(page)  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        body = serialize(page)
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"{name:<10} {elapsed * 1000:8.2f} ms/response   {len(body) / 1024:7.1f} KB   gzip {len(gzip.compress(body, 6)) / 1024:6.1f} KB")
+    return elapsed
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    page = queue_page(count)
+    print(f"⏱️  Serializing a {count}-item queue page, {rounds} rounds per strategy...")
+
+    baseline = run("legacy", legacy, page, rounds)
+    orjson_time = run("orjson", fast, page, rounds)
+    if serialization.msgpack is not None:
+        run("msgpack", msgpack_body, page, rounds)
+    else:
+        print("msgpack    (not installed)")
+
+    print(f"✅ Speedup: {baseline / orjson_time:.2f}x")
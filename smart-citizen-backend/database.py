@@ -19,5 +19,10 @@ service_collection = database.get_collection("services")
 complaints_collection = database.get_collection("complaints")
 audit_log_collection = database.get_collection("audit_logs")
 notifications_collection = database.get_collection("notifications")
+counters_collection = database.get_collection("counters")
+jobs_collection = database.get_collection("jobs")
+revenue_collection = database.get_collection("revenue_rollups")
+rollup_collection = database.get_collection("period_rollups")
+life_event_rule_collection = database.get_collection("life_event_rules")
 
 print("✅ MongoDB Connection Settings Loaded.")
\ No newline at end of file
@@ -0,0 +1,241 @@
+import asyncio
+import sys
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from database import database
+
+# ==========================================
+# INDEX REGISTRY
+# ==========================================
+# Every index the routes rely on, per collection. Ensured on startup,
+# so adding a new hot query means adding its index here. Before a unique
+# index is built, existing data is checked for duplicates: startup stops with
+# the offending values instead of a bare DuplicateKeyError.
+
+INDEXES = {
+    "users": [
+        # Login, get_current_user lookups and duplicate-NIC detection
+        IndexModel([("nic", ASCENDING)], name="nic_unique", unique=True),
+        # Villager / officer listings paged by _id
+        IndexModel([("role", ASCENDING), ("_id", ASCENDING)], name="role_id"),
+    ],
+    "applications": [
+        # Wallet / documents / permits / notifications for one citizen
+        IndexModel(
+            [("applicant_nic", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)],
+            name="applicant_status_created",
+        ),
+        # my-apps pages, keyset on (created_at, _id)
+        IndexModel(
+            [("applicant_nic", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="applicant_created_id",
+        ),
+        # GS / DS queues and certificate registers, keyset on (created_at, _id)
+        IndexModel(
+            [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="status_created_id",
+        ),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        # DS performance metrics, grouped per GS officer
+        IndexModel([("assigned_gs", ASCENDING), ("status", ASCENDING)], name="assigned_gs_status"),
+    ],
+    "audit_logs": [
+        # Audit search, keyset on (timestamp, _id): unfiltered, or by actor / application / action
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_id"),
+        IndexModel([("user_nic", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="user_timestamp_id"),
+        IndexModel([("application_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="application_timestamp_id"),
+        IndexModel([("action", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="action_timestamp_id"),
+    ],
+    "land_disputes": [
+        # GS dashboard: a section's disputes counted by status
+        IndexModel([("gs_section", ASCENDING), ("status", ASCENDING)], name="gs_section_status"),
+    ],
+    "notifications": [
+        IndexModel([("user_nic", ASCENDING), ("created_date", DESCENDING)], name="user_created"),
+    ],
+    "jobs": [
+        # Certificate workers claim the oldest queued job
+        IndexModel([("type", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING)], name="type_status_created"),
+        # One job per application: re-enqueueing re-queues it
+        IndexModel([("application_id", ASCENDING)], name="application_id_unique", unique=True),
+    ],
+    "counters": [
+        # Admin drill-down: children of a hierarchy node
+        IndexModel([("parent", ASCENDING), ("name", ASCENDING)], name="parent_name"),
+    ],
+    "period_rollups": [
+        # Period reports: a node's buckets for a few periods
+        IndexModel([("node", ASCENDING), ("period", ASCENDING)], name="node_period"),
+    ],
+    "life_event_rules": [
+        # Seeded with upserts on keyword, so concurrent first loads cannot duplicate a rule
+        IndexModel([("keyword", ASCENDING)], name="keyword_unique", unique=True),
+    ],
+    "revenue_rollups": [
+        # Admin revenue report over a date range, optionally one DS division
+        IndexModel([("day", ASCENDING), ("ds_division", ASCENDING)], name="day_division"),
+    ],
+}
+
+# ==========================================
+# ROUTE QUERY REGISTRY
+# ==========================================
+# Representative shape of each hot route query, used by the explain check.
+# Values are placeholders - only the shape matters to the planner.
+
+ROUTE_QUERIES = [
+    {"route": "POST /api/auth/login", "collection": "users", "filter": {"nic": "000000000V"}},
+    {"route": "GET /api/users/me", "collection": "users", "filter": {"nic": "000000000V"}},
+    {"route": "GET /api/gs/villagers (+ /export)", "collection": "users",
+     "filter": {"role": "citizen"}, "sort": [("_id", ASCENDING)]},
+    {"route": "org tree load (startup + drift repair)", "collection": "users",
+     "filter": {"role": {"$in": ["gs", "ds", "admin"]}}, "sort": [("_id", ASCENDING)]},
+    {"route": "GET /api/applications/my-apps", "collection": "applications",
+     "filter": {"applicant_nic": "000000000V"}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+    {"route": "GET /api/users/wallet", "collection": "applications",
+     "filter": {"applicant_nic": "000000000V", "status": "Completed"}},
+    {"route": "GET /api/users/notifications", "collection": "applications",
+     "filter": {"applicant_nic": "000000000V"}, "sort": [("created_at", DESCENDING)]},
+    {"route": "GET /api/applications/pending (+ /export)", "collection": "applications",
+     "filter": {"status": "Pending"}, "sort": [("created_at", ASCENDING), ("_id", ASCENDING)]},
+    {"route": "GET /api/ds/queue", "collection": "applications",
+     "filter": {"status": "Pending"}, "sort": [("created_at", ASCENDING), ("_id", ASCENDING)]},
+    {"route": "GET /api/ds/certificates (+ /export)", "collection": "applications",
+     "filter": {"status": "Completed"}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+    {"route": "GET /api/ds/complaints", "collection": "complaints",
+     "filter": {}, "sort": [("_id", DESCENDING)]},
+    {"route": "GET /api/gs/stats (disputes)", "collection": "land_disputes",
+     "filter": {"gs_section": "Wellawatta GS Section"}},
+    {"route": "GET /api/gs/land", "collection": "land_disputes",
+     "filter": {}, "sort": [("_id", DESCENDING)]},
+    {"route": "product catalog load (startup + CATALOG_TTL)", "collection": "products",
+     "filter": {}, "sort": [("_id", ASCENDING)]},
+    {"route": "GET /api/ds/performance-metrics", "collection": "applications",
+     "filter": {"assigned_gs": {"$in": ["888888888V"]}}},
+    {"route": "GET /api/gs/activities", "collection": "applications",
+     "filter": {}, "sort": [("created_at", DESCENDING)]},
+    {"route": "GET /api/ds/audit-logs (+ /export)", "collection": "audit_logs",
+     "filter": {"timestamp": {"$gte": datetime(2025, 1, 1), "$lt": datetime(2026, 1, 1)}},
+     "sort": [("timestamp", DESCENDING), ("_id", DESCENDING)]},
+    {"route": "GET /api/ds/audit-logs?user_nic=", "collection": "audit_logs",
+     "filter": {"user_nic": "000000000V", "timestamp": {"$gte": datetime(2025, 3, 1), "$lt": datetime(2025, 4, 1)}},
+     "sort": [("timestamp", DESCENDING), ("_id", DESCENDING)]},
+    {"route": "GET /api/ds/audit-logs?application_id=", "collection": "audit_logs",
+     "filter": {"application_id": "000000000000000000000000"}, "sort": [("timestamp", DESCENDING), ("_id", DESCENDING)]},
+    {"route": "GET /api/ds/audit-logs?action=", "collection": "audit_logs",
+     "filter": {"action": "Approve Application"}, "sort": [("timestamp", DESCENDING), ("_id", DESCENDING)]},
+    {"route": "GET /api/ds/notifications", "collection": "notifications",
+     "filter": {"user_nic": "000000000V"}, "sort": [("created_date", DESCENDING)]},
+    {"route": "GET /api/admin/drilldown", "collection": "counters",
+     "filter": {"parent": "nation"}, "sort": [("name", ASCENDING)]},
+    {"route": "POST /api/ds/generate-report", "collection": "period_rollups",
+     "filter": {"node": "nation", "period": {"$in": ["month:2025-01", "month:2025-02", "month:2025-03"]}}},
+    {"route": "GET /api/admin/revenue", "collection": "revenue_rollups",
+     "filter": {"day": {"$gte": datetime(2025, 1, 1), "$lt": datetime(2025, 2, 1)}}},
+]
+
+
+DUPLICATE_SAMPLE = 5  # duplicated values listed per blocked unique index
+
+
+async def find_duplicates(collection, fields: list, limit: int = DUPLICATE_SAMPLE) -> list:
+    """Values of `fields` held by more than one document - what a unique index on them would reject"""
+    pipeline = [
+        {"$group": {"_id": {field: f"${field}" for field in fields}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+    return await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=limit)
+
+
+async def ensure_indexes():
+    """Create every registered index (no-op for ones that already exist)"""
+    blocked = []
+    for collection_name, indexes in INDEXES.items():
+        collection = database.get_collection(collection_name)
+        existing = await collection.index_information()
+        buildable = []
+        for index in indexes:
+            spec = index.document
+            if spec.get("unique") and spec["name"] not in existing:
+                fields = list(spec["key"])
+                duplicates = await find_duplicates(collection, fields)
+                if duplicates:
+                    values = ", ".join(f"{group['_id']} x{group['count']}" for group in duplicates)
+                    blocked.append(f"{collection_name}.{'+'.join(fields)} ({spec['name']}): {values}")
+                    continue
+                # A plain index on the same keys (from before they were unique) would conflict
+                for name, info in existing.items():
+                    if name != spec["name"] and [field for field, _ in info["key"]] == fields:
+                        await collection.drop_index(name)
+            buildable.append(index)
+        if buildable:
+            await collection.create_indexes(buildable)
+
+    if blocked:
+        raise RuntimeError(
+            "Unique indexes cannot be built, existing documents share these values:\n  "
+            + "\n  ".join(blocked)
+            + "\nMerge or delete the duplicate documents, then restart (`python indexes.py` re-checks)."
+        )
+    print(f"✅ Indexes ensured on {len(INDEXES)} collections")
+
+
+def _plan_stages(plan) -> list:
+    """Flatten every 'stage' name found in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def explain_route_queries() -> list:
+    """Run explain() on each registered route query and report its winning plan"""
+    report = []
+    for query in ROUTE_QUERIES:
+        cursor = database.get_collection(query["collection"]).find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        plan = await cursor.explain()
+        stages = _plan_stages(plan["queryPlanner"]["winningPlan"])
+        report.append({
+            "route": query["route"],
+            "collection": query["collection"],
+            "stages": stages,
+            # COLLSCAN = no usable index, SORT = in-memory sort the index does not cover
+            "indexed": "COLLSCAN" not in stages and "SORT" not in stages,
+        })
+    return report
+
+
+async def check_indexes():
+    print("🔍 Explaining registered route queries...")
+    try:
+        await ensure_indexes()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return False
+    report = await explain_route_queries()
+
+    unindexed = [entry for entry in report if not entry["indexed"]]
+    for entry in report:
+        mark = "✅" if entry["indexed"] else "❌"
+        print(f"{mark} {entry['route']} [{entry['collection']}] -> {' > '.join(entry['stages'])}")
+
+    if unindexed:
+        print(f"⚠️  {len(unindexed)} of {len(report)} route queries are not index-covered")
+    else:
+        print(f"🎉 All {len(report)} route queries are index-covered")
+    return not unindexed
+
+
+if __name__ == "__main__":
+    ok = asyncio.run(check_indexes())
+    sys.exit(0 if ok else 1)
@@ -1,6 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import database
+from indexes import ensure_indexes
+from utils.certificate_jobs import start_certificate_workers, stop_certificate_workers
+from utils.hierarchy import start_hierarchy_index, stop_hierarchy_index
+from utils.serialization import FastJSONResponse, CompressionMiddleware
+from utils.catalog import load_catalog
+from utils.audit import start_audit_writer, stop_audit_writer
 from routes import (
     auth_routes,
     application_routes,
@@ -14,7 +20,7 @@ from routes import (
 )
 
 
-app = FastAPI(title="Smart Citizen LK Backend")
+app = FastAPI(title="Smart Citizen LK Backend", default_response_class=FastJSONResponse)
 app.include_router(ds_routes.router, prefix="/api/ds", tags=["Divisional Secretary"])
 app.include_router(admin_routes.router, prefix="/api/admin", tags=["Super Admin"])
 
@@ -25,14 +31,24 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip / brotli for large bodies (threshold: COMPRESS_MIN_BYTES)
+app.add_middleware(CompressionMiddleware)
 
 @app.on_event("startup")
 async def startup_db_client():
     await database.command("ping")
     print("✅ MongoDB Connected")
+    await ensure_indexes()
+    await start_hierarchy_index()
+    await load_catalog()
+    start_certificate_workers()
+    start_audit_writer()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await stop_audit_writer()
+    await stop_certificate_workers()
+    await stop_hierarchy_index()
     print("🔌 MongoDB Closed")
 
 # Register Routes
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import Optional, Union
 from datetime import datetime
+from utils.projection import ObjectIdStr
 
 # 1. What we need to Register a user
 class UserRegister(BaseModel):
@@ -43,7 +44,32 @@ class ApplicationSchema(BaseModel):
     assigned_gs: Optional[str] = None  # GS NIC handling this application
     assigned_ds: Optional[str] = None  # DS NIC handling this application
     assigned_district: Optional[str] = None  # District officer NIC
+    
+    # Applicant's location, snapshotted at submission (keys the hierarchical status counters)
+    province: Optional[str] = None
+    district: Optional[str] = None
+    ds_division: Optional[str] = None
+    gs_section: Optional[str] = None
     certificate_path: Optional[str] = None  # Path to generated certificate
+    certificate_status: Optional[str] = None  # "queued" | "rendering" | "ready" | "failed"
+    fee: Optional[float] = None  # Service fee (LKR) at submission, set by the server
+
+# Row of the application exports (certificate register, pending queue) - no details / approval_chain
+class ApplicationExportOut(BaseModel):
+    id: ObjectIdStr = Field(None, validation_alias="_id")
+    service_type: Optional[str] = None
+    applicant_nic: Optional[str] = None
+    status: Optional[str] = None
+    current_approval_stage: Optional[str] = None
+    created_at: Union[datetime, str, None] = None
+    assigned_gs: Optional[str] = None
+    assigned_ds: Optional[str] = None
+    province: Optional[str] = None
+    district: Optional[str] = None
+    ds_division: Optional[str] = None
+    gs_section: Optional[str] = None
+    certificate_status: Optional[str] = None
+    fee: Optional[float] = None
 
 class ServiceSchema(BaseModel):
     service_name: str  # e.g., "Birth Certificate", "Police Report", "Passport"
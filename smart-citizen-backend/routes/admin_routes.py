@@ -1,8 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from database import user_collection, application_collection, service_collection
-from auth import get_current_user_with_role
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from database import user_collection, service_collection, life_event_rule_collection
+from auth import get_current_user_with_role, hashing_metrics
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import date
 from bson import ObjectId
+from pymongo import DeleteMany, InsertOne
+from utils.pagination import page_params, Page
+from utils.projection import ObjectIdStr, sparse_fields, shaper
+from utils.serialization import respond
+from utils import stats
+from utils.counters import get_drilldown, reconcile_counters, LEVELS
+from utils.user_cache import invalidate_user, user_cache_metrics
+from utils import hierarchy
+from utils.intents import invalidate_intents
+from utils import faq
+from utils import revenue
+from utils import life_events
+from utils.audit import audit, audit_metrics
 
 router = APIRouter()
 
@@ -12,32 +27,39 @@ class ServiceUpdate(BaseModel):
     days: int
     active: bool
 
+class LifeEventRule(BaseModel):
+    keyword: str = Field(..., min_length=1)  # matched case-insensitively in the service name
+    trigger: str = Field(..., min_length=1)  # product event_trigger, e.g. "Birth"
+
+class OfficerOut(BaseModel):
+    id: ObjectIdStr = Field(None, validation_alias="_id")
+    fullname: Optional[str] = None
+    role: Optional[str] = None
+    email: Optional[str] = ""
+    division: Optional[str] = Field("General", validation_alias="address")  # Using address field as Division for now
+
 # --- 1. OFFICER MANAGEMENT ---
 
-@router.get("/users")
-async def get_all_officers(current_user: dict = Depends(get_current_user_with_role)):
+@router.get("/users", response_model=Page[OfficerOut])
+async def get_all_officers(request: Request, page: dict = Depends(page_params), fields: Optional[set] = Depends(sparse_fields(OfficerOut)), current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    officers = []
-    # Find all users who are NOT 'citizen'
-    cursor = user_collection.find({"role": {"$in": ["gs", "ds", "admin"]}})
-    async for user in cursor:
-        officers.append({
-            "id": str(user["_id"]),
-            "fullname": user["fullname"],
-            "role": user["role"],
-            "email": user.get("email", ""),
-            "division": user.get("address", "General") # Using address field as Division for now
-        })
-    return officers
+
+    # All users who are NOT 'citizen', oldest first (served from the org tree, no password hashes)
+    return respond(request, await hierarchy.page_officers(page, transform=shaper(OfficerOut, fields)))
 
 @router.delete("/users/{user_id}")
 async def delete_officer(user_id: str, current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    result = await user_collection.delete_one({"_id": ObjectId(user_id)})
-    if result.deleted_count == 0:
+    deleted = await user_collection.find_one_and_delete(
+        {"_id": ObjectId(user_id)}, {"nic": 1, "role": 1, **{level: 1 for level in LEVELS}}
+    )
+    if not deleted:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(deleted["nic"])
+    hierarchy.remove_user(deleted)
+    await audit("Remove Officer", current_user, f"{deleted.get('role')} {deleted['nic']} removed", target_nic=deleted["nic"])
     return {"message": "Officer removed successfully"}
 
 # --- NEW: ASSIGN DS TO DIVISION ---
@@ -68,6 +90,14 @@ async def assign_ds_to_division(data: AssignDSRequest, current_user: dict = Depe
             "reports_to": current_user["nic"]  # DS reports to President/Admin
         }}
     )
+    invalidate_user(data.ds_nic)
+    hierarchy.update_officer(data.ds_nic, {
+        "province": data.province,
+        "district": data.district,
+        "ds_division": data.ds_division,
+        "reports_to": current_user["nic"]
+    })
+    await audit("Assign DS", current_user, f"DS {data.ds_nic} assigned to {data.ds_division}", target_nic=data.ds_nic)
     
     return {
         "message": f"DS {ds_user['fullname']} assigned to {data.ds_division}",
@@ -87,8 +117,7 @@ async def get_all_divisions(current_user: dict = Depends(get_current_user_with_r
         raise HTTPException(status_code=403, detail="Not authorized")
     
     divisions = []
-    cursor = user_collection.find({"role": "ds"})
-    async for ds in cursor:
+    for ds in await hierarchy.list_officers(role="ds"):
         divisions.append({
             "ds_nic": ds["nic"],
             "ds_name": ds["fullname"],
@@ -104,14 +133,10 @@ async def get_all_divisions(current_user: dict = Depends(get_current_user_with_r
 # --- 2. SERVICE CONFIGURATION ---
 
 @router.get("/services")
-async def get_services(current_user: dict = Depends(get_current_user_with_role)):
+async def get_services(request: Request, current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    services = []
-    cursor = service_collection.find({})
-    async for svc in cursor:
-        svc["_id"] = str(svc["_id"])
-        services.append(svc)
+    services = await service_collection.find({}).to_list(length=None)
     
     # Seed default services if empty
     if not services:
@@ -122,9 +147,13 @@ async def get_services(current_user: dict = Depends(get_current_user_with_role))
             {"name": "Police Clearance", "dept": "Police", "price": 1500, "days": 14, "active": True}
         ]
         await service_collection.insert_many(defaults)
-        return await get_services(current_user) # Recursive call to fetch what we just inserted
+        invalidate_intents()
+        faq.invalidate_index()
+        revenue.invalidate_fees()
+        await audit("Seed Services", current_user, f"{len(defaults)} default services created")
+        return await get_services(request, current_user) # Recursive call to fetch what we just inserted
 
-    return services
+    return respond(request, services)
 
 @router.put("/services/{service_id}")
 async def update_service(service_id: str, data: ServiceUpdate, current_user: dict = Depends(get_current_user_with_role)):
@@ -134,63 +163,131 @@ async def update_service(service_id: str, data: ServiceUpdate, current_user: dic
         {"_id": ObjectId(service_id)},
         {"$set": {"price": data.price, "days": data.days, "active": data.active}}
     )
+    invalidate_intents()
+    revenue.invalidate_fees()
+    await faq.refresh_service(service_id)
+    await audit("Update Service", current_user, f"price={data.price} days={data.days} active={data.active}", service_id=service_id)
     return {"message": "Service updated"}
 
+@router.get("/life-event-rules", response_model=List[LifeEventRule])
+async def get_life_event_rules(current_user: dict = Depends(get_current_user_with_role)):
+    """Service keyword -> life-event trigger rules, in match order"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    await life_events.rule_table()  # seeds the defaults on an empty collection
+    return await life_event_rule_collection.find({}, {"_id": 0}).sort([("order", 1), ("keyword", 1)]).to_list(length=None)
+
+@router.put("/life-event-rules")
+async def replace_life_event_rules(rules: List[LifeEventRule], current_user: dict = Depends(get_current_user_with_role)):
+    """Replace the rules; list order is match order (first match wins)"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if not rules:
+        raise HTTPException(status_code=400, detail="At least one rule is required")
+    await life_event_rule_collection.bulk_write([
+        DeleteMany({}),
+        *[InsertOne({"keyword": rule.keyword, "trigger": rule.trigger, "order": order}) for order, rule in enumerate(rules, 1)],
+    ])
+    life_events.invalidate_rules()
+    await audit("Update Life Event Rules", current_user, ", ".join(f"{rule.keyword}->{rule.trigger}" for rule in rules))
+    # Users' stored life_events keep the old mapping until `python -m utils.life_events` recomputes them
+    return {"message": "Life event rules updated", "count": len(rules)}
+
 # --- 3. REVENUE ANALYTICS ---
 
 @router.get("/revenue")
-async def get_revenue_stats(current_user: dict = Depends(get_current_user_with_role)):
+async def get_revenue_stats(start: Optional[date] = None, end: Optional[date] = None, ds_division: Optional[str] = None, current_user: dict = Depends(get_current_user_with_role)):
+    """Fees of completed applications per service and per DS division, optionally for [start, end]"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    # Calculate revenue from Completed applications
-    pipeline = [
-        {"$match": {"status": "Completed"}},
-        {"$group": {"_id": "$service_type", "count": {"$sum": 1}}}
-    ]
-    
-    breakdown = []
-    total_revenue = 0
-    
-    # Fake pricing map for calculation (in real app, join with service_collection)
-    prices = {"Passport": 20000, "NIC": 2500, "Birth Certificate": 1200, "Police": 1500}
-    
-    async for doc in application_collection.aggregate(pipeline):
-        service_name = doc["_id"]
-        count = doc["count"]
-        # Approximate matching
-        price = 1500 
-        for key, val in prices.items():
-            if key in service_name:
-                price = val
-                
-        revenue = count * price
-        total_revenue += revenue
-        
-        breakdown.append({
-            "service": service_name,
-            "count": count,
-            "revenue": revenue
-        })
-        
-    return {
-        "total_revenue": total_revenue,
-        "breakdown": breakdown
-    }
+    # Summed from the daily revenue buckets (utils/revenue.py), not the applications
+    return await revenue.revenue_breakdown(start, end, ds_division)
+
+# --- 3b. STATUS COUNTER DRILL-DOWN ---
+@router.get("/drilldown")
+async def get_status_drilldown(key: str = "nation", current_user: dict = Depends(get_current_user_with_role)):
+    """Status counts for a hierarchy node (nation, province:<name>, district:<name>, ...) and its children"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return await get_drilldown(key)
+
+@router.post("/counters/reconcile")
+async def reconcile_status_counters(current_user: dict = Depends(get_current_user_with_role)):
+    """Rebuild status counters from the applications collection and report drift"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    result = await reconcile_counters()
+    await audit("Reconcile Counters", current_user, f"{result['nodes']} nodes rebuilt, {len(result['drift'])} drifted")
+    return result
+
+# --- 3c. ORG TREE (in memory, see utils/hierarchy.py) ---
+@router.get("/org-tree")
+async def get_org_subtree(key: str = "nation", depth: Optional[int] = Query(None, ge=0), current_user: dict = Depends(get_current_user_with_role)):
+    """Citizen and officer counts for a hierarchy node and its subtree, `depth` levels deep"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    node = await hierarchy.subtree(key, depth)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Unknown hierarchy node")
+    return node
+
+@router.get("/org-tree/drilldown")
+async def get_org_drilldown(key: str = "nation", current_user: dict = Depends(get_current_user_with_role)):
+    """One hierarchy node: its path, direct children and the officers placed at it"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    node = await hierarchy.drilldown(key)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Unknown hierarchy node")
+    return node
+
+@router.post("/org-tree/verify")
+async def verify_org_tree(current_user: dict = Depends(get_current_user_with_role)):
+    """Checksum the org tree against the users collection; reloads it if they differ"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    result = await hierarchy.verify_hierarchy()
+    await audit("Verify Org Tree", current_user, f"{len(result.get('drift', []))} drifted entries")
+    return result
+
+# --- 3d. PASSWORD HASHING POOL METRICS ---
+@router.get("/metrics/hashing")
+async def get_hashing_metrics(current_user: dict = Depends(get_current_user_with_role)):
+    """bcrypt pool size, in-flight calls and queue depth"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return hashing_metrics()
+
+@router.get("/metrics/audit")
+async def get_audit_metrics(current_user: dict = Depends(get_current_user_with_role)):
+    """Audit buffer occupancy, flushes and backpressure waits"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return audit_metrics()
+
+@router.get("/metrics/user-cache")
+async def get_user_cache_metrics(current_user: dict = Depends(get_current_user_with_role)):
+    """User cache size, TTL and hit/miss counts"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return user_cache_metrics()
 
 # --- 4. SYSTEM STATS (NEW) ---
 @router.get("/stats")
 async def get_system_stats(current_user: dict = Depends(get_current_user_with_role)):
+    """Mongo round trips: 2 (national counters + $facet on users, concurrent)"""
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
+    app_counts, user_counts = await stats.system_counts()
+
     # 1. Count Citizens
-    total_citizens = await user_collection.count_documents({"role": "citizen"})
+    total_citizens = user_counts["citizens"]
     
     # 2. Count Transactions (Total Applications)
-    total_apps = await application_collection.count_documents({})
+    total_apps = app_counts["total"]
     
-    # 3. Calculate Revenue (Completed Apps * Avg Price 1500)
-    completed_apps = await application_collection.count_documents({"status": "Completed"})
-    total_revenue = completed_apps * 1500
+    # 3. Revenue (fees of completed applications, kept on the national counter)
+    total_revenue = app_counts["revenue"]
     
     # 4. Fake Logs (In a real app, these come from a log DB)
     logs = [
@@ -1,45 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
 from database import application_collection
-from models import ApplicationSchema
-from auth import get_current_user, get_current_user_with_role
+from models import ApplicationSchema, ApplicationExportOut
+from auth import get_current_user, get_current_user_with_role, get_current_principal
 from bson import ObjectId
-from utils.pdf_generator import generate_certificate # Import our new tool
+from datetime import datetime
+from utils.pagination import page_params, paginate, ASCENDING, DESCENDING
+from utils.counters import record_transition, LEVELS
+from utils.hierarchy import resolve_assignment
+from utils.workflow import approval_update, chain_entry, stage_permission_error
+from utils.certificate_jobs import enqueue_certificates
+from utils.life_events import record_life_events
+from utils.revenue import fee_for
+from utils.audit import audit
+from utils.downloads import sign_download, verify_download, certificate_path, certificate_response
+from utils.serialization import respond
+from utils.export import export_params, stream_export
+from utils.projection import sparse_fields
+from typing import Optional
 import os
 
 router = APIRouter()
 
 # 1. Create Application (with approval workflow initialization)
 @router.post("/")
-async def create_application(app_data: ApplicationSchema, current_user: str = Depends(get_current_user)):
-    from database import user_collection
+async def create_application(app_data: ApplicationSchema, citizen: dict = Depends(get_current_principal)):
+    app_data.applicant_nic = citizen["nic"]
     
-    app_data.applicant_nic = current_user
+    # Snapshot the applicant's location so counters can be keyed without re-lookups
+    for level in LEVELS:
+        setattr(app_data, level, citizen.get(level))
     
-    # Get citizen's GS section to assign application
-    citizen = await user_collection.find_one({"nic": current_user})
-    if citizen:
-        # Find the GS officer for this citizen's section
-        gs_officer = await user_collection.find_one({
-            "role": "gs",
-            "gs_section": citizen.get("gs_section")
-        })
-        if gs_officer:
-            app_data.assigned_gs = gs_officer["nic"]
-            
-            # Find the DS officer for this GS's division
-            ds_officer = await user_collection.find_one({
-                "role": "ds",
-                "ds_division": gs_officer.get("ds_division")
-            })
-            if ds_officer:
-                app_data.assigned_ds = ds_officer["nic"]
+    # Route to the citizen's GS and that GS's DS (in-memory index, no queries)
+    app_data.assigned_gs, app_data.assigned_ds = await resolve_assignment(citizen.get("gs_section"))
+    
+    # Snapshot today's fee, so revenue does not change with later price edits
+    app_data.fee = await fee_for(app_data.service_type)
     
     # Initialize approval workflow
+    app_data.status = "Pending"
     app_data.current_approval_stage = "gs"  # Starts at GS level
     app_data.approval_chain = []
     
-    new_app = await application_collection.insert_one(app_data.dict())
+    application = app_data.dict()
+    new_app = await application_collection.insert_one(application)
+    await record_transition(application, None, "Pending")
+    await audit("Submit Application", citizen, f"{app_data.service_type} application submitted", application_id=str(new_app.inserted_id))
     return {
         "message": "Application submitted successfully",
         "id": str(new_app.inserted_id),
@@ -48,27 +53,34 @@ async def create_application(app_data: ApplicationSchema, current_user: str = De
         "assigned_to": app_data.assigned_gs
     }
 
-# 2. Get My Applications
+# 2. Get My Applications (newest first)
 @router.get("/my-apps")
-async def get_my_applications(current_user: str = Depends(get_current_user)):
-    apps = []
-    cursor = application_collection.find({"applicant_nic": current_user})
-    async for document in cursor:
-        document["_id"] = str(document["_id"])
-        apps.append(document)
-    return apps
+async def get_my_applications(request: Request, page: dict = Depends(page_params), current_user: str = Depends(get_current_user)):
+    return respond(request, await paginate(
+        application_collection, {"applicant_nic": current_user}, page,
+        sort_field="created_at", direction=DESCENDING
+    ))
 
 # 3. Get Pending (Admin)
 @router.get("/pending")
-async def get_pending_applications(current_user: dict = Depends(get_current_user_with_role)):
+async def get_pending_applications(request: Request, page: dict = Depends(page_params), current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] not in {"gs", "ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
-    apps = []
-    cursor = application_collection.find({"status": "Pending"})
-    async for document in cursor:
-        document["_id"] = str(document["_id"])
-        apps.append(document)
-    return apps
+    # Oldest first, so the queue is worked in submission order
+    return respond(request, await paginate(
+        application_collection, {"status": "Pending"}, page,
+        sort_field="created_at", direction=ASCENDING
+    ))
+
+# 3b. Export Pending (NDJSON / CSV, streamed in submission order)
+@router.get("/pending/export")
+async def export_pending_applications(params: dict = Depends(export_params), fields: Optional[set] = Depends(sparse_fields(ApplicationExportOut)), current_user: dict = Depends(get_current_user_with_role)):
+    if current_user["role"] not in {"gs", "ds", "admin"}:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return stream_export(
+        application_collection, {"status": "Pending"}, [("created_at", ASCENDING), ("_id", ASCENDING)],
+        ApplicationExportOut, fields, params, "pending-applications"
+    )
 
 # 4. Approve/Reject at Current Stage (Multi-level workflow)
 @router.put("/{app_id}/status")
@@ -76,8 +88,6 @@ async def update_application_status(app_id: str, status_update: dict, current_us
     if current_user["role"] not in {"gs", "ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    from datetime import datetime
-    
     app_data = await application_collection.find_one({"_id": ObjectId(app_id)})
     if not app_data:
         raise HTTPException(status_code=404, detail="Application not found")
@@ -85,113 +95,86 @@ async def update_application_status(app_id: str, status_update: dict, current_us
     action = status_update.get("status")  # "Approved", "Rejected", "Completed"
     comments = status_update.get("comments", "")
     
+    old_status = app_data.get("status")
     current_stage = app_data.get("current_approval_stage", "gs")
-    approval_level = app_data.get("approval_level", "gs_ds")
     approval_chain = app_data.get("approval_chain", [])
     
+    # Only pending applications can be decided (Completed / Rejected are final)
+    if old_status != "Pending":
+        raise HTTPException(status_code=409, detail=f"Application is {old_status}, only pending applications can be approved or rejected")
+    
     # Validate user can act at this stage
-    if current_stage == "gs" and current_user["role"] != "gs" and current_user["role"] != "admin":
-        raise HTTPException(status_code=403, detail="Only GS can approve at this stage")
-    elif current_stage == "ds" and current_user["role"] not in {"ds", "admin"}:
-        raise HTTPException(status_code=403, detail="Only DS can approve at this stage")
+    permission_error = stage_permission_error(current_stage, current_user["role"])
+    if permission_error:
+        raise HTTPException(status_code=403, detail=permission_error)
     
-    # Handle rejection
+    # Handle rejection (only while still pending at the stage we checked)
     if action == "Rejected":
-        approval_chain.append({
-            "level": current_stage,
-            "nic": current_user["nic"],
-            "action": "Rejected",
-            "timestamp": datetime.utcnow().isoformat(),
-            "comments": comments
-        })
-        
-        await application_collection.update_one(
-            {"_id": ObjectId(app_id)},
-            {"$set": {
-                "status": "Rejected",
-                "approval_chain": approval_chain
-            }}
+        result = await application_collection.update_one(
+            {"_id": ObjectId(app_id), "status": old_status, "current_approval_stage": app_data.get("current_approval_stage")},
+            {
+                "$set": {"status": "Rejected"},
+                "$push": {"approval_chain": chain_entry(current_stage, current_user["nic"], "Rejected", comments)}
+            }
         )
+        if result.matched_count == 0:
+            raise HTTPException(status_code=409, detail="Application was updated by someone else, please reload")
+        await record_transition(app_data, old_status, "Rejected")
+        await audit("Reject Application", current_user, f"Application {app_id} rejected at {current_stage} level: {comments}", application_id=app_id)
         return {"message": "Application rejected"}
     
-    # Handle approval
-    approval_chain.append({
-        "level": current_stage,
-        "nic": current_user["nic"],
-        "action": "Approved",
-        "timestamp": datetime.utcnow().isoformat(),
-        "comments": comments
-    })
-    
-    # Determine next stage
-    next_stage = None
-    final_status = "Pending"
-    
-    if approval_level == "gs_only":
-        # GS approval is final
-        next_stage = "completed"
-        final_status = "Completed"
-    elif approval_level == "gs_ds":
-        if current_stage == "gs":
-            next_stage = "ds"
-        elif current_stage == "ds":
-            next_stage = "completed"
-            final_status = "Completed"
-    elif approval_level == "gs_ds_district":
-        if current_stage == "gs":
-            next_stage = "ds"
-        elif current_stage == "ds":
-            next_stage = "district"
-        elif current_stage == "district":
-            next_stage = "completed"
-            final_status = "Completed"
-    elif approval_level == "gs_ds_district_ministry":
-        if current_stage == "gs":
-            next_stage = "ds"
-        elif current_stage == "ds":
-            next_stage = "district"
-        elif current_stage == "district":
-            next_stage = "ministry"
-        elif current_stage == "ministry":
-            next_stage = "completed"
-            final_status = "Completed"
+    # Handle approval: the workflow engine decides the next stage
+    try:
+        query, update, next_stage, final_status = approval_update(app_data, current_user["nic"], comments)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    approval_chain.append(update["$push"]["approval_chain"])
     
-    # Update application
-    update_data = {
-        "current_approval_stage": next_stage,
-        "approval_chain": approval_chain,
-        "status": final_status
-    }
-    
-    await application_collection.update_one(
-        {"_id": ObjectId(app_id)},
-        {"$set": update_data}
-    )
+    result = await application_collection.update_one(query, update)
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail="Application was updated by someone else, please reload")
+    await record_transition(app_data, old_status, final_status)
+    await audit("Approve Application", current_user, f"Application {app_id} approved ({current_stage} -> {next_stage})", application_id=app_id)
     
-    # Generate certificate if completed
+    # Queue certificate rendering if completed (poll /{app_id}/certificate-status)
     if final_status == "Completed":
-        cert_path = generate_certificate(
-            app_id=app_id,
-            applicant_name=app_data["details"].get("name", ""),
-            nic=app_data["applicant_nic"],
-            service_type=app_data["service_type"]
-        )
-        await application_collection.update_one(
-            {"_id": ObjectId(app_id)},
-            {"$set": {"certificate_path": cert_path}}
-        )
+        await enqueue_certificates([app_data])
+        await record_life_events([app_data])
     
     return {
         "message": f"Application approved at {current_stage} level",
         "next_stage": next_stage,
         "final_status": final_status,
-        "approval_chain": approval_chain
+        "approval_chain": approval_chain,
+        "certificate_status": "queued" if final_status == "Completed" else None
     }
 
-# 5. DOWNLOAD PDF (New Endpoint)
-@router.get("/{app_id}/download")
-async def download_certificate(app_id: str, current_user: dict = Depends(get_current_user_with_role)):
-    app_data = await application_collection.find_one({"_id": ObjectId(app_id)})
+# 4b. Certificate rendering progress
+@router.get("/{app_id}/certificate-status")
+async def get_certificate_status(app_id: str, current_user: dict = Depends(get_current_user_with_role)):
+    app_data = await application_collection.find_one(
+        {"_id": ObjectId(app_id)},
+        {"applicant_nic": 1, "status": 1, "certificate_status": 1, "certificate_error": 1}
+    )
+    if not app_data:
+        raise HTTPException(status_code=404, detail="Application not found")
+
+    # Only owner or admin/gs/ds can check
+    if current_user["nic"] != app_data["applicant_nic"] and current_user["role"] not in {"admin", "gs", "ds"}:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return {
+        "id": app_id,
+        "status": app_data.get("status"),
+        "certificate_status": app_data.get("certificate_status"),
+        "error": app_data.get("certificate_error")
+    }
+
+# 5. DOWNLOAD PDF
+# 5a. Signed download link (ownership is checked here, once)
+@router.get("/{app_id}/download-url")
+async def get_download_url(app_id: str, request: Request, current_user: dict = Depends(get_current_user_with_role)):
+    app_data = await application_collection.find_one({"_id": ObjectId(app_id)}, {"applicant_nic": 1})
     if not app_data:
         raise HTTPException(status_code=404, detail="Application not found")
 
@@ -199,10 +182,21 @@ async def download_certificate(app_id: str, current_user: dict = Depends(get_cur
     if current_user["nic"] != app_data["applicant_nic"] and current_user["role"] not in {"admin", "gs", "ds"}:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    file_path = f"generated_certs/{app_id}.pdf"
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type='application/pdf', filename=f"Certificate_{app_id}.pdf")
-    raise HTTPException(status_code=404, detail="Certificate not ready yet")
+    if not os.path.exists(certificate_path(app_id)):
+        raise HTTPException(status_code=404, detail="Certificate not ready yet")
+
+    signed = sign_download(app_id)
+    path = request.app.url_path_for("download_certificate", app_id=app_id)
+    return {
+        "url": f"{path}?expires={signed['expires']}&signature={signed['signature']}",
+        "expires_at": datetime.utcfromtimestamp(signed["expires"]).isoformat()
+    }
+
+# 5b. The file itself - verified from the signature alone, no DB read
+@router.get("/{app_id}/download")
+async def download_certificate(app_id: str, expires: int, signature: str, request: Request):
+    verify_download(app_id, expires, signature)
+    return certificate_response(request, app_id)
 
 
 @router.delete("/{app_id}")
@@ -215,5 +209,8 @@ async def delete_application(app_id: str, current_user: dict = Depends(get_curre
     if current_user["nic"] != app_data["applicant_nic"] and current_user["role"] not in {"admin", "gs", "ds"}:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    await application_collection.delete_one({"_id": ObjectId(app_id)})
+    result = await application_collection.delete_one({"_id": ObjectId(app_id)})
+    if result.deleted_count:
+        await record_transition(app_data, app_data.get("status"), None)
+        await audit("Withdraw Application", current_user, f"Application {app_id} withdrawn ({app_data.get('status')})", application_id=app_id)
     return {"message": "Application withdrawn"}
\ No newline at end of file
@@ -1,20 +1,21 @@
 from fastapi import APIRouter, HTTPException, status
+from pymongo.errors import DuplicateKeyError
 from database import user_collection
 from models import UserRegister, UserLogin
-from auth import get_password_hash, verify_password, create_access_token
+from auth import get_password_hash_async, verify_password_async, password_needs_rehash, create_access_token
+from utils import hierarchy
 
 router = APIRouter()
 
 # ✅ REGISTER API
 @router.post("/register")
 async def register_user(user: UserRegister):
-    # 1. Check if NIC already exists
-    existing_user = await user_collection.find_one({"nic": user.nic})
-    if existing_user:
+    # 1. Check if NIC already exists (index-only lookup, before paying for bcrypt)
+    if await user_collection.find_one({"nic": user.nic}, {"_id": 1}):
         raise HTTPException(status_code=400, detail="NIC already registered!")
 
     # 2. Hash the password (Security)
-    hashed_pwd = get_password_hash(user.password)
+    hashed_pwd = await get_password_hash_async(user.password)
 
     # 3. Prepare data for MongoDB
     user_data = {
@@ -26,8 +27,12 @@ async def register_user(user: UserRegister):
         "password": hashed_pwd  # Store hash, not plain text
     }
 
-    # 4. Save to Database
-    await user_collection.insert_one(user_data)
+    # 4. Save to Database (unique index on nic rejects concurrent duplicates)
+    try:
+        await user_collection.insert_one(user_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="NIC already registered!")
+    hierarchy.add_user(user_data)
     
     return {"message": "User registered successfully!", "nic": user.nic}
 
@@ -40,9 +45,14 @@ async def login_user(user: UserLogin):
         raise HTTPException(status_code=400, detail="Invalid NIC or Password")
 
     # 2. Check Password
-    if not verify_password(user.password, db_user["password"]):
+    if not await verify_password_async(user.password, db_user["password"]):
         raise HTTPException(status_code=400, detail="Invalid NIC or Password")
 
+    # Upgrade hashes made with an older work factor while we have the plain password
+    if password_needs_rehash(db_user["password"]):
+        new_hash = await get_password_hash_async(user.password)
+        await user_collection.update_one({"nic": db_user["nic"]}, {"$set": {"password": new_hash}})
+
     # 3. Generate Token
     token = create_access_token({"sub": db_user["nic"], "role": db_user["role"]})
 
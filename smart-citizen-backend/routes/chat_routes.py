@@ -1,34 +1,45 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, Query
+from pydantic import BaseModel, Field
+from typing import List
+from utils.intents import get_matcher
+from utils import faq
 
 router = APIRouter()
 
+MAX_BATCH_MESSAGES = 1000
+# Intents too generic to answer a real question - try the FAQ first
+RETRIEVAL_FIRST = {"fallback", "greeting"}
+
 class ChatRequest(BaseModel):
     message: str
 
+class ChatBatchRequest(BaseModel):
+    messages: List[str] = Field(..., max_length=MAX_BATCH_MESSAGES)
+
+async def _reply(matcher, message: str) -> dict:
+    # 1. Keyword intents (compiled matcher, see utils/intents.py)
+    intent = matcher.match(message)
+    if intent["name"] not in RETRIEVAL_FIRST:
+        return {"intent": intent["name"], "response": intent["response"]}
+    # 2. Free-form question: closest FAQ entry / service description
+    matches = await faq.answer(message, limit=1)
+    if matches and matches[0]["score"] >= faq.FAQ_MIN_SCORE:
+        return {"intent": matches[0]["id"], "response": matches[0]["answer"]}
+    return {"intent": intent["name"], "response": intent["response"]}
+
 @router.post("/")
 async def chat_with_bot(request: ChatRequest):
-    user_msg = request.message.lower()
-    response = ""
-
-    # Simple Keyword Logic (Rule-based AI)
-    if "passport" in user_msg:
-        response = "To apply for a Passport, go to 'E-Services' -> 'Travel & Visa'. The fee is LKR 20,000 for normal service."
-    elif "nic" in user_msg or "identity" in user_msg:
-        response = "National Identity Cards (NIC) are issued by the DRP. You need your Birth Certificate and a GS Character Certificate to apply."
-    elif "birth" in user_msg and "certificate" in user_msg:
-        response = "You can request a copy of a Birth Certificate instantly via this portal. Go to 'E-Services' -> 'Personal Identity'."
-    elif "police" in user_msg:
-        response = "Police Clearance Reports take approximately 14 days. You can apply online and track the status in your Dashboard."
-    elif "driver" in user_msg or "license" in user_msg:
-        response = "Driving Licenses are handled by the Dept of Motor Traffic. We currently offer Revenue License renewals."
-    elif "grama" in user_msg or "gs" in user_msg:
-        response = "Your Grama Niladhari (GS) must verify all residency and character certificate requests before they are issued."
-    elif "payment" in user_msg or "fee" in user_msg:
-        response = "We accept VISA, MasterCard, and LankaQR. All payments are secured via PayHere."
-    elif "hello" in user_msg or "hi" in user_msg:
-        response = "Ayubowan! I am the Smart Citizen Virtual Assistant. How can I help you today?"
-    else:
-        response = "I am sorry, I didn't quite understand that. Try asking about 'Passports', 'NIC', 'Birth Certificates', or 'Payments'."
-
-    return {"response": response}
\ No newline at end of file
+    matcher = await get_matcher()
+    reply = await _reply(matcher, request.message)
+    return {"response": reply["response"], "intent": reply["intent"]}
+
+@router.post("/batch")
+async def chat_batch(request: ChatBatchRequest):
+    """Classify many messages at once (same order as the request)"""
+    matcher = await get_matcher()
+    return {"results": [await _reply(matcher, message) for message in request.messages]}
+
+@router.get("/search")
+async def search_faq(q: str = Query(..., min_length=1), limit: int = Query(3, ge=1, le=20)):
+    """Closest FAQ entries / services with their similarity scores"""
+    return {"results": await faq.answer(q, limit)}
@@ -1,9 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from database import application_collection, user_collection, complaints_collection, audit_log_collection, notifications_collection
-from auth import get_current_user_with_role, get_password_hash
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from auth import get_current_user_with_role, get_current_principal, get_password_hash_async
+from pydantic import BaseModel, EmailStr, Field
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from typing import Optional, Union
 from datetime import datetime
+from utils.pagination import page_params, paginate, Page, ASCENDING, DESCENDING
+from utils.projection import ObjectIdStr, sparse_fields, projection, shaper
+from utils.serialization import respond
+from utils.export import export_params, stream_export
+from models import ApplicationExportOut
+from utils import stats
+from utils import rollups
+from utils.regional import regional_report
+from utils.audit import audit, audit_entry, audit_many
+from utils.counters import apply_transitions, record_transition
+from utils.workflow import approval_update, stage_permission_error
+from utils.certificate_jobs import enqueue_certificates
+from utils.life_events import record_life_events
+from utils import hierarchy
 
 router = APIRouter()
 
@@ -18,19 +34,13 @@ class AddGSOfficerRequest(BaseModel):
     address: str
 
 @router.post("/add-gs")
-async def add_gs_officer(data: AddGSOfficerRequest, current_user: dict = Depends(get_current_user_with_role)):
+async def add_gs_officer(data: AddGSOfficerRequest, ds_user: dict = Depends(get_current_principal)):
     """DS officer adds new GS officer to their division"""
-    if current_user["role"] not in {"ds", "admin"}:
+    if ds_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Only DS officers can add GS officers")
     
-    # Get DS user info
-    ds_user = await user_collection.find_one({"nic": current_user["nic"]})
-    if not ds_user:
-        raise HTTPException(status_code=404, detail="DS user not found")
-    
-    # Check if NIC already exists
-    existing = await user_collection.find_one({"nic": data.nic})
-    if existing:
+    # Check if NIC already exists (index-only lookup, before paying for bcrypt)
+    if await user_collection.find_one({"nic": data.nic}, {"_id": 1}):
         raise HTTPException(status_code=400, detail="NIC already registered")
     
     # Create GS officer with hierarchy
@@ -39,17 +49,23 @@ async def add_gs_officer(data: AddGSOfficerRequest, current_user: dict = Depends
         "nic": data.nic,
         "phone": data.phone,
         "email": data.email,
-        "password": get_password_hash(data.password),
+        "password": await get_password_hash_async(data.password),
         "role": "gs",
         "address": data.address,
         "province": ds_user.get("province"),  # Inherit from DS
         "district": ds_user.get("district"),  # Inherit from DS
         "ds_division": ds_user.get("ds_division"),  # Under DS's division
         "gs_section": data.gs_section,  # GS specific section
-        "reports_to": current_user["nic"]  # GS reports to this DS
+        "reports_to": ds_user["nic"]  # GS reports to this DS
     }
     
-    result = await user_collection.insert_one(new_gs)
+    # Unique index on nic rejects concurrent duplicates
+    try:
+        result = await user_collection.insert_one(new_gs)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="NIC already registered")
+    hierarchy.add_user(new_gs)
+    await audit("Add GS Officer", ds_user, f"GS officer {data.nic} added to {data.gs_section}", target_nic=data.nic)
     
     return {
         "message": f"GS officer {data.fullname} added successfully",
@@ -70,12 +86,11 @@ async def get_gs_officers(current_user: dict = Depends(get_current_user_with_rol
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Find all GS officers who report to this DS
+    # Find all GS officers who report to this DS (served from the org tree)
     gs_officers = []
-    query = {"role": "gs", "reports_to": current_user["nic"]} if current_user["role"] == "ds" else {"role": "gs"}
+    reports_to = current_user["nic"] if current_user["role"] == "ds" else None
     
-    cursor = user_collection.find(query)
-    async for gs in cursor:
+    for gs in await hierarchy.list_officers(role="gs", reports_to=reports_to):
         gs_officers.append({
             "id": str(gs["_id"]),
             "fullname": gs["fullname"],
@@ -91,15 +106,17 @@ async def get_gs_officers(current_user: dict = Depends(get_current_user_with_rol
 # 1. DS Stats (Overview)
 @router.get("/stats")
 async def get_ds_stats(current_user: dict = Depends(get_current_user_with_role)):
+    """Mongo round trips: 2 (officer scope + counters)"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
     # Count applications by status
-    pending = await application_collection.count_documents({"status": "Pending"})
-    approved = await application_collection.count_documents({"status": "Completed"})
-    rejected = await application_collection.count_documents({"status": "Rejected"})
+    counts = await stats.application_counts(await stats.scope_key(current_user))
+    pending = counts["pending"]
+    approved = counts["completed"]
+    rejected = counts["rejected"]
     
-    # Calculate fake revenue (e.g., 1500 LKR per approved app)
-    revenue = approved * 1500 
+    # Fees of completed applications, rolled up on completion (utils/revenue.py)
+    revenue = counts["revenue"]
 
     return {
         "pending": pending,
@@ -111,74 +128,145 @@ async def get_ds_stats(current_user: dict = Depends(get_current_user_with_role))
 # 2. DS Approval Queue (Get all Pending apps)
 # In a real system, this might filter only NICs or Passports
 @router.get("/queue")
-async def get_approval_queue(current_user: dict = Depends(get_current_user_with_role)):
+async def get_approval_queue(request: Request, page: dict = Depends(page_params), current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
-    apps = []
-    cursor = application_collection.find({"status": "Pending"})
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        apps.append(doc)
-    return apps
+    return respond(request, await paginate(
+        application_collection, {"status": "Pending"}, page,
+        sort_field="created_at", direction=ASCENDING
+    ))
 
 # 3. Issued Certificates (Get all Completed apps)
 @router.get("/certificates")
-async def get_issued_certificates(current_user: dict = Depends(get_current_user_with_role)):
+async def get_issued_certificates(request: Request, page: dict = Depends(page_params), current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
-    apps = []
-    cursor = application_collection.find({"status": "Completed"})
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        apps.append(doc)
-    return apps
+    return respond(request, await paginate(
+        application_collection, {"status": "Completed"}, page,
+        sort_field="created_at", direction=DESCENDING
+    ))
+
+@router.get("/certificates/export")
+async def export_issued_certificates(params: dict = Depends(export_params), fields: Optional[set] = Depends(sparse_fields(ApplicationExportOut)), current_user: dict = Depends(get_current_user_with_role)):
+    """Certificate register as NDJSON / CSV, streamed newest first"""
+    if current_user["role"] not in {"ds", "admin"}:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return stream_export(
+        application_collection, {"status": "Completed"}, [("created_at", DESCENDING), ("_id", DESCENDING)],
+        ApplicationExportOut, fields, params, "certificates"
+    )
 
 # ==========================================
 # BATCH APPROVALS
 # ==========================================
 
+MAX_BATCH_SIZE = 1000
+
 class BatchApproveRequest(BaseModel):
     application_ids: list
+    comments: str = ""
 
 @router.post("/batch-approve")
-async def batch_approve_applications(data: BatchApproveRequest, current_user: dict = Depends(get_current_user_with_role)):
-    """Batch approve multiple applications"""
+async def batch_approve_applications(data: BatchApproveRequest, current_user: dict = Depends(get_current_principal)):
+    """Batch approve multiple applications through the approval workflow"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
     
     from bson.objectid import ObjectId
-    approved_count = 0
     
-    for app_id in data.application_ids:
+    # 1. Validate IDs (duplicates are approved once)
+    app_ids = list(dict.fromkeys(str(app_id) for app_id in data.application_ids))
+    if len(app_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} applications per batch")
+    results = {app_id: {"id": app_id} for app_id in app_ids}
+    for app_id in app_ids:
+        if not ObjectId.is_valid(app_id):
+            results[app_id].update(result="invalid_id", detail="Not a valid application ID")
+    
+    # 2. Load every application with a single $in
+    object_ids = [ObjectId(app_id) for app_id in app_ids if ObjectId.is_valid(app_id)]
+    applications = {}
+    async for app in application_collection.find({"_id": {"$in": object_ids}}):
+        applications[str(app["_id"])] = app
+    
+    # 3. Work out each application's next stage with the workflow engine
+    batch_id = str(ObjectId())
+    operations, planned = [], []
+    for app_id in app_ids:
+        if "result" in results[app_id]:
+            continue
+        app = applications.get(app_id)
+        if app is None:
+            results[app_id].update(result="not_found", detail="Application not found")
+            continue
+        if app.get("status") != "Pending":
+            results[app_id].update(result="skipped", detail=f"Application is {app.get('status')}")
+            continue
+        permission_error = stage_permission_error(app.get("current_approval_stage", "gs"), current_user["role"])
+        if permission_error:
+            results[app_id].update(result="forbidden", detail=permission_error)
+            continue
+        
         try:
-            result = await application_collection.update_one(
-                {"_id": ObjectId(app_id)},
-                {
-                    "$set": {
-                        "status": "Completed",
-                        "approved_by": current_user["nic"],
-                        "approved_date": datetime.now().isoformat()
-                    }
-                }
+            query, update, next_stage, final_status = approval_update(
+                app, current_user["nic"], data.comments or "Approved in batch", batch_id=batch_id
             )
-            if result.modified_count > 0:
-                approved_count += 1
-                # Log action
-                await audit_log_collection.insert_one({
-                    "action": "Batch Approve",
-                    "user_nic": current_user["nic"],
-                    "user_name": current_user.get("fullname"),
-                    "application_id": app_id,
-                    "timestamp": datetime.now().isoformat(),
-                    "details": f"Application {app_id} approved in batch"
-                })
-        except Exception as e:
+        except ValueError as e:
+            results[app_id].update(result="skipped", detail=str(e))
             continue
+        operations.append(UpdateOne(query, update))
+        planned.append((app, next_stage, final_status))
     
+    # 4. Apply every change in one unordered bulk write
+    applied_ids = set()
+    if operations:
+        failed_indexes = set()
+        try:
+            write_result = await application_collection.bulk_write(operations, ordered=False)
+            matched = write_result.matched_count
+        except BulkWriteError as e:
+            matched = e.details.get("nMatched", 0)
+            failed_indexes = {error["index"] for error in e.details.get("writeErrors", [])}
+        
+        if matched == len(operations) and not failed_indexes:
+            applied_ids = {str(app["_id"]) for app, _, _ in planned}
+        else:
+            # Some applications changed under us - the batch_id in approval_chain tells which updates landed
+            async for app in application_collection.find(
+                {"_id": {"$in": [app["_id"] for app, _, _ in planned]}, "approval_chain.batch_id": batch_id},
+                {"_id": 1}
+            ):
+                applied_ids.add(str(app["_id"]))
+    
+    transitions, audit_entries, completed = [], [], []
+    for app, next_stage, final_status in planned:
+        app_id = str(app["_id"])
+        if app_id not in applied_ids:
+            results[app_id].update(result="conflict", detail="Application was updated by someone else")
+            continue
+        results[app_id].update(result="approved", next_stage=next_stage, final_status=final_status)
+        transitions.append((app, app.get("status"), final_status))
+        if final_status == "Completed":
+            completed.append(app)
+        audit_entries.append(audit_entry(
+            "Batch Approve", current_user,
+            f"Application {app_id} approved in batch ({app.get('current_approval_stage', 'gs')} -> {next_stage})",
+            application_id=app_id, batch_id=batch_id
+        ))
+    
+    # 5. One buffered audit write, one counter update, one batch of certificate jobs, one life-event write
+    await audit_many(audit_entries)
+    await apply_transitions(transitions)
+    await enqueue_certificates(completed)
+    await record_life_events(completed)
+    
+    approved_count = len(audit_entries)
     return {
         "message": f"Successfully approved {approved_count} applications",
         "approved_count": approved_count,
-        "total_requested": len(data.application_ids)
+        "completed_count": len(completed),
+        "total_requested": len(data.application_ids),
+        "results": [results[app_id] for app_id in app_ids]
     }
 
 # ==========================================
@@ -187,22 +275,25 @@ async def batch_approve_applications(data: BatchApproveRequest, current_user: di
 
 @router.get("/performance-metrics")
 async def get_performance_metrics(current_user: dict = Depends(get_current_user_with_role)):
-    """Get performance metrics for all GS officers under this DS"""
+    """Get performance metrics for all GS officers under this DS (Mongo round trips: 1)"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Get GS officers
-    query = {"role": "gs", "reports_to": current_user["nic"]} if current_user["role"] == "ds" else {"role": "gs"}
+    # Get GS officers (org tree, no query)
+    reports_to = current_user["nic"] if current_user["role"] == "ds" else None
+    officers = await hierarchy.list_officers(role="gs", reports_to=reports_to)
+    
+    # Count applications assigned to every GS at once, then join in memory
+    performance = await stats.gs_performance([gs.get("nic") for gs in officers])
     
     metrics = []
-    cursor = user_collection.find(query)
-    async for gs in cursor:
-        gs_nic = gs.get("nic")
-        
-        # Count applications processed by this GS
-        total = await application_collection.count_documents({"gs_officer": gs_nic})
-        approved = await application_collection.count_documents({"gs_officer": gs_nic, "status": "Completed"})
-        rejected = await application_collection.count_documents({"gs_officer": gs_nic, "status": "Rejected"})
+    for gs in officers:
+        counts = performance.get(gs.get("nic"), {})
+        total = counts.get("total", 0)
+        approved = counts.get("approved", 0)
+        rejected = counts.get("rejected", 0)
+        avg_days = counts.get("avg_processing_days")
+        max_days = counts.get("max_processing_days")
         
         metrics.append({
             "id": str(gs["_id"]),
@@ -212,7 +303,8 @@ async def get_performance_metrics(current_user: dict = Depends(get_current_user_
             "rejected_count": rejected,
             "total_processed": total,
             "approval_rate": f"{(approved/total*100) if total > 0 else 0:.1f}%",
-            "avg_processing_time": "2.5 days",
+            "avg_processing_time": f"{avg_days:.1f} days" if avg_days is not None else "N/A",
+            "max_processing_time": f"{max_days:.1f} days" if max_days is not None else "N/A",
             "satisfaction_rate": f"{85 + (approved % 15)}%"
         })
     
@@ -227,30 +319,29 @@ class ComplaintRequest(BaseModel):
     complaint_text: str
     service_type: str
 
-@router.get("/complaints")
-async def get_complaints(current_user: dict = Depends(get_current_user_with_role)):
-    """Get all complaints in DS division"""
+class ComplaintOut(BaseModel):
+    id: ObjectIdStr = Field(None, validation_alias="_id")
+    citizen_id: Optional[str] = None
+    citizen_name: Optional[str] = None
+    complaint_text: Optional[str] = None
+    service_type: Optional[str] = None
+    status: Optional[str] = "Open"
+    created_date: Optional[str] = None
+    priority: Optional[str] = "Medium"
+
+@router.get("/complaints", response_model=Page[ComplaintOut])
+async def get_complaints(request: Request, page: dict = Depends(page_params), fields: Optional[set] = Depends(sparse_fields(ComplaintOut)), current_user: dict = Depends(get_current_user_with_role)):
+    """Get all complaints in DS division (newest first)"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    complaints = []
-    cursor = complaints_collection.find({})
-    async for complaint in cursor:
-        complaints.append({
-            "id": str(complaint["_id"]),
-            "citizen_id": complaint.get("citizen_id"),
-            "citizen_name": complaint.get("citizen_name"),
-            "complaint_text": complaint.get("complaint_text"),
-            "service_type": complaint.get("service_type"),
-            "status": complaint.get("status", "Open"),
-            "created_date": complaint.get("created_date"),
-            "priority": complaint.get("priority", "Medium")
-        })
-    
-    return complaints
+    return respond(request, await paginate(
+        complaints_collection, {}, page,
+        projection=projection(ComplaintOut, fields), transform=shaper(ComplaintOut, fields)
+    ))
 
 @router.post("/complaints")
-async def create_complaint(data: ComplaintRequest, current_user: dict = Depends(get_current_user_with_role)):
+async def create_complaint(data: ComplaintRequest, current_user: dict = Depends(get_current_principal)):
     """Create new complaint"""
     if current_user["role"] not in {"citizen", "ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -267,6 +358,7 @@ async def create_complaint(data: ComplaintRequest, current_user: dict = Depends(
     }
     
     result = await complaints_collection.insert_one(new_complaint)
+    await audit("Create Complaint", current_user, f"{data.service_type} complaint for citizen {data.citizen_id}", complaint_id=str(result.inserted_id))
     return {"message": "Complaint created", "complaint_id": str(result.inserted_id)}
 
 @router.put("/complaints/{complaint_id}")
@@ -285,6 +377,7 @@ async def update_complaint_status(complaint_id: str, status: str, current_user:
             }
         }
     )
+    await audit("Update Complaint", current_user, f"Complaint {complaint_id} set to {status}", complaint_id=complaint_id)
     
     return {"message": f"Complaint status updated to {status}"}
 
@@ -292,25 +385,57 @@ async def update_complaint_status(complaint_id: str, status: str, current_user:
 # AUDIT LOGS
 # ==========================================
 
-@router.get("/audit-logs")
-async def get_audit_logs(current_user: dict = Depends(get_current_user_with_role)):
-    """Get audit logs for all actions"""
+class AuditLogOut(BaseModel):
+    id: ObjectIdStr = Field(None, validation_alias="_id")
+    action: Optional[str] = None
+    user_name: Optional[str] = None
+    user_nic: Optional[str] = None
+    user_role: Optional[str] = None
+    application_id: Optional[str] = None
+    timestamp: Union[datetime, str, None] = None
+    details: Union[dict, str, None] = None
+
+def audit_filters(
+    start: Optional[datetime] = Query(None, description="From this time (inclusive, UTC)"),
+    end: Optional[datetime] = Query(None, description="Until this time (exclusive, UTC)"),
+    user_nic: Optional[str] = Query(None, description="Officer / citizen who acted"),
+    action: Optional[str] = Query(None, description="e.g. Approve Application"),
+    application_id: Optional[str] = None,
+) -> dict:
+    """Dependency: audit search filters as a Mongo query (each one has a (field, timestamp, _id) index)"""
+    query = {}
+    if user_nic:
+        query["user_nic"] = user_nic
+    if application_id:
+        query["application_id"] = application_id
+    if action:
+        query["action"] = action
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lt"] = end
+    return query
+
+@router.get("/audit-logs", response_model=Page[AuditLogOut])
+async def get_audit_logs(request: Request, query: dict = Depends(audit_filters), page: dict = Depends(page_params), fields: Optional[set] = Depends(sparse_fields(AuditLogOut)), current_user: dict = Depends(get_current_user_with_role)):
+    """Search the audit trail (time range, actor, action, application), newest first"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    logs = []
-    cursor = audit_log_collection.find({}).sort("timestamp", -1).limit(100)
-    async for log in cursor:
-        logs.append({
-            "id": str(log["_id"]),
-            "action": log.get("action"),
-            "user_name": log.get("user_name"),
-            "user_nic": log.get("user_nic"),
-            "timestamp": log.get("timestamp"),
-            "details": log.get("details")
-        })
-    
-    return logs
+    return respond(request, await paginate(
+        audit_log_collection, query, page, sort_field="timestamp", direction=DESCENDING,
+        projection=projection(AuditLogOut, fields), transform=shaper(AuditLogOut, fields)
+    ))
+
+@router.get("/audit-logs/export")
+async def export_audit_logs(query: dict = Depends(audit_filters), params: dict = Depends(export_params), fields: Optional[set] = Depends(sparse_fields(AuditLogOut)), current_user: dict = Depends(get_current_user_with_role)):
+    """Audit trail (same filters as /audit-logs) as NDJSON / CSV, streamed newest first"""
+    if current_user["role"] not in {"ds", "admin"}:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return stream_export(
+        audit_log_collection, query, [("timestamp", DESCENDING), ("_id", DESCENDING)], AuditLogOut, fields, params, "audit-logs"
+    )
 
 # ==========================================
 # DIGITAL SIGNATURES
@@ -359,6 +484,7 @@ async def create_signature_template(data: SignatureTemplateRequest, current_user
     """Create new signature template"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
+    await audit("Create Signature Template", current_user, f"Template '{data.template_name}' created")
     
     return {
         "message": "Signature template created",
@@ -372,13 +498,14 @@ async def create_signature_template(data: SignatureTemplateRequest, current_user
 
 @router.get("/analytics")
 async def get_workflow_analytics(current_user: dict = Depends(get_current_user_with_role)):
-    """Get workflow analytics and KPIs"""
+    """Get workflow analytics and KPIs (Mongo round trips: 2)"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    total_apps = await application_collection.count_documents({})
-    completed_apps = await application_collection.count_documents({"status": "Completed"})
-    pending_apps = await application_collection.count_documents({"status": "Pending"})
+    counts = await stats.application_counts(await stats.scope_key(current_user))
+    total_apps = counts["total"]
+    completed_apps = counts["completed"]
+    pending_apps = counts["pending"]
     
     return {
         "avg_processing_time": "2.8 days",
@@ -439,6 +566,7 @@ async def create_notification(data: NotificationRequest, current_user: dict = De
     }
     
     result = await notifications_collection.insert_one(new_notif)
+    await audit("Create Notification", current_user, data.title, notification_id=str(result.inserted_id))
     return {"message": "Notification created", "notification_id": str(result.inserted_id)}
 
 @router.put("/notifications/{notification_id}/read")
@@ -450,6 +578,7 @@ async def mark_notification_read(notification_id: str, current_user: dict = Depe
         {"_id": ObjectId(notification_id)},
         {"$set": {"read": True}}
     )
+    await audit("Read Notification", current_user, f"Notification {notification_id} marked as read", notification_id=notification_id)
     
     return {"message": "Notification marked as read"}
 
@@ -458,35 +587,48 @@ async def mark_notification_read(notification_id: str, current_user: dict = Depe
 # ==========================================
 
 class ReportRequest(BaseModel):
-    report_type: str  # Monthly, Quarterly, Annual
+    report_type: str  # Daily, Monthly, Quarterly (the quarter containing `month`), Annual
     month: Optional[int] = None
+    day: Optional[int] = None  # Daily reports only
     year: int
     include_metrics: bool = True
 
 @router.post("/generate-report")
-async def generate_report(data: ReportRequest, current_user: dict = Depends(get_current_user_with_role)):
-    """Generate administrative report"""
+async def generate_report(data: ReportRequest, current_user: dict = Depends(get_current_principal)):
+    """Generate administrative report (Mongo round trips: 2, or 1 for past periods)"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
+    try:
+        period, periods = rollups.report_periods(data.report_type, data.year, data.month, data.day)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Get data for report
-    total_apps = await application_collection.count_documents({})
-    completed = await application_collection.count_documents({"status": "Completed"})
-    pending = await application_collection.count_documents({"status": "Pending"})
+    # Merge the period's rollup buckets for the officer's division (or the nation)
+    merged = await rollups.merged_counts(await stats.scope_key(current_user), periods)
+    counts = merged["totals"]
+    submitted = counts["submitted"]
+    completed = counts["completed"]
     
     report_data = {
         "report_id": "RPT_" + str(int(datetime.now().timestamp())),
         "report_type": data.report_type,
-        "period": f"{data.month or 'Full'}/{data.year}",
+        "period": period,
         "generated_by": current_user.get("fullname"),
         "generated_date": datetime.now().isoformat(),
         "statistics": {
-            "total_applications": total_apps,
+            "total_applications": submitted,
+            "submitted": submitted,
             "completed": completed,
-            "pending": pending,
-            "completion_rate": f"{(completed/total_apps*100) if total_apps > 0 else 0:.1f}%"
+            "rejected": counts["rejected"],
+            "escalated": counts["escalated"],
+            "completion_rate": f"{(completed/submitted*100) if submitted > 0 else 0:.1f}%"
         }
     }
+    if data.include_metrics:
+        report_data["by_service"] = [
+            {"service": service, **service_counts}
+            for service, service_counts in sorted(merged["by_service"].items(), key=lambda item: -item[1]["submitted"])
+        ]
     
     return report_data
 
@@ -528,7 +670,7 @@ async def get_escalations(current_user: dict = Depends(get_current_user_with_rol
     ]
 
 @router.post("/escalations")
-async def create_escalation(data: EscalationRequest, current_user: dict = Depends(get_current_user_with_role)):
+async def create_escalation(data: EscalationRequest, current_user: dict = Depends(get_current_principal)):
     """Escalate a case"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -546,11 +688,15 @@ async def create_escalation(data: EscalationRequest, current_user: dict = Depend
         "notes": ""
     }
     
-    # Update application status
-    await application_collection.update_one(
+    # Update application status (pre-update document tells us which counters to move)
+    previous = await application_collection.find_one_and_update(
         {"_id": ObjectId(data.application_id)},
         {"$set": {"status": "Escalated", "escalation_level": data.escalation_level}}
     )
+    if not previous:
+        raise HTTPException(status_code=404, detail="Application not found")
+    await record_transition(previous, previous.get("status"), "Escalated")
+    await audit("Escalate Application", current_user, f"{data.escalation_level}: {data.reason}", application_id=data.application_id)
     
     return {"message": "Case escalated successfully", "escalation_id": "ESC_" + str(int(datetime.now().timestamp()))}
 
@@ -559,20 +705,13 @@ async def create_escalation(data: EscalationRequest, current_user: dict = Depend
 # ==========================================
 
 @router.get("/regional-reports")
-async def get_regional_reports(current_user: dict = Depends(get_current_user_with_role)):
-    """Get regional statistics and reports"""
+async def get_regional_reports(ds_division: Optional[str] = None, current_user: dict = Depends(get_current_principal)):
+    """Per-GS-section figures for the DS's division (admins pick one with ?ds_division=); Mongo round trips: 1 per REGIONAL_REPORT_TTL"""
     if current_user["role"] not in {"ds", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    return {
-        "division": current_user.get("ds_division", "Colombo"),
-        "total_gs_sections": 12,
-        "total_applications": 450,
-        "completion_rate": "87%",
-        "average_processing_time": "3.2 days",
-        "sections": [
-            {"name": "Wellawatta", "applications": 50, "completed": 44},
-            {"name": "Dehiwala", "applications": 65, "completed": 58},
-            {"name": "Mount Lavinia", "applications": 45, "completed": 42}
-        ]
-    }
\ No newline at end of file
+    division = current_user.get("ds_division") if current_user["role"] == "ds" else ds_division
+    if not division:
+        detail = "No DS division assigned" if current_user["role"] == "ds" else "ds_division is required"
+        raise HTTPException(status_code=400, detail=detail)
+    return await regional_report(division)
\ No newline at end of file
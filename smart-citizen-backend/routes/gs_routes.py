@@ -1,10 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from database import application_collection, user_collection, land_collection
-from auth import get_current_user_with_role, get_password_hash
-from pydantic import BaseModel, EmailStr
+from auth import get_current_user_with_role, get_current_principal, get_password_hash_async
+from pydantic import BaseModel, EmailStr, Field, BeforeValidator
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Annotated, Optional, List, Dict, Any, Union
+from utils.pagination import page_params, paginate, Page, ASCENDING
+from utils.projection import ObjectIdStr, sparse_fields, projection, shaper
+from utils.serialization import respond
+from utils.export import export_params, stream_export
+from utils import stats
+from utils.user_cache import get_user, invalidate_user
+from utils.counters import LEVELS
+from utils import hierarchy
+from utils.audit import audit
 
 router = APIRouter()
 
@@ -39,23 +49,42 @@ class SettingsPayload(BaseModel):
     timeFormat: Optional[str] = None
     theme: Optional[str] = None
 
+
+# Response models (validation_alias = the Mongo field each value comes from)
+class VillagerOut(BaseModel):
+    id: ObjectIdStr = Field(None, validation_alias="_id")
+    fullname: Optional[str] = None
+    nic: Optional[str] = None
+    address: Optional[str] = "N/A"
+    phone: Optional[str] = "N/A"
+
+
+def _priority(status):
+    return "High" if status == "Pending" else "Normal"
+
+
+class GSApplicationOut(BaseModel):
+    id: ObjectIdStr = Field(None, validation_alias="_id")
+    name: Optional[str] = Field("N/A", validation_alias="applicant_name")
+    applicant_name: Optional[str] = "N/A"
+    service: Optional[str] = Field("N/A", validation_alias="service_type")
+    service_type: Optional[str] = "N/A"
+    date: Union[datetime, str, None] = Field("N/A", validation_alias="created_at")
+    created_at: Union[datetime, str, None] = "N/A"
+    status: Optional[str] = "Pending"
+    priority: Annotated[str, BeforeValidator(_priority)] = Field("Normal", validation_alias="status")
+
 # --- ROUTES ---
 
 # --- NEW: GS CAN ADD CITIZENS ---
 @router.post("/add-citizen")
-async def add_citizen(data: AddCitizenRequest, current_user: dict = Depends(get_current_user_with_role)):
+async def add_citizen(data: AddCitizenRequest, gs_user: dict = Depends(get_current_principal)):
     """GS officer adds new citizen to the system"""
-    if current_user["role"] not in {"gs", "admin"}:
+    if gs_user["role"] not in {"gs", "admin"}:
         raise HTTPException(status_code=403, detail="Only GS officers can add citizens")
     
-    # Get GS user info
-    gs_user = await user_collection.find_one({"nic": current_user["nic"]})
-    if not gs_user:
-        raise HTTPException(status_code=404, detail="GS user not found")
-    
-    # Check if NIC already exists
-    existing = await user_collection.find_one({"nic": data.nic})
-    if existing:
+    # Check if NIC already exists (index-only lookup, before paying for bcrypt)
+    if await user_collection.find_one({"nic": data.nic}, {"_id": 1}):
         raise HTTPException(status_code=400, detail="NIC already registered")
     
     # Create citizen with hierarchy
@@ -64,7 +93,7 @@ async def add_citizen(data: AddCitizenRequest, current_user: dict = Depends(get_
         "nic": data.nic,
         "phone": data.phone,
         "email": data.email,
-        "password": get_password_hash(data.password),
+        "password": await get_password_hash_async(data.password),
         "role": "citizen",
         "address": data.address,
         "province": gs_user.get("province"),  # Inherit from GS
@@ -74,7 +103,13 @@ async def add_citizen(data: AddCitizenRequest, current_user: dict = Depends(get_
         "reports_to": None  # Citizens don't report to anyone
     }
     
-    result = await user_collection.insert_one(new_citizen)
+    # Unique index on nic rejects concurrent duplicates
+    try:
+        result = await user_collection.insert_one(new_citizen)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="NIC already registered")
+    hierarchy.add_user(new_citizen)
+    await audit("Add Citizen", gs_user, f"Citizen {data.nic} registered in {gs_user.get('gs_section')}", target_nic=data.nic)
     
     return {
         "message": f"Citizen {data.fullname} added successfully",
@@ -91,17 +126,19 @@ async def add_citizen(data: AddCitizenRequest, current_user: dict = Depends(get_
 # 1. Get GS Dashboard Stats
 @router.get("/stats")
 async def get_gs_stats(current_user: dict = Depends(get_current_user_with_role)):
+    """Mongo round trips: 3 (officer scope, then counters + $facet on land_disputes, concurrent; villagers from the org tree)"""
     if current_user["role"] not in {"gs", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    total_apps = await application_collection.count_documents({})
-    pending_count = await application_collection.count_documents({"status": "Pending"})
-    approved_count = await application_collection.count_documents({"status": "Completed"})
-    rejected_count = await application_collection.count_documents({"status": "Rejected"})
-    total_villagers = await user_collection.count_documents({"role": "citizen"})
-    disputes_total = await land_collection.count_documents({})
-    disputes_open = await land_collection.count_documents({"status": "Active"})
-    disputes_resolved = await land_collection.count_documents({"status": "Resolved"})
+    app_counts, user_counts, dispute_counts = await stats.gs_dashboard_counts(await stats.scope_key(current_user))
+    total_apps = app_counts["total"]
+    pending_count = app_counts["pending"]
+    approved_count = app_counts["completed"]
+    rejected_count = app_counts["rejected"]
+    total_villagers = user_counts["citizens"]
+    disputes_total = dispute_counts["total"]
+    disputes_open = dispute_counts["open"]
+    disputes_resolved = dispute_counts["resolved"]
 
     approval_rate = f"{(approved_count / total_apps * 100):.1f}%" if total_apps else "0%"
 
@@ -142,65 +179,54 @@ async def get_gs_stats(current_user: dict = Depends(get_current_user_with_role))
     }
 
 # 2. Get All Villagers (Citizens)
-@router.get("/villagers")
-async def get_villagers(current_user: dict = Depends(get_current_user_with_role)):
+@router.get("/villagers", response_model=Page[VillagerOut])
+async def get_villagers(request: Request, page: dict = Depends(page_params), fields: Optional[set] = Depends(sparse_fields(VillagerOut)), current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] not in {"gs", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
-    users = []
-    # Fetch only citizens
-    cursor = user_collection.find({"role": "citizen"})
-    async for user in cursor:
-        users.append({
-            "id": str(user["_id"]),
-            "fullname": user["fullname"],
-            "nic": user["nic"],
-            "address": user.get("address", "N/A"),
-            "phone": user.get("phone", "N/A")
-        })
-    return users
+
+    # Fetch only citizens, in registration order (only the fields the response needs)
+    return respond(request, await paginate(
+        user_collection, {"role": "citizen"}, page, direction=ASCENDING,
+        projection=projection(VillagerOut, fields), transform=shaper(VillagerOut, fields)
+    ))
+
+@router.get("/villagers/export")
+async def export_villagers(params: dict = Depends(export_params), fields: Optional[set] = Depends(sparse_fields(VillagerOut)), current_user: dict = Depends(get_current_user_with_role)):
+    """Every citizen as NDJSON / CSV, streamed in registration order"""
+    if current_user["role"] not in {"gs", "admin"}:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return stream_export(
+        user_collection, {"role": "citizen"}, [("_id", ASCENDING)], VillagerOut, fields, params, "villagers"
+    )
 
 # 3. Land Disputes - Add New
 @router.post("/land")
 async def add_land_dispute(dispute: LandDisputeSchema, current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] not in {"gs", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
-    new_dispute = await land_collection.insert_one(dispute.dict())
+    # Snapshot the registering officer's location, so dashboards can count their section's disputes
+    officer = await get_user(current_user["nic"]) or {}
+    new_dispute = await land_collection.insert_one({**dispute.dict(), **{level: officer.get(level) for level in LEVELS}})
+    await audit("Register Land Dispute", current_user, "Land dispute registered", dispute_id=str(new_dispute.inserted_id))
     return {"message": "Dispute registered", "id": str(new_dispute.inserted_id)}
 
 # 4. Land Disputes - Get All
 @router.get("/land")
-async def get_land_disputes(current_user: dict = Depends(get_current_user_with_role)):
+async def get_land_disputes(request: Request, page: dict = Depends(page_params), current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] not in {"gs", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
-    disputes = []
-    cursor = land_collection.find({})
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        disputes.append(doc)
-    return disputes
+    return respond(request, await paginate(land_collection, {}, page))
 
 # 5. Get GS Applications (Pending for GS review)
-@router.get("/applications")
-async def get_gs_applications(current_user: dict = Depends(get_current_user_with_role)):
+@router.get("/applications", response_model=List[GSApplicationOut])
+async def get_gs_applications(request: Request, fields: Optional[set] = Depends(sparse_fields(GSApplicationOut)), current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] not in {"gs", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    applications = []
-    # Get pending applications
-    cursor = application_collection.find({"status": "Pending"}).limit(20)
-    async for app in cursor:
-        applications.append({
-            "id": str(app["_id"]),
-            "name": app.get("applicant_name", "N/A"),
-            "applicant_name": app.get("applicant_name", "N/A"),
-            "service": app.get("service_type", "N/A"),
-            "service_type": app.get("service_type", "N/A"),
-            "date": app.get("created_at", "N/A"),
-            "created_at": app.get("created_at", "N/A"),
-            "status": app.get("status", "Pending"),
-            "priority": "High" if app.get("status") == "Pending" else "Normal"
-        })
-    return applications
+    # Get pending applications (without details / approval_chain)
+    cursor = application_collection.find({"status": "Pending"}, projection(GSApplicationOut, fields)).limit(20)
+    shape = shaper(GSApplicationOut, fields)
+    return respond(request, [shape(app) async for app in cursor])
 
 # 6. Get GS Activities (Recent actions/updates)
 @router.get("/activities")
@@ -299,18 +325,15 @@ async def get_gs_messages(current_user: dict = Depends(get_current_user_with_rol
 async def post_gs_message(payload: MessagePayload, current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] not in {"gs", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
+    await audit("Send Message", current_user, "GS message posted")
     return {"message": "Message received", "payload": payload.dict()}
 
 
 @router.get("/settings")
-async def get_gs_settings(current_user: dict = Depends(get_current_user_with_role)):
-    if current_user["role"] not in {"gs", "admin"}:
+async def get_gs_settings(user: dict = Depends(get_current_principal)):
+    if user["role"] not in {"gs", "admin"}:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    user = await user_collection.find_one({"nic": current_user.get("nic")})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     return {
         "profile": {
             "name": user.get("fullname", ""),
@@ -353,5 +376,8 @@ async def update_gs_settings(payload: SettingsPayload, current_user: dict = Depe
 
     if updates:
         await user_collection.update_one({"nic": current_user.get("nic")}, {"$set": updates})
+        invalidate_user(current_user.get("nic"))
+        hierarchy.update_officer(current_user.get("nic"), updates)
+        await audit("Update Settings", current_user, f"Updated {', '.join(sorted(updates))}", target_nic=current_user.get("nic"))
 
     return {"message": "Settings updated", "updated": updates}
\ No newline at end of file
@@ -1,24 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import Optional
 from database import product_collection
 from models import ProductSchema
 from auth import get_current_user_with_role  # To protect admin routes
+from utils.pagination import page_params
+from utils.serialization import respond
+from utils.downloads import etag_matches
+from utils import catalog
 
 router = APIRouter()
 
-# 1. Get All Products (Public - for Marketplace)
+def _catalog_response(request: Request, snapshot, content) -> Response:
+    """Conditional GET on the catalog version: 304 while the client's copy is current"""
+    headers = {"ETag": snapshot.etag, "Cache-Control": catalog.CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, snapshot.etag[2:]):
+        return Response(status_code=304, headers=headers)
+    return respond(request, content, headers=headers)
+
+# 1. Get All Products (Public - for Marketplace, optionally one category / life event)
 @router.get("/")
-async def get_all_products():
-    products = []
-    cursor = product_collection.find({})
-    async for document in cursor:
-        document["_id"] = str(document["_id"])
-        products.append(document)
-    return products
+async def get_all_products(request: Request, page: dict = Depends(page_params), category: Optional[str] = None, event_trigger: Optional[str] = None):
+    snapshot = await catalog.get_catalog()
+    return _catalog_response(request, snapshot, snapshot.page(page, category, event_trigger))
+
+# 1b. Categories with product counts (Public)
+@router.get("/categories")
+async def get_product_categories(request: Request):
+    snapshot = await catalog.get_catalog()
+    return _catalog_response(request, snapshot, snapshot.categories())
 
 # 2. Add New Product (Protected - Admin Only)
 @router.post("/")
 async def create_product(product: ProductSchema, current_user: dict = Depends(get_current_user_with_role)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admins can add products")
-    new_product = await product_collection.insert_one(product.dict())
-    return {"message": "Product added successfully", "id": str(new_product.inserted_id)}
\ No newline at end of file
+    document = product.dict()
+    new_product = await product_collection.insert_one(document)
+    catalog.add_product(document)
+    return {"message": "Product added successfully", "id": str(new_product.inserted_id)}
@@ -1,46 +1,28 @@
-from fastapi import APIRouter, Depends
-from database import application_collection, product_collection
-from auth import get_current_user
+from fastapi import APIRouter, Depends, Request
+from auth import get_current_principal
+from utils.serialization import respond
+from utils.life_events import life_events, DEFAULT_TRIGGERS
+from utils.catalog import products_for
 
 router = APIRouter()
 
 @router.get("/")
-async def get_smart_recommendations(current_user: str = Depends(get_current_user)):
+async def get_smart_recommendations(request: Request, current_user: dict = Depends(get_current_principal)):
     """
-    1. Look at User's Approved Applications.
-    2. Identify Life Events (e.g., Birth Cert -> 'Birth').
-    3. Fetch Products matching those events.
+    1. Look at the User's Life Events (materialized when applications complete).
+    2. Default to 'General' if there are none yet.
+    3. Return Products matching those events from the in-memory catalog.
     """
     
-    # 1. Find Completed Applications for this user
-    completed_apps = []
-    cursor = application_collection.find({"applicant_nic": current_user, "status": "Completed"})
-    async for app in cursor:
-        completed_apps.append(app["service_type"])
+    # 1. Life events come with the (cached) principal, e.g. Birth Cert -> 'Birth'
+    triggers = await life_events(current_user)
 
-    # 2. Determine Triggers
-    triggers = []
-    # Logic: Map Service Name to Event Trigger
-    for service in completed_apps:
-        if "Birth" in service:
-            triggers.append("Birth")
-        elif "Marriage" in service:
-            triggers.append("Marriage")
-        elif "Vehicle" in service:
-            triggers.append("Vehicle")
-            
-    # Default: If no apps, show general items
+    # 2. Default: If no events, show general items
     if not triggers:
-        triggers = ["General"] 
+        triggers = list(DEFAULT_TRIGGERS)
 
-    # 3. Fetch Matching Products
-    recommendations = []
-    product_cursor = product_collection.find({"event_trigger": {"$in": triggers}})
-    async for product in product_cursor:
-        product["_id"] = str(product["_id"])
-        recommendations.append(product)
-
-    return {
+    # 3. Matching Products (catalog indexed by event_trigger)
+    return respond(request, {
         "triggers": triggers,
-        "products": recommendations
-    }
\ No newline at end of file
+        "products": await products_for(triggers)
+    })
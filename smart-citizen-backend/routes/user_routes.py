@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Request
 from database import user_collection, application_collection
-from auth import get_current_user
-from pydantic import BaseModel
+from auth import get_current_user, get_current_principal
+from utils.user_cache import invalidate_user
+from utils import hierarchy
+from pydantic import BaseModel, Field, computed_field
+from typing import List, Optional, Union
+from datetime import datetime
+from utils.projection import ObjectIdStr, sparse_fields, projection, shaper
+from utils.serialization import respond
 
 router = APIRouter()
 
@@ -11,13 +17,23 @@ class UserUpdate(BaseModel):
     email: str
     address: str
 
+# Wallet entry (validation_alias = the Mongo field each value comes from)
+class WalletDocumentOut(BaseModel):
+    id: ObjectIdStr = Field(None, validation_alias="_id")
+    title: Optional[str] = Field(None, validation_alias="service_type")
+    issued_date: Union[datetime, str, None] = Field(None, validation_alias="created_at")
+
+    @computed_field
+    def issuer(self) -> str:
+        return "Govt of Sri Lanka"
+
+    @computed_field
+    def type(self) -> str:
+        return "Official"
+
 # 1. Get Current User Profile
 @router.get("/me")
-async def get_user_profile(current_user: str = Depends(get_current_user)):
-    user = await user_collection.find_one({"nic": current_user})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+async def get_user_profile(user: dict = Depends(get_current_principal)):
     # Return user info (exclude password!)
     return {
         "nic": user["nic"],
@@ -35,27 +51,22 @@ async def update_user_profile(data: UserUpdate, current_user: str = Depends(get_
         {"nic": current_user},
         {"$set": {"phone": data.phone, "email": data.email, "address": data.address}}
     )
+    invalidate_user(current_user)
+    hierarchy.update_officer(current_user, {"phone": data.phone, "email": data.email, "address": data.address})
     if update_result.modified_count == 0:
         return {"message": "No changes made"}
     
     return {"message": "Profile updated successfully"}
 
 # 3. Get Digital Wallet (Approved Applications)
-@router.get("/wallet")
-async def get_wallet_documents(current_user: str = Depends(get_current_user)):
-    documents = []
-    # Find applications that are 'Completed' -> These become Wallet Docs
-    cursor = application_collection.find({"applicant_nic": current_user, "status": "Completed"})
-    
-    async for doc in cursor:
-        documents.append({
-            "id": str(doc["_id"]),
-            "title": doc["service_type"],
-            "issued_date": doc["created_at"],
-            "issuer": "Govt of Sri Lanka",
-            "type": "Official"
-        })
-    return documents
+@router.get("/wallet", response_model=List[WalletDocumentOut])
+async def get_wallet_documents(request: Request, fields: Optional[set] = Depends(sparse_fields(WalletDocumentOut)), current_user: str = Depends(get_current_user)):
+    # Find applications that are 'Completed' -> These become Wallet Docs (details / approval_chain stay in Mongo)
+    cursor = application_collection.find(
+        {"applicant_nic": current_user, "status": "Completed"}, projection(WalletDocumentOut, fields)
+    )
+    shape = shaper(WalletDocumentOut, fields)
+    return respond(request, [shape(doc) async for doc in cursor])
 
 # 4. Get User Documents (for dashboard documents section)
 @router.get("/documents")
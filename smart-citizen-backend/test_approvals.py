@@ -0,0 +1,260 @@
+"""
+Approval workflow writes (routes/application_routes.py, routes/ds_routes.py): only
+pending applications are decided, concurrent decisions surface as conflicts, and a
+batch reports every application it could not approve. Runs without a database:
+applications live in an in-memory collection that applies $set / $push updates.
+
+    pytest test_approvals.py
+"""
+
+import asyncio
+import copy
+import os
+from datetime import datetime
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "smart_citizen_test")
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from utils.workflow import next_stage
+from routes import application_routes, ds_routes
+
+DS = {"nic": "777777777V", "role": "ds"}
+GS = {"nic": "888888888V", "role": "gs"}
+
+
+def matches(document, query):
+    for key, condition in query.items():
+        if "." in key:
+            array, field = key.split(".", 1)
+            if not any(entry.get(field) == condition for entry in document.get(array, [])):
+                return False
+        elif isinstance(condition, dict) and "$in" in condition:
+            if document.get(key) not in condition["$in"]:
+                return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+class Result:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+        self.modified_count = matched_count
+
+
+class ListCursor:
+    def __init__(self, documents):
+        self.documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class ApplicationCollection:
+    """Stands in for `applications`; `before_write` runs once, between our read and our write"""
+
+    def __init__(self, documents):
+        self.documents = {document["_id"]: document for document in documents}
+        self.before_write = None
+
+    def _race(self):
+        if self.before_write:
+            self.before_write(self.documents)
+            self.before_write = None
+
+    def _apply(self, query, update) -> int:
+        for document in self.documents.values():
+            if matches(document, query):
+                document.update(update.get("$set", {}))
+                for field, value in update.get("$push", {}).items():
+                    document.setdefault(field, []).append(value)
+                return 1
+        return 0
+
+    async def find_one(self, query, projection=None):
+        for document in self.documents.values():
+            if matches(document, query):
+                return copy.deepcopy(document)
+        return None
+
+    def find(self, query, projection=None):
+        return ListCursor([copy.deepcopy(document) for document in self.documents.values() if matches(document, query)])
+
+    async def update_one(self, query, update):
+        self._race()
+        return Result(self._apply(query, update))
+
+    async def bulk_write(self, operations, ordered=True):
+        self._race()
+        return Result(sum(self._apply(operation._filter, operation._doc) for operation in operations))
+
+
+def application(status="Pending", stage="gs", level="gs_ds"):
+    return {
+        "_id": ObjectId(), "applicant_nic": "200012345678", "service_type": "Birth Certificate",
+        "status": status, "current_approval_stage": stage, "approval_level": level,
+        "approval_chain": [], "created_at": datetime(2025, 3, 1), "fee": 500.0,
+    }
+
+
+@pytest.fixture
+def side_effects(monkeypatch):
+    """Counter, audit, certificate and life-event writes made by the routes"""
+    calls = {"transitions": [], "audits": [], "certificates": [], "life_events": []}
+
+    async def record_transition(app, old_status, new_status):
+        calls["transitions"].append((app["_id"], old_status, new_status))
+
+    async def apply_transitions(transitions):
+        calls["transitions"].extend((app["_id"], old, new) for app, old, new in transitions)
+
+    async def audit(action, *args, **kwargs):
+        calls["audits"].append(action)
+
+    async def audit_many(entries):
+        calls["audits"].extend(entry["action"] for entry in entries)
+
+    async def enqueue_certificates(apps):
+        calls["certificates"].extend(app["_id"] for app in apps)
+
+    async def record_life_events(apps):
+        calls["life_events"].extend(app["_id"] for app in apps)
+
+    for module in (application_routes, ds_routes):
+        for name, fake in {
+            "record_transition": record_transition, "apply_transitions": apply_transitions,
+            "audit": audit, "audit_many": audit_many,
+            "enqueue_certificates": enqueue_certificates, "record_life_events": record_life_events,
+        }.items():
+            if hasattr(module, name):
+                monkeypatch.setattr(module, name, fake)
+    return calls
+
+
+def use(monkeypatch, collection):
+    monkeypatch.setattr(application_routes, "application_collection", collection)
+    monkeypatch.setattr(ds_routes, "application_collection", collection)
+    return collection
+
+
+def decide(app, action, user):
+    return asyncio.run(application_routes.update_application_status(str(app["_id"]), {"status": action}, current_user=user))
+
+
+# --- WORKFLOW ENGINE ---
+
+def test_next_stage_walks_the_level():
+    assert next_stage("gs_ds", "gs") == ("ds", "Pending")
+    assert next_stage("gs_ds", "ds") == ("completed", "Completed")
+
+
+@pytest.mark.parametrize("level, stage", [("gs_ds", "completed"), ("gs_ds", "district"), ("unknown", "gs")])
+def test_next_stage_rejects_unknown_stages(level, stage):
+    with pytest.raises(ValueError):
+        next_stage(level, stage)
+
+
+# --- SINGLE DECISIONS ---
+
+@pytest.mark.parametrize("status", ["Completed", "Rejected"])
+@pytest.mark.parametrize("action", ["Approved", "Rejected"])
+def test_decided_application_is_a_409(monkeypatch, side_effects, status, action):
+    app = application(status=status, stage="completed" if status == "Completed" else "ds")
+    applications = use(monkeypatch, ApplicationCollection([app]))
+
+    with pytest.raises(HTTPException) as error:
+        decide(app, action, DS)
+    assert error.value.status_code == 409
+    assert applications.documents[app["_id"]]["status"] == status
+    assert side_effects["transitions"] == []
+
+
+def test_approval_moves_to_next_stage(monkeypatch, side_effects):
+    app = application()
+    applications = use(monkeypatch, ApplicationCollection([app]))
+
+    response = decide(app, "Approved", GS)
+    assert response["next_stage"] == "ds"
+    assert applications.documents[app["_id"]]["current_approval_stage"] == "ds"
+    assert side_effects["transitions"] == [(app["_id"], "Pending", "Pending")]
+
+
+@pytest.mark.parametrize("action", ["Approved", "Rejected"])
+def test_concurrent_update_is_a_409(monkeypatch, side_effects, action):
+    app = application()
+    applications = use(monkeypatch, ApplicationCollection([app]))
+
+    # Another GS officer approves between our read and our write
+    def other_officer(documents):
+        documents[app["_id"]]["current_approval_stage"] = "ds"
+    applications.before_write = other_officer
+
+    with pytest.raises(HTTPException) as error:
+        decide(app, action, GS)
+    assert error.value.status_code == 409
+    assert applications.documents[app["_id"]]["status"] == "Pending"
+    assert applications.documents[app["_id"]]["approval_chain"] == []
+    assert side_effects["transitions"] == [] and side_effects["audits"] == []
+
+
+# --- BATCH APPROVALS ---
+
+def batch(ids):
+    request = ds_routes.BatchApproveRequest(application_ids=[str(app_id) for app_id in ids])
+    return asyncio.run(ds_routes.batch_approve_applications(request, current_user=DS))
+
+
+def test_batch_reports_each_application(monkeypatch, side_effects):
+    at_ds = application(stage="ds")
+    completed = application(status="Completed", stage="completed")
+    rejected = application(status="Rejected", stage="ds")
+    at_gs = application(stage="gs")
+    stuck = application(stage="completed")  # Pending, but past its last stage
+    missing = ObjectId()
+    applications = use(monkeypatch, ApplicationCollection([at_ds, completed, rejected, at_gs, stuck]))
+
+    response = batch([at_ds["_id"], completed["_id"], missing, "not-an-id", rejected["_id"], at_gs["_id"], stuck["_id"], at_ds["_id"]])
+    results = {entry["id"]: entry["result"] for entry in response["results"]}
+
+    assert results == {
+        str(at_ds["_id"]): "approved",
+        str(completed["_id"]): "skipped",
+        str(missing): "not_found",
+        "not-an-id": "invalid_id",
+        str(rejected["_id"]): "skipped",
+        str(at_gs["_id"]): "forbidden",
+        str(stuck["_id"]): "skipped",
+    }
+    assert response["approved_count"] == response["completed_count"] == 1
+    assert applications.documents[at_ds["_id"]]["status"] == "Completed"
+    assert applications.documents[completed["_id"]]["approval_chain"] == []
+    assert side_effects["transitions"] == [(at_ds["_id"], "Pending", "Completed")]
+    assert side_effects["certificates"] == side_effects["life_events"] == [at_ds["_id"]]
+
+
+def test_batch_reports_concurrent_updates_as_conflicts(monkeypatch, side_effects):
+    apps = [application(stage="ds") for _ in range(3)]
+    applications = use(monkeypatch, ApplicationCollection(apps))
+
+    # Another DS officer rejects the second application mid-batch
+    def other_officer(documents):
+        documents[apps[1]["_id"]]["status"] = "Rejected"
+    applications.before_write = other_officer
+
+    response = batch([app["_id"] for app in apps])
+    results = {entry["id"]: entry["result"] for entry in response["results"]}
+
+    assert results == {str(apps[0]["_id"]): "approved", str(apps[1]["_id"]): "conflict", str(apps[2]["_id"]): "approved"}
+    assert response["approved_count"] == 2
+    assert applications.documents[apps[1]["_id"]]["status"] == "Rejected"
+    assert [app_id for app_id, _, _ in side_effects["transitions"]] == [apps[0]["_id"], apps[2]["_id"]]
+    assert side_effects["audits"] == ["Batch Approve", "Batch Approve"]
@@ -0,0 +1,203 @@
+"""
+Buffered audit writer (utils/audit.py): when batches are flushed, how a full buffer
+pushes back on callers instead of dropping entries, and what shutdown does with
+whatever is left. Runs without a database: audit_logs is a fake that can stall or fail.
+
+    pytest test_audit.py
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "smart_citizen_test")
+
+import pytest
+from utils import audit
+
+ACTOR = {"nic": "777777777V", "fullname": "DS Officer", "role": "ds"}
+
+
+class AuditCollection:
+    """Stands in for `audit_logs`: stalls while `gate` is closed, raises while `failures` remain"""
+
+    def __init__(self):
+        self.batches = []
+        self.gate = None
+        self.failures = 0
+
+    async def insert_many(self, documents, ordered=True):
+        if self.gate:
+            await self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset")
+        self.batches.append([document["details"] for document in documents])
+
+    @property
+    def written(self) -> list:
+        return [details for batch in self.batches for details in batch]
+
+
+@pytest.fixture
+def logs(monkeypatch):
+    collection = AuditCollection()
+    monkeypatch.setattr(audit, "audit_log_collection", collection)
+    monkeypatch.setattr(audit, "AUDIT_DURABILITY", "async")
+    monkeypatch.setattr(audit, "AUDIT_BUFFER_SIZE", 100)
+    monkeypatch.setattr(audit, "AUDIT_FLUSH_SIZE", 3)
+    monkeypatch.setattr(audit, "AUDIT_FLUSH_INTERVAL", 10)
+    monkeypatch.setattr(audit, "AUDIT_SHUTDOWN_TIMEOUT", 1)
+    monkeypatch.setattr(audit, "RETRY_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(audit, "_metrics", dict.fromkeys(audit._metrics, 0))
+    yield collection
+    monkeypatch.setattr(audit, "_writer", None)
+    monkeypatch.setattr(audit, "_buffer", None)
+
+
+def run(scenario):
+    """Run a scenario against a started writer, stopping it afterwards"""
+    async def main():
+        # The wakeup event binds to the loop it is first awaited on
+        audit._wakeup = asyncio.Event()
+        audit.start_audit_writer()
+        try:
+            return await scenario()
+        finally:
+            await audit.stop_audit_writer()
+    return asyncio.run(main())
+
+
+async def settle():
+    """Give the writer task a few turns of the loop"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def entries(*details):
+    return [audit.audit_entry("Approve Application", ACTOR, text) for text in details]
+
+
+# --- FLUSHING ---
+
+def test_without_writer_entries_are_stored_directly(logs):
+    asyncio.run(audit.audit("Approve Application", ACTOR, "a"))
+    assert logs.batches == [["a"]]
+
+
+def test_flushes_once_a_batch_is_waiting(logs):
+    async def scenario():
+        await audit.audit_many(entries("a", "b"))
+        await settle()
+        assert logs.written == []  # below AUDIT_FLUSH_SIZE, the interval has not passed
+
+        await audit.audit("Approve Application", ACTOR, "c")
+        await settle()
+        assert logs.batches == [["a", "b", "c"]]
+    run(scenario)
+
+
+def test_flushes_a_partial_batch_after_the_interval(logs, monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_FLUSH_INTERVAL", 0.05)
+
+    async def scenario():
+        await audit.audit("Approve Application", ACTOR, "a")
+        await asyncio.sleep(0.15)
+        assert logs.batches == [["a"]]
+    run(scenario)
+
+
+def test_large_backlog_goes_out_in_flush_size_batches(logs):
+    async def scenario():
+        await audit.audit_many(entries(*"abcdefg"))
+        await settle()
+        # Full batches go straight away; the odd entry waits for the interval
+        assert logs.batches == [["a", "b", "c"], ["d", "e", "f"]]
+    run(scenario)
+    assert logs.batches[-1] == ["g"]
+
+
+def test_sync_durability_returns_once_written(logs, monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_DURABILITY", "sync")
+
+    async def scenario():
+        await audit.audit("Approve Application", ACTOR, "a")
+        assert logs.written == ["a"]
+        await audit.audit("Approve Application", ACTOR, "b", wait=False)
+        assert logs.written == ["a"]
+    run(scenario)
+
+
+def test_failed_batch_is_retried(logs):
+    logs.failures = 2
+
+    async def scenario():
+        await audit.audit_many(entries("a", "b", "c"), wait=True)
+    run(scenario)
+    assert logs.batches == [["a", "b", "c"]]
+    assert audit._metrics["failed_batches"] == 2
+    assert audit._metrics["written"] == 3
+
+
+# --- BACKPRESSURE ---
+
+def test_full_buffer_makes_callers_wait_instead_of_dropping(logs, monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_BUFFER_SIZE", 4)
+
+    async def scenario():
+        logs.gate = asyncio.Event()  # Mongo stalls
+        await audit.audit_many(entries("a", "b", "c"))
+        await settle()  # the writer takes a-c and blocks on insert_many
+        await audit.audit_many(entries("d", "e", "f", "g"))  # fills the buffer
+
+        producer = asyncio.create_task(audit.audit_many(entries("h", "i")))
+        await settle()
+        assert not producer.done()
+        assert audit.audit_metrics()["buffered"] == 4
+        assert audit._metrics["waited_for_room"] >= 1
+
+        logs.gate.set()  # Mongo recovers
+        await asyncio.wait_for(producer, timeout=1)
+    run(scenario)
+    assert sorted(logs.written) == list("abcdefghi")
+
+
+# --- SHUTDOWN ---
+
+def test_shutdown_flushes_everything_buffered(logs):
+    async def scenario():
+        await audit.audit_many(entries(*"abcde"))
+        await audit.audit("Approve Application", ACTOR, "f")
+    run(scenario)
+    assert sorted(logs.written) == list("abcdef")
+    assert audit.audit_metrics()["running"] is False
+
+
+def test_shutdown_gives_up_after_timeout(logs, monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_SHUTDOWN_TIMEOUT", 0.1)
+    logs.failures = 10 ** 6  # Mongo never comes back
+
+    async def scenario():
+        waiting = asyncio.create_task(audit.audit_many(entries(*"abcd"), wait=True))
+        await settle()
+        await audit.stop_audit_writer()
+        with pytest.raises(RuntimeError):
+            await waiting
+    run(scenario)
+    assert logs.written == []
+    assert audit._writer is None
+
+
+def test_shutdown_timeout_fails_the_batch_in_flight(logs, monkeypatch):
+    monkeypatch.setattr(audit, "AUDIT_SHUTDOWN_TIMEOUT", 0.1)
+    logs.failures = 10 ** 6
+
+    async def scenario():
+        # Both entries are taken into the batch the writer keeps retrying
+        waiting = asyncio.create_task(audit.audit_many(entries("a", "b"), wait=True))
+        await settle()
+        assert audit.audit_metrics()["buffered"] == 0
+        await audit.stop_audit_writer()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(waiting, timeout=1)
+    run(scenario)
@@ -0,0 +1,115 @@
+"""
+Signed certificate download links (utils/downloads.py): a link works until it
+expires, and changing any part of it invalidates it. Runs without a database.
+
+    pytest test_downloads.py
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "smart_citizen_test")
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from utils import downloads
+from utils.downloads import DOWNLOAD_URL_TTL, sign_download, verify_download
+from routes import application_routes
+
+APP_ID = "65f1c0ffee0000000000beef"
+NOW = 1_750_000_000  # seconds since the epoch, mid-window
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls the time verify_download sees"""
+    now = {"t": float(NOW)}
+    monkeypatch.setattr(downloads.time, "time", lambda: now["t"])
+    return now
+
+
+def rejection(app_id, expires, signature) -> str:
+    with pytest.raises(HTTPException) as error:
+        verify_download(app_id, expires, signature)
+    assert error.value.status_code == 403
+    return error.value.detail
+
+
+# --- EXPIRY ---
+
+def test_link_is_valid_for_one_to_two_windows():
+    signed = sign_download(APP_ID, now=NOW)
+    assert DOWNLOAD_URL_TTL < signed["expires"] - NOW <= 2 * DOWNLOAD_URL_TTL
+    assert signed["expires"] % DOWNLOAD_URL_TTL == 0
+
+
+def test_repeat_requests_in_a_window_get_the_same_link():
+    window_start = NOW - NOW % DOWNLOAD_URL_TTL
+    assert sign_download(APP_ID, now=window_start) == sign_download(APP_ID, now=window_start + DOWNLOAD_URL_TTL - 1)
+    assert sign_download(APP_ID, now=window_start) != sign_download(APP_ID, now=window_start + DOWNLOAD_URL_TTL)
+
+
+def test_link_works_until_it_expires(clock):
+    signed = sign_download(APP_ID, now=NOW)
+
+    clock["t"] = signed["expires"]
+    verify_download(APP_ID, signed["expires"], signed["signature"])
+
+    clock["t"] = signed["expires"] + 1
+    assert rejection(APP_ID, signed["expires"], signed["signature"]) == "Download link expired"
+
+
+# --- TAMPERING ---
+
+def test_extending_the_expiry_breaks_the_signature(clock):
+    signed = sign_download(APP_ID, now=NOW)
+    assert rejection(APP_ID, signed["expires"] + DOWNLOAD_URL_TTL, signed["signature"]) == "Invalid download link"
+
+
+def test_link_only_opens_its_own_certificate(clock):
+    signed = sign_download(APP_ID, now=NOW)
+    assert rejection("65f1c0ffee0000000000beee", signed["expires"], signed["signature"]) == "Invalid download link"
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda signature: signature[:-1] + ("A" if signature[-1] != "A" else "B"),
+    lambda signature: signature[:-2],
+    lambda signature: "",
+])
+def test_altered_signature_is_rejected(clock, tamper):
+    signed = sign_download(APP_ID, now=NOW)
+    assert rejection(APP_ID, signed["expires"], tamper(signed["signature"])) == "Invalid download link"
+
+
+def test_expired_forgery_reports_invalid_not_expired(clock):
+    # Nothing about the link is disclosed until its signature checks out
+    clock["t"] = NOW + 10 * DOWNLOAD_URL_TTL
+    assert rejection(APP_ID, NOW, "forged") == "Invalid download link"
+
+
+def test_signature_depends_on_the_secret(monkeypatch, clock):
+    signed = sign_download(APP_ID, now=NOW)
+    monkeypatch.setattr(downloads, "DOWNLOAD_SECRET", "rotated")
+    assert rejection(APP_ID, signed["expires"], signed["signature"]) == "Invalid download link"
+
+
+# --- DOWNLOAD ROUTE ---
+
+def request():
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+
+
+def test_download_route_serves_only_valid_links(monkeypatch, tmp_path, clock):
+    monkeypatch.setattr(downloads, "PDF_DIR", str(tmp_path))
+    (tmp_path / f"{APP_ID}.pdf").write_bytes(b"%PDF-1.4 test")
+    signed = sign_download(APP_ID, now=NOW)
+
+    response = asyncio.run(application_routes.download_certificate(APP_ID, signed["expires"], signed["signature"], request()))
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == f'attachment; filename="Certificate_{APP_ID}.pdf"'
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(application_routes.download_certificate(APP_ID, signed["expires"] + 1, signed["signature"], request()))
+    assert error.value.status_code == 403
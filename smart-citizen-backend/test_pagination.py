@@ -0,0 +1,197 @@
+"""
+Keyset pagination behaviour (utils/pagination.py): cursor round-trips, ties on the
+sort key, and the ?limit= bounds. Runs without a database: the collection is an
+in-memory list that evaluates the filter shapes paginate() emits.
+
+    pytest test_pagination.py
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "smart_citizen_test")
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.dependencies.utils import get_dependant, request_params_to_args
+from pymongo import ASCENDING, DESCENDING
+from utils.pagination import (
+    DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, encode_cursor, page_params, paginate,
+)
+
+
+def matches(document, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(document, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = document.get(key)
+            for operator, operand in condition.items():
+                if operator == "$lt" and not value < operand:
+                    return False
+                if operator == "$gt" and not value > operand:
+                    return False
+        elif document.get(key) != condition:
+            return False
+    return True
+
+
+class ListCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        # Stable sorts applied last key first give the compound order
+        for field, direction in reversed(keys):
+            self.documents.sort(key=lambda document: document[field], reverse=direction == DESCENDING)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.documents[:length]
+
+
+class ListCollection:
+    """Stands in for a Motor collection over a list of documents"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.filters = []
+
+    def find(self, query, projection=None):
+        self.filters.append(query)
+        return ListCursor([document for document in self.documents if matches(document, query)])
+
+
+def walk(collection, query=None, limit=2, **kwargs):
+    """Every page of a query, following next_cursor to the end"""
+    pages, cursor = [], None
+    while True:
+        page = asyncio.run(paginate(collection, query or {}, {"limit": limit, "cursor": cursor}, **kwargs))
+        pages.append(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+START = datetime(2025, 3, 1, 9, 30)
+
+
+@pytest.fixture
+def applications():
+    # Several applications share a created_at, as bulk imports and batch approvals produce
+    stamps = [START, START, START, START + timedelta(minutes=1), START + timedelta(minutes=1), START + timedelta(minutes=2), START]
+    return ListCollection([
+        {"_id": ObjectId(), "created_at": stamp, "status": "Pending" if n % 3 else "Completed"}
+        for n, stamp in enumerate(stamps)
+    ])
+
+
+# --- CURSOR ENCODING ---
+
+@pytest.mark.parametrize("sort_value", [
+    datetime(2025, 3, 1, 9, 30, 15, 123000),
+    ObjectId(),
+    "Birth Certificate",
+    42,
+    None,
+])
+def test_cursor_round_trips_sort_value_and_id(sort_value):
+    doc_id = ObjectId()
+    decoded_value, decoded_id = decode_cursor(encode_cursor(sort_value, doc_id))
+    assert decoded_value == sort_value
+    assert type(decoded_value) is type(sort_value)
+    assert decoded_id == doc_id
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(datetime(2025, 3, 1), ObjectId())
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor("x", ObjectId())[:-4], "eyJrIjp7fX0"])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+# --- KEYSET WALK ---
+
+@pytest.mark.parametrize("direction", [ASCENDING, DESCENDING])
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 10])
+def test_walk_visits_every_row_once_despite_ties(applications, direction, limit):
+    pages = walk(applications, limit=limit, sort_field="created_at", direction=direction)
+    seen = [document["_id"] for page in pages for document in page]
+
+    expected = sorted(applications.documents, key=lambda document: (document["created_at"], document["_id"]),
+                      reverse=direction == DESCENDING)
+    assert seen == [document["_id"] for document in expected]
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_tie_on_sort_key_is_broken_by_id(applications):
+    first = asyncio.run(paginate(applications, {}, {"limit": 2, "cursor": None}, sort_field="created_at", direction=ASCENDING))
+    # The page ends inside the run of four rows created at START
+    assert all(document["created_at"] == START for document in first["items"])
+
+    asyncio.run(paginate(applications, {}, {"limit": 2, "cursor": first["next_cursor"]}, sort_field="created_at", direction=ASCENDING))
+    last = first["items"][-1]
+    assert applications.filters[-1] == {"$or": [
+        {"created_at": {"$gt": START}},
+        {"created_at": START, "_id": {"$gt": last["_id"]}},
+    ]}
+
+
+def test_query_is_kept_alongside_keyset(applications):
+    pages = walk(applications, {"status": "Pending"}, limit=1, sort_field="created_at", direction=ASCENDING)
+    assert all(document["status"] == "Pending" for page in pages for document in page)
+    assert sum(len(page) for page in pages) == sum(document["status"] == "Pending" for document in applications.documents)
+    assert all("$and" in query for query in applications.filters[1:])
+
+
+def test_id_sort_uses_a_single_range(applications):
+    pages = walk(applications, limit=3)
+    assert [document["_id"] for page in pages for document in page] == sorted(
+        (document["_id"] for document in applications.documents), reverse=True
+    )
+    assert all(set(query) == {"_id"} for query in applications.filters[1:])
+
+
+def test_last_page_has_no_cursor(applications):
+    page = asyncio.run(paginate(applications, {}, {"limit": len(applications.documents), "cursor": None}))
+    assert len(page["items"]) == len(applications.documents)
+    assert page["next_cursor"] is None
+
+
+# --- LIMIT BOUNDS ---
+
+def limit_param(received):
+    values, errors = request_params_to_args(get_dependant(path="/", call=page_params).query_params, received)
+    return values.get("limit"), errors
+
+
+def test_limit_defaults():
+    assert limit_param({}) == (DEFAULT_LIMIT, [])
+
+
+@pytest.mark.parametrize("limit", ["1", str(MAX_LIMIT)])
+def test_limit_accepts_bounds(limit):
+    assert limit_param({"limit": limit}) == (int(limit), [])
+
+
+@pytest.mark.parametrize("limit", ["0", "-5", str(MAX_LIMIT + 1), "all"])
+def test_limit_rejects_out_of_range(limit):
+    value, errors = limit_param({"limit": limit})
+    assert value is None
+    assert errors and errors[0]["loc"] == ("query", "limit")
@@ -0,0 +1,162 @@
+"""
+Period rollup boundaries (utils/rollups.py): which buckets a moment falls in, where
+each period ends, when it counts as closed (and cacheable), and which buckets a
+report merges. Runs without a database: the rollup collection is a counting fake.
+
+    pytest test_rollups.py
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "smart_citizen_test")
+
+import pytest
+from utils import rollups
+from utils.rollups import CLOSE_GRACE, is_closed, period_bounds, period_ids, report_periods
+
+TICK = timedelta(microseconds=1)
+
+
+# --- PERIODS ---
+
+@pytest.mark.parametrize("moment, expected", [
+    (datetime(2024, 12, 31, 23, 59, 59, 999999), ["day:2024-12-31", "month:2024-12", "year:2024"]),
+    (datetime(2025, 1, 1), ["day:2025-01-01", "month:2025-01", "year:2025"]),
+    (datetime(2024, 2, 29, 12), ["day:2024-02-29", "month:2024-02", "year:2024"]),
+])
+def test_moment_falls_in_its_day_month_and_year(moment, expected):
+    assert period_ids(moment) == expected
+
+
+@pytest.mark.parametrize("period, start, end", [
+    ("day:2024-12-31", datetime(2024, 12, 31), datetime(2025, 1, 1)),
+    ("day:2024-02-28", datetime(2024, 2, 28), datetime(2024, 2, 29)),
+    ("day:2024-02-29", datetime(2024, 2, 29), datetime(2024, 3, 1)),
+    ("day:2025-02-28", datetime(2025, 2, 28), datetime(2025, 3, 1)),
+    ("month:2025-01", datetime(2025, 1, 1), datetime(2025, 2, 1)),
+    ("month:2025-11", datetime(2025, 11, 1), datetime(2025, 12, 1)),
+    ("month:2025-12", datetime(2025, 12, 1), datetime(2026, 1, 1)),
+    ("year:2025", datetime(2025, 1, 1), datetime(2026, 1, 1)),
+])
+def test_period_bounds(period, start, end):
+    assert period_bounds(period) == (start, end)
+
+
+@pytest.mark.parametrize("granularity", ["day", "month", "year"])
+def test_periods_tile_without_gaps(granularity):
+    # Each period ends where the next begins, so every moment lands in exactly one bucket
+    index = {"day": 0, "month": 1, "year": 2}[granularity]
+    moment = datetime(2023, 12, 30)
+    for _ in range(40 if granularity == "day" else 26):
+        start, end = period_bounds(period_ids(moment)[index])
+        assert start <= moment < end
+        assert period_ids(end - TICK)[index] == period_ids(moment)[index]
+        assert period_ids(end)[index] != period_ids(moment)[index]
+        moment = end
+
+
+@pytest.mark.parametrize("period", ["day:2025-03-31", "month:2025-03", "year:2025"])
+def test_period_closes_after_grace(period):
+    end = period_bounds(period)[1]
+    assert not is_closed(period, now=end - TICK)
+    assert not is_closed(period, now=end + CLOSE_GRACE - TICK)
+    assert is_closed(period, now=end + CLOSE_GRACE)
+
+
+# --- REPORTS ---
+
+@pytest.mark.parametrize("month, label, months", [
+    (1, "2025-Q1", ["01", "02", "03"]),
+    (3, "2025-Q1", ["01", "02", "03"]),
+    (4, "2025-Q2", ["04", "05", "06"]),
+    (9, "2025-Q3", ["07", "08", "09"]),
+    (10, "2025-Q4", ["10", "11", "12"]),
+    (12, "2025-Q4", ["10", "11", "12"]),
+])
+def test_quarter_covers_its_three_months(month, label, months):
+    assert report_periods("Quarterly", 2025, month) == (label, [f"month:2025-{m}" for m in months])
+
+
+def test_report_periods_per_type():
+    assert report_periods("Annual", 2025) == ("2025", ["year:2025"])
+    assert report_periods("Monthly", 2025, 12) == ("2025-12", ["month:2025-12"])
+    assert report_periods("Daily", 2024, 2, 29) == ("2024-02-29", ["day:2024-02-29"])
+
+
+@pytest.mark.parametrize("report_type, month, day", [
+    ("Monthly", None, None),
+    ("Monthly", 0, None),
+    ("Quarterly", 13, None),
+    ("Daily", 2, None),
+    ("Daily", 2, 29),   # 2025 is not a leap year
+    ("Daily", 4, 31),
+    ("Weekly", 1, None),
+])
+def test_incomplete_report_requests_are_rejected(report_type, month, day):
+    with pytest.raises(ValueError):
+        report_periods(report_type, 2025, month, day)
+
+
+# --- CLOSED-PERIOD CACHE ---
+
+class ListCursor:
+    def __init__(self, documents):
+        self.documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class RollupCollection:
+    def __init__(self):
+        self.queries = []
+
+    def find(self, query):
+        self.queries.append(query["period"]["$in"])
+        return ListCursor([
+            {"period": period, "node": query["node"], "service_type": "Passport", "submitted": 1}
+            for period in query["period"]["$in"]
+        ])
+
+
+@pytest.fixture
+def frozen(monkeypatch):
+    """Sets the time period_counts sees"""
+    clock = {"now": None}
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return clock["now"]
+
+    monkeypatch.setattr(rollups, "datetime", FrozenDatetime)
+    monkeypatch.setattr(rollups, "rollup_collection", RollupCollection())
+    rollups._closed.clear()
+    yield clock
+    rollups._closed.clear()
+
+
+def test_period_is_cached_only_once_closed(frozen):
+    month_end = datetime(2025, 4, 1)
+    periods = ["month:2025-02", "month:2025-03"]
+
+    # Writes stamped just before midnight may still land: March is re-read during the grace
+    frozen["now"] = month_end + CLOSE_GRACE - TICK
+    asyncio.run(rollups.period_counts("nation", periods))
+    asyncio.run(rollups.period_counts("nation", periods))
+    assert rollups.rollup_collection.queries == [periods, ["month:2025-03"]]
+
+    frozen["now"] = month_end + CLOSE_GRACE
+    asyncio.run(rollups.period_counts("nation", periods))
+    counts = asyncio.run(rollups.period_counts("nation", periods))
+    assert rollups.rollup_collection.queries == [periods, ["month:2025-03"], ["month:2025-03"]]
+    assert counts["month:2025-03"] == {"Passport": {"submitted": 1, "completed": 0, "rejected": 0, "escalated": 0}}
@@ -0,0 +1,136 @@
+"""
+Enforces the Mongo round-trip budget of every stats endpoint (utils/stats.py ROUND_TRIP_BUDGETS).
+Runs without a database: collections are swapped for counters.
+
+    pytest test_stats_budget.py
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "smart_citizen_test")
+
+import pytest
+from utils import stats, counters, user_cache, hierarchy, revenue, rollups
+from routes import gs_routes, ds_routes, admin_routes
+
+ADMIN = {"nic": "999999999V", "role": "admin"}
+DS = {"nic": "777777777V", "role": "ds"}
+GS = {"nic": "888888888V", "role": "gs"}
+DS_PRINCIPAL = {**DS, "ds_division": "Colombo DS Division"}
+
+
+class CountingCursor:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args, **kwargs):
+        return self
+
+    async def to_list(self, length=None):
+        self.collection.round_trips += 1
+        return list(self.collection.documents)
+
+    def __aiter__(self):
+        self.collection.round_trips += 1
+        self.remaining = iter(self.collection.documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.remaining)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class CountingCollection:
+    """Stands in for a Motor collection and counts every call that would reach Mongo"""
+
+    def __init__(self, document=None, documents=()):
+        self.round_trips = 0
+        self.document = document
+        self.documents = documents
+
+    def find(self, *args, **kwargs):
+        return CountingCursor(self)
+
+    def aggregate(self, *args, **kwargs):
+        return CountingCursor(self)
+
+    async def find_one(self, *args, **kwargs):
+        self.round_trips += 1
+        return self.document
+
+    async def count_documents(self, *args, **kwargs):
+        self.round_trips += 1
+        return 0
+
+
+class OrgTreeCollection(CountingCollection):
+    def aggregate(self, *args, **kwargs):
+        # No citizens
+        return CountingCursor(CountingCollection())
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    officer = {"nic": "888888888V", "gs_section": "Wellawatta GS Section", "ds_division": "Colombo DS Division"}
+    # A large DS division, so per-officer queries would blow the budget
+    gs_officers = [
+        {"_id": n, "nic": f"GS{n:04d}", "fullname": f"GS {n}", "role": "gs", "reports_to": DS["nic"],
+         "ds_division": "Colombo DS Division", "gs_section": f"Section {n % 12}"}
+        for n in range(60)
+    ]
+    fakes = {
+        "application_collection": CountingCollection(),
+        "user_collection": CountingCollection(officer),
+        "land_collection": CountingCollection(),
+        "counters_collection": CountingCollection(),
+        "revenue_collection": CountingCollection(),
+        "rollup_collection": CountingCollection(),
+    }
+    # Cold cache, so officer lookups are counted
+    user_cache.clear_user_cache()
+    for module in (stats, counters, user_cache, revenue, rollups, gs_routes, ds_routes, admin_routes):
+        for name, fake in fakes.items():
+            if hasattr(module, name):
+                monkeypatch.setattr(module, name, fake)
+
+    # The org tree is loaded at startup, outside any request
+    monkeypatch.setattr(hierarchy, "user_collection", OrgTreeCollection(documents=gs_officers))
+    monkeypatch.setattr(hierarchy, "_loaded", False)
+    asyncio.run(hierarchy.load_hierarchy())
+    return fakes
+
+
+def round_trips(fakes):
+    return sum(fake.round_trips for fake in fakes.values())
+
+
+# Each endpoint is called as the officer role with the most expensive scope
+ENDPOINTS = {
+    "gs_stats": lambda: gs_routes.get_gs_stats(current_user=GS),
+    "ds_stats": lambda: ds_routes.get_ds_stats(current_user=DS),
+    "workflow_analytics": lambda: ds_routes.get_workflow_analytics(current_user=DS),
+    "system_stats": lambda: admin_routes.get_system_stats(current_user=ADMIN),
+    "generate_report": lambda: ds_routes.generate_report(
+        ds_routes.ReportRequest(report_type="Monthly", month=1, year=2025), current_user=DS
+    ),
+    "performance_metrics": lambda: ds_routes.get_performance_metrics(current_user=DS),
+    "revenue_stats": lambda: admin_routes.get_revenue_stats(current_user=ADMIN),
+    "regional_reports": lambda: ds_routes.get_regional_reports(current_user=DS_PRINCIPAL),
+}
+
+
+@pytest.mark.parametrize("endpoint", sorted(ENDPOINTS))
+def test_stats_endpoint_within_round_trip_budget(endpoint, collections):
+    asyncio.run(ENDPOINTS[endpoint]())
+    assert round_trips(collections) <= stats.ROUND_TRIP_BUDGETS[endpoint]
+
+
+def test_every_budget_is_enforced():
+    assert set(ENDPOINTS) == set(stats.ROUND_TRIP_BUDGETS)
@@ -0,0 +1,193 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional
+from pymongo.errors import BulkWriteError
+from database import audit_log_collection
+
+# ==========================================
+# AUDIT LOG WRITER
+# ==========================================
+# Routes record state changes with `await audit(...)`. Entries go into a
+# bounded in-memory buffer and one writer task stores them with insert_many
+# once AUDIT_FLUSH_SIZE entries are waiting or AUDIT_FLUSH_INTERVAL has passed.
+#
+# AUDIT_DURABILITY picks what a route waits for:
+#   "async" - the entry is buffered (fire-and-forget)
+#   "sync"  - the batch holding the entry has been written (flush-before-response)
+# When Mongo falls behind, the buffer fills up and audit() waits for room, so
+# requests slow down instead of entries being dropped. Failed batches are
+# retried; shutdown flushes whatever is left.
+#
+# Entries are searched by actor, application or action over a time range
+# (GET /api/ds/audit-logs), so `timestamp` is a UTC datetime and every filter
+# has an index ending in (timestamp, _id). `python -m utils.audit` converts
+# the ISO strings older entries were stored with.
+
+AUDIT_DURABILITY = os.getenv("AUDIT_DURABILITY", "async").lower()  # "async" | "sync"
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))  # entries held in memory
+AUDIT_FLUSH_SIZE = int(os.getenv("AUDIT_FLUSH_SIZE", "500"))  # entries per insert_many
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))  # seconds
+# How long shutdown keeps retrying the last entries before giving up
+AUDIT_SHUTDOWN_TIMEOUT = float(os.getenv("AUDIT_SHUTDOWN_TIMEOUT", "10"))  # seconds
+RETRY_DELAY_SECONDS = 1
+
+_buffer: Optional[asyncio.Queue] = None  # (entry, future or None)
+_writer = None
+_stopping = False
+_wakeup = asyncio.Event()
+_metrics = {"written": 0, "batches": 0, "failed_batches": 0, "waited_for_room": 0}
+
+
+def audit_entry(action: str, actor: dict, details: str = "", **fields) -> dict:
+    """An audit document; `actor` is the principal or token claims of whoever made the change"""
+    return {
+        "action": action,
+        "user_nic": actor.get("nic"),
+        "user_name": actor.get("fullname"),
+        "user_role": actor.get("role"),
+        **fields,
+        "timestamp": datetime.utcnow(),
+        "details": details,
+    }
+
+
+async def audit_many(entries: list, wait: Optional[bool] = None):
+    """Buffer entries for the writer; `wait` overrides AUDIT_DURABILITY for this call"""
+    if not entries:
+        return
+    if _writer is None:
+        # Scripts and tests run without the writer task: store directly
+        await audit_log_collection.insert_many(entries, ordered=False)
+        return
+    wait = AUDIT_DURABILITY == "sync" if wait is None else wait
+    loop = asyncio.get_running_loop()
+    futures = []
+    for entry in entries:
+        future = loop.create_future() if wait else None
+        if _buffer.full():
+            _metrics["waited_for_room"] += 1
+            _wakeup.set()
+        # Blocks while the buffer is full (backpressure)
+        await _buffer.put((entry, future))
+        if future:
+            futures.append(future)
+    if wait or _buffer.qsize() >= AUDIT_FLUSH_SIZE:
+        _wakeup.set()
+    if futures:
+        await asyncio.gather(*futures)
+
+
+async def audit(action: str, actor: dict, details: str = "", wait: Optional[bool] = None, **fields):
+    """Record one state change (see audit_entry for the fields)"""
+    await audit_many([audit_entry(action, actor, details, **fields)], wait)
+
+
+# --- WRITER TASK ---
+
+def _take_batch() -> list:
+    batch = []
+    while len(batch) < AUDIT_FLUSH_SIZE and not _buffer.empty():
+        batch.append(_buffer.get_nowait())
+    return batch
+
+
+def _abandon(batch: list):
+    """Fail the waiting callers of entries that will not be written"""
+    for _, future in batch:
+        if future and not future.done():
+            future.set_exception(RuntimeError("Audit writer stopped before the entry was written"))
+
+
+async def _write(batch: list):
+    """Insert a batch, retrying until Mongo takes it; the buffer keeps filling (and then blocking) meanwhile"""
+    try:
+        while True:
+            try:
+                await audit_log_collection.insert_many([entry for entry, _ in batch], ordered=False)
+                break
+            except BulkWriteError as e:
+                # Stored except for rejected documents (or ones a lost acknowledgement already stored) - retrying cannot help
+                print(f"⚠️  Audit flush stored {e.details.get('nInserted', 0)} of {len(batch)} entries: {e.details.get('writeErrors', [])[:1]}")
+                break
+            except Exception as e:
+                _metrics["failed_batches"] += 1
+                print(f"⚠️  Audit flush of {len(batch)} entries failed, retrying: {e}")
+                await asyncio.sleep(RETRY_DELAY_SECONDS)
+    except asyncio.CancelledError:
+        # Shutdown timed out while this batch was still being retried
+        _abandon(batch)
+        raise
+    _metrics["written"] += len(batch)
+    _metrics["batches"] += 1
+    for _, future in batch:
+        if future and not future.done():
+            future.set_result(None)
+
+
+async def _flush_loop():
+    while True:
+        if not _stopping and _buffer.qsize() < AUDIT_FLUSH_SIZE:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=AUDIT_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        _wakeup.clear()
+        batch = _take_batch()
+        while batch:
+            await _write(batch)
+            # Keep going while a full batch is waiting (or everything, when stopping)
+            batch = _take_batch() if _stopping or _buffer.qsize() >= AUDIT_FLUSH_SIZE else []
+        if _stopping and _buffer.empty():
+            return
+
+
+def start_audit_writer():
+    global _buffer, _writer, _stopping
+    _buffer = asyncio.Queue(maxsize=AUDIT_BUFFER_SIZE)
+    _stopping = False
+    _writer = asyncio.create_task(_flush_loop())
+    print(f"✅ Audit writer started ({AUDIT_DURABILITY}, buffer {AUDIT_BUFFER_SIZE})")
+
+
+async def stop_audit_writer():
+    """Flush every buffered entry, then stop the writer (gives up after AUDIT_SHUTDOWN_TIMEOUT)"""
+    global _writer, _stopping
+    if _writer is None:
+        return
+    _stopping = True
+    _wakeup.set()
+    try:
+        await asyncio.wait_for(_writer, timeout=AUDIT_SHUTDOWN_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"⚠️  Audit writer stopped with {_buffer.qsize()} buffered entries unwritten")
+        _abandon([_buffer.get_nowait() for _ in range(_buffer.qsize())])
+    _writer = None
+
+
+async def backfill_timestamps() -> int:
+    """Convert ISO-string timestamps to datetimes in place (one update); returns the number converted"""
+    result = await audit_log_collection.update_many(
+        {"timestamp": {"$type": "string"}},
+        [{"$set": {"timestamp": {"$dateFromString": {"dateString": "$timestamp", "onError": "$timestamp"}}}}],
+    )
+    return result.modified_count
+
+
+def audit_metrics() -> dict:
+    """Buffer occupancy and writer counters; waited_for_room counts backpressure events"""
+    return {
+        "durability": AUDIT_DURABILITY,
+        "running": _writer is not None,
+        "buffered": _buffer.qsize() if _buffer else 0,
+        "capacity": AUDIT_BUFFER_SIZE,
+        **_metrics,
+    }
+
+
+if __name__ == "__main__":
+    async def main():
+        print("🔄 Converting audit log timestamps to datetimes...")
+        print(f"✅ {await backfill_timestamps()} audit entries converted")
+
+    asyncio.run(main())
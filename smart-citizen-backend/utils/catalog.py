@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import os
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Optional
+from database import product_collection
+from utils.pagination import decode_cursor, encode_cursor
+from utils.serialization import dumps
+
+# ==========================================
+# PRODUCT CATALOG
+# ==========================================
+# The marketplace catalog is small and read on every marketplace and dashboard
+# load, so each process serves it from an immutable in-memory snapshot: the
+# products in _id order plus category and event_trigger views. Every change
+# swaps in a new snapshot with the next version - create_product adds to it
+# directly, other product writes call invalidate_catalog() - and CATALOG_TTL
+# bounds how long another process's changes take to show up.
+# The ETag is a digest of the contents, so every process agrees on it.
+
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "300"))  # seconds
+# Browser / CDN freshness of catalog responses, then revalidate with If-None-Match
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "60"))  # seconds
+
+CACHE_CONTROL = f"public, max-age={CATALOG_MAX_AGE}, stale-while-revalidate={CATALOG_MAX_AGE * 5}"
+
+
+class CatalogSnapshot:
+    def __init__(self, products: list, version: int):
+        self.version = version
+        self.products = sorted(products, key=lambda product: product["_id"])
+        self.ids = [product["_id"] for product in self.products]
+        self.by_category = defaultdict(list)
+        self.by_trigger = defaultdict(list)
+        for product in self.products:
+            self.by_category[product.get("category")].append(product)
+            self.by_trigger[product.get("event_trigger")].append(product)
+        digest = hashlib.sha256(dumps(self.products)).hexdigest()[:20]
+        self.etag = f'W/"catalog-{digest}"'
+        self.loaded_at = time.monotonic()
+
+    def view(self, category: Optional[str] = None, event_trigger: Optional[str] = None) -> list:
+        """Products in _id order, optionally narrowed to one category and/or trigger"""
+        if category is None and event_trigger is None:
+            return self.products
+        if event_trigger is None:
+            return self.by_category.get(category, [])
+        products = self.by_trigger.get(event_trigger, [])
+        if category is not None:
+            products = [product for product in products if product.get("category") == category]
+        return products
+
+    def page(self, page: dict, category: Optional[str] = None, event_trigger: Optional[str] = None) -> dict:
+        """Keyset page of a view, in the same shape and cursor format as utils.pagination"""
+        products = self.view(category, event_trigger)
+        start = 0
+        if page.get("cursor"):
+            _, last_id = decode_cursor(page["cursor"])
+            ids = self.ids if products is self.products else [product["_id"] for product in products]
+            start = bisect_right(ids, last_id)
+        items = products[start:start + page["limit"] + 1]
+
+        next_cursor = None
+        if len(items) > page["limit"]:
+            items = items[:page["limit"]]
+            next_cursor = encode_cursor(items[-1]["_id"], items[-1]["_id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    def categories(self) -> list:
+        return [
+            {"category": category, "count": len(products)}
+            for category, products in sorted(self.by_category.items(), key=lambda item: str(item[0]))
+        ]
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_stale = False
+_lock = asyncio.Lock()
+
+
+async def load_catalog() -> CatalogSnapshot:
+    global _snapshot, _stale
+    # Cleared first, so an invalidation during the read still forces another load
+    _stale = False
+    products = await product_collection.find({}).sort("_id", 1).to_list(length=None)
+    _snapshot = CatalogSnapshot(products, (_snapshot.version + 1) if _snapshot else 1)
+    return _snapshot
+
+
+async def get_catalog() -> CatalogSnapshot:
+    """The current snapshot (no query unless it is missing, invalidated or older than CATALOG_TTL)"""
+    snapshot = _snapshot
+    if snapshot is not None and not _stale and time.monotonic() - snapshot.loaded_at < CATALOG_TTL:
+        return snapshot
+    async with _lock:
+        # Another request may have reloaded while we waited
+        snapshot = _snapshot
+        if snapshot is not None and not _stale and time.monotonic() - snapshot.loaded_at < CATALOG_TTL:
+            return snapshot
+        return await load_catalog()
+
+
+def add_product(product: dict):
+    """Publish a product just inserted by this process (next version, no reload)"""
+    global _snapshot
+    if _snapshot is not None:
+        snapshot = CatalogSnapshot(_snapshot.products + [product], _snapshot.version + 1)
+        # Still due for a reload when the loaded data expires
+        snapshot.loaded_at = _snapshot.loaded_at
+        _snapshot = snapshot
+
+
+def invalidate_catalog():
+    """Call after updating or deleting products: the next read loads a new version"""
+    global _stale
+    _stale = True
+
+
+async def products_for(triggers) -> list:
+    """Products of every trigger, in trigger order"""
+    snapshot = await get_catalog()
+    return [product for trigger in triggers for product in snapshot.by_trigger.get(trigger, ())]
@@ -0,0 +1,180 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from database import application_collection, jobs_collection
+from utils.pdf_generator import generate_certificate
+
+# ==========================================
+# CERTIFICATE RENDERING QUEUE
+# ==========================================
+# Approvals enqueue a job in the `jobs` collection and return immediately.
+# Worker coroutines claim jobs atomically (so several app processes can share
+# the queue) and render PDFs in a process pool, off the event loop.
+# Applications expose progress as certificate_status: queued > rendering > ready | failed.
+# There is one job per application (unique application_id): enqueueing it
+# again re-queues that job rather than adding another.
+
+CERT_WORKERS = int(os.getenv("CERT_WORKERS", "2"))
+CERT_MAX_ATTEMPTS = int(os.getenv("CERT_MAX_ATTEMPTS", "3"))
+POLL_INTERVAL_SECONDS = 2
+# A job stuck in "rendering" this long belonged to a worker that died; it is picked up
+# again, or failed once CERT_MAX_ATTEMPTS workers have died on it
+RENDER_TIMEOUT = timedelta(minutes=5)
+
+JOB_TYPE = "certificate"
+
+_pool = None
+_workers = []
+_wakeup = asyncio.Event()
+
+
+async def enqueue_certificates(applications: list):
+    """Queue certificate rendering for completed applications (one bulk upsert + one update)"""
+    if not applications:
+        return
+    now = datetime.utcnow()
+    await jobs_collection.bulk_write([
+        UpdateOne(
+            {"application_id": str(application["_id"])},
+            {
+                "$set": {
+                    "payload": {
+                        "app_id": str(application["_id"]),
+                        "applicant_name": application.get("details", {}).get("name", ""),
+                        "nic": application["applicant_nic"],
+                        "service_type": application["service_type"],
+                    },
+                    "status": "queued",
+                    "attempts": 0,
+                    "updated_at": now,
+                },
+                "$setOnInsert": {"type": JOB_TYPE, "created_at": now},
+            },
+            upsert=True,
+        )
+        for application in applications
+    ], ordered=False)
+    await application_collection.update_many(
+        {"_id": {"$in": [application["_id"] for application in applications]}},
+        {"$set": {"certificate_status": "queued"}}
+    )
+    _wakeup.set()
+
+
+async def _claim_job():
+    now = datetime.utcnow()
+    return await jobs_collection.find_one_and_update(
+        {"type": JOB_TYPE, "$or": [
+            {"status": "queued"},
+            {"status": "rendering", "locked_at": {"$lt": now - RENDER_TIMEOUT}, "attempts": {"$lt": CERT_MAX_ATTEMPTS}},
+        ]},
+        {"$set": {"status": "rendering", "locked_at": now, "updated_at": now}, "$inc": {"attempts": 1}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _fail_abandoned():
+    """Fail stale jobs with no attempts left: their renders keep killing the worker, so stop retrying"""
+    now = datetime.utcnow()
+    stale = {
+        "type": JOB_TYPE,
+        "status": "rendering",
+        "locked_at": {"$lt": now - RENDER_TIMEOUT},
+        "attempts": {"$gte": CERT_MAX_ATTEMPTS},
+    }
+    jobs = await jobs_collection.find(stale, {"application_id": 1}).to_list(length=None)
+    if not jobs:
+        return
+    error = f"Worker stopped during rendering on all {CERT_MAX_ATTEMPTS} attempts"
+    await jobs_collection.update_many(
+        {**stale, "_id": {"$in": [job["_id"] for job in jobs]}},
+        {"$set": {"status": "failed", "error": error, "updated_at": now}}
+    )
+    await application_collection.update_many(
+        {"_id": {"$in": [ObjectId(job["application_id"]) for job in jobs]}},
+        {"$set": {"certificate_status": "failed", "certificate_error": error}}
+    )
+    print(f"⚠️  {len(jobs)} certificate jobs failed after {CERT_MAX_ATTEMPTS} abandoned attempts")
+
+
+async def _set_status(job: dict, status: str, application_fields: dict = None, **job_fields):
+    await jobs_collection.update_one(
+        {"_id": job["_id"]},
+        {"$set": {"status": status, "updated_at": datetime.utcnow(), **job_fields}}
+    )
+    await application_collection.update_one(
+        {"_id": ObjectId(job["application_id"])},
+        {"$set": {"certificate_status": status, **(application_fields or {})}}
+    )
+
+
+async def _render(job: dict):
+    await application_collection.update_one(
+        {"_id": ObjectId(job["application_id"])},
+        {"$set": {"certificate_status": "rendering"}}
+    )
+    try:
+        cert_path = await asyncio.get_running_loop().run_in_executor(
+            _pool, _render_payload, job["payload"]
+        )
+    except Exception as e:
+        if job["attempts"] < CERT_MAX_ATTEMPTS:
+            # Back into the queue for another try
+            await _set_status(job, "queued", error=str(e))
+        else:
+            await _set_status(job, "failed", {"certificate_error": str(e)}, error=str(e))
+        print(f"⚠️  Certificate job {job['_id']} failed (attempt {job['attempts']}): {e}")
+        return
+    await _set_status(job, "ready", {"certificate_path": cert_path}, result=cert_path)
+
+
+def _render_payload(payload: dict) -> str:
+    # Runs inside the process pool
+    return generate_certificate(**payload)
+
+
+async def _worker():
+    while True:
+        job = await _claim_job()
+        if job is None:
+            await _fail_abandoned()
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await _render(job)
+
+
+async def _supervised_worker():
+    # A Mongo hiccup should not kill the worker for the lifetime of the process
+    while True:
+        try:
+            await _worker()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️  Certificate worker error, restarting: {e}")
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+def start_certificate_workers():
+    global _pool
+    _pool = ProcessPoolExecutor(max_workers=CERT_WORKERS)
+    for _ in range(CERT_WORKERS):
+        _workers.append(asyncio.create_task(_supervised_worker()))
+    print(f"✅ {CERT_WORKERS} certificate workers started")
+
+
+async def stop_certificate_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
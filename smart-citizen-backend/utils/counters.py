@@ -0,0 +1,262 @@
+import asyncio
+from collections import defaultdict
+from pymongo import UpdateOne, UpdateMany, ReplaceOne
+from database import application_collection, counters_collection, user_collection
+from utils.revenue import application_fee, apply_revenue, backfill_fees
+from utils import rollups
+
+# ==========================================
+# HIERARCHICAL STATUS COUNTERS
+# ==========================================
+# One document per node of the org hierarchy:
+#   "nation" > "province:<name>" > "district:<name>" > "ds_division:<name>" > "gs_section:<name>"
+# holding total / pending / completed / rejected / escalated application counts
+# and the revenue (summed fees) of its completed applications.
+# Every code path that changes an application's status calls apply_transitions,
+# so dashboards read a single counter document instead of counting. The same
+# transitions feed the revenue buckets (utils/revenue.py) and the per-period
+# event rollups (utils/rollups.py).
+# Applications from before location snapshots are given their applicant's
+# current location by backfill_locations, which reconciliation runs first;
+# backfill_assignments then routes them to their section's GS / DS officers.
+
+LEVELS = ("province", "district", "ds_division", "gs_section")
+NATION = "nation"
+
+STATUS_FIELDS = {
+    "Pending": "pending",
+    "Completed": "completed",
+    "Rejected": "rejected",
+    "Escalated": "escalated",
+}
+COUNTER_FIELDS = ("total",) + tuple(STATUS_FIELDS.values()) + ("revenue",)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def node_key(level: str, name: str) -> str:
+    return f"{level}:{name}"
+
+
+def counter_nodes(location: dict) -> list:
+    """[(key, level, name, parent_key)] from the nation down to the deepest known level"""
+    nodes = [(NATION, NATION, NATION, None)]
+    parent = NATION
+    for level in LEVELS:
+        name = location.get(level)
+        if not name:
+            break
+        key = node_key(level, name)
+        nodes.append((key, level, name, parent))
+        parent = key
+    return nodes
+
+
+def _deltas(old_status, new_status, fee=0) -> dict:
+    delta = defaultdict(int)
+    if old_status is None:
+        delta["total"] += 1
+    if new_status is None:
+        delta["total"] -= 1
+    if old_status in STATUS_FIELDS:
+        delta[STATUS_FIELDS[old_status]] -= 1
+    if new_status in STATUS_FIELDS:
+        delta[STATUS_FIELDS[new_status]] += 1
+    if old_status == "Completed":
+        delta["revenue"] -= fee
+    if new_status == "Completed":
+        delta["revenue"] += fee
+    return {field: value for field, value in delta.items() if value}
+
+
+async def apply_transitions(transitions: list):
+    """
+    Record status changes as atomic $inc updates: one bulk_write each for the
+    counters, the period rollups and the revenue buckets, run concurrently.
+    Each transition is (application, old_status, new_status); use old_status=None
+    for a new application and new_status=None for a deleted one.
+    """
+    increments = defaultdict(lambda: defaultdict(int))
+    nodes = {}
+    completions, events = [], []
+    for application, old_status, new_status in transitions:
+        event = rollups.transition_event(old_status, new_status)
+        if event:
+            events.append((application, event))
+        fee = 0
+        if (old_status == "Completed") != (new_status == "Completed"):
+            fee = await application_fee(application)
+            completions.append((application, fee, 1 if new_status == "Completed" else -1))
+        delta = _deltas(old_status, new_status, fee)
+        if not delta:
+            continue
+        for key, level, name, parent in counter_nodes(application):
+            nodes[key] = (level, name, parent)
+            for field, value in delta.items():
+                increments[key][field] += value
+
+    requests = []
+    for key, fields in increments.items():
+        inc = {field: value for field, value in fields.items() if value}
+        if not inc:
+            continue
+        level, name, parent = nodes[key]
+        requests.append(UpdateOne(
+            {"_id": key},
+            {"$inc": inc, "$setOnInsert": {"level": level, "name": name, "parent": parent}},
+            upsert=True,
+        ))
+    writes = [rollups.record_events(events), apply_revenue(completions)]
+    if requests:
+        writes.append(counters_collection.bulk_write(requests, ordered=False))
+    await asyncio.gather(*writes)
+
+
+async def record_transition(application: dict, old_status, new_status):
+    await apply_transitions([(application, old_status, new_status)])
+
+
+def _as_counts(document) -> dict:
+    document = document or {}
+    return {field: document.get(field, 0) for field in COUNTER_FIELDS}
+
+
+async def get_counters(key: str = NATION) -> dict:
+    """Counts for one node (zeros if nothing has been recorded yet)"""
+    return _as_counts(await counters_collection.find_one({"_id": key}))
+
+
+async def get_drilldown(key: str = NATION) -> dict:
+    """A node's counts plus the counts of each of its direct children"""
+    node, children = await asyncio.gather(
+        counters_collection.find_one({"_id": key}),
+        counters_collection.find({"parent": key}).sort("name", 1).to_list(length=None),
+    )
+    return {
+        "key": key,
+        "counts": _as_counts(node),
+        "children": [
+            {"key": child["_id"], "level": child.get("level"), "name": child.get("name"), "counts": _as_counts(child)}
+            for child in children
+        ],
+    }
+
+
+# ==========================================
+# BACKFILL
+# ==========================================
+
+async def backfill_locations() -> int:
+    """Snapshot the applicant's current location on applications that have none (one update per applicant)"""
+    missing = {"$or": [{level: {"$exists": False}} for level in LEVELS]}
+    nics = await application_collection.distinct("applicant_nic", missing)
+    updated = 0
+    for i in range(0, len(nics), BACKFILL_BATCH_SIZE):
+        applicants = user_collection.find(
+            {"nic": {"$in": nics[i:i + BACKFILL_BATCH_SIZE]}}, {"nic": 1, **dict.fromkeys(LEVELS, 1), "_id": 0}
+        )
+        operations = [
+            UpdateMany({"applicant_nic": user["nic"], **missing}, {"$set": {level: user.get(level) for level in LEVELS}})
+            async for user in applicants
+        ]
+        if operations:
+            result = await application_collection.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+    return updated
+
+
+async def backfill_assignments() -> int:
+    """Route unassigned applications to their GS section's officers (one update per section)"""
+    # Function import: hierarchy builds on this module's node keys
+    from utils.hierarchy import resolve_assignment
+    updated = 0
+    for gs_section in await application_collection.distinct("gs_section", {"assigned_gs": None}):
+        gs_nic, ds_nic = await resolve_assignment(gs_section)
+        if not gs_nic:
+            # No GS officer in the section yet; picked up by a later run
+            continue
+        result = await application_collection.update_many(
+            {"gs_section": gs_section, "assigned_gs": None},
+            {"$set": {"assigned_gs": gs_nic, "assigned_ds": ds_nic}}
+        )
+        updated += result.modified_count
+    return updated
+
+
+# ==========================================
+# RECONCILIATION
+# ==========================================
+
+async def reconcile_counters() -> dict:
+    """
+    Rebuild every counter from the applications collection and report drift.
+    Returns {"nodes": n, "drift": [{"key", "stored", "actual"}, ...], "located": n, "priced": n},
+    `located` / `priced` being the older applications given a location / fee first.
+    """
+    located = await backfill_locations()
+    # Revenue sums the stored fee: snapshot it where application_fee() would fall back to today's
+    priced = await backfill_fees()
+    pipeline = [
+        {"$group": {
+            "_id": {level: f"${level}" for level in LEVELS} | {"status": "$status"},
+            "count": {"$sum": 1},
+            "revenue": {"$sum": {"$ifNull": ["$fee", 0]}},
+        }},
+    ]
+    actual = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    nodes = {}
+    async for group in application_collection.aggregate(pipeline, allowDiskUse=True):
+        location = group["_id"]
+        status_field = STATUS_FIELDS.get(location.get("status"))
+        for key, level, name, parent in counter_nodes(location):
+            nodes[key] = (level, name, parent)
+            actual[key]["total"] += group["count"]
+            if status_field:
+                actual[key][status_field] += group["count"]
+            if status_field == "completed":
+                actual[key]["revenue"] += group["revenue"]
+
+    stored = {}
+    async for document in counters_collection.find({}):
+        stored[document["_id"]] = _as_counts(document)
+
+    drift = []
+    for key in sorted(set(actual) | set(stored)):
+        expected = actual.get(key, dict.fromkeys(COUNTER_FIELDS, 0))
+        current = stored.get(key, dict.fromkeys(COUNTER_FIELDS, 0))
+        if expected != current:
+            drift.append({"key": key, "stored": current, "actual": expected})
+
+    # Rewrite every node from scratch; nodes with no applications left are dropped
+    requests = [
+        ReplaceOne(
+            {"_id": key},
+            {**counts, "level": nodes[key][0], "name": nodes[key][1], "parent": nodes[key][2]},
+            upsert=True,
+        )
+        for key, counts in actual.items()
+    ]
+    if requests:
+        await counters_collection.bulk_write(requests, ordered=False)
+    stale = [key for key in stored if key not in actual]
+    if stale:
+        await counters_collection.delete_many({"_id": {"$in": stale}})
+
+    return {"nodes": len(actual), "drift": drift, "located": located, "priced": priced}
+
+
+if __name__ == "__main__":
+    async def main():
+        print("🔄 Rebuilding status counters from applications...")
+        result = await reconcile_counters()
+        if result["located"]:
+            print(f"✅ location set on {result['located']} older applications")
+        if result["priced"]:
+            print(f"✅ fee set on {result['priced']} older applications")
+        for entry in result["drift"]:
+            print(f"⚠️  {entry['key']}: stored {entry['stored']} -> actual {entry['actual']}")
+        print(f"✅ {result['nodes']} counter nodes rebuilt, {len(result['drift'])} drifted")
+        print("🔄 Assigning older applications to their GS officers...")
+        print(f"✅ {await backfill_assignments()} applications assigned")
+
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import hmac
+import os
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from utils.pdf_generator import PDF_DIR
+
+# ==========================================
+# SIGNED CERTIFICATE DOWNLOADS
+# ==========================================
+# An authorised user asks for a download URL once (one DB read for the ownership
+# check); the URL carries an expiry and an HMAC signature, so the download itself
+# is verified without touching Mongo. Expiries are rounded to a window so repeat
+# requests get the same URL and the browser can revalidate with If-None-Match.
+
+DOWNLOAD_SECRET = os.getenv("DOWNLOAD_SECRET", os.getenv("SECRET_KEY", "fallback_secret"))
+DOWNLOAD_URL_TTL = int(os.getenv("DOWNLOAD_URL_TTL", "900"))  # seconds
+
+# "" serves the file from the app; "x-accel" (nginx) or "x-sendfile" (Apache, lighttpd)
+# hands the body to the reverse proxy
+DOWNLOAD_OFFLOAD = os.getenv("DOWNLOAD_OFFLOAD", "").lower()
+# nginx `internal` location that maps onto PDF_DIR, used in x-accel mode
+DOWNLOAD_ACCEL_PREFIX = os.getenv("DOWNLOAD_ACCEL_PREFIX", "/protected-certs/")
+
+ETAG_CACHE_SIZE = 1024
+_etags = OrderedDict()
+
+
+# --- URL SIGNING ---
+
+def _signature(app_id: str, expires: int) -> str:
+    digest = hmac.new(DOWNLOAD_SECRET.encode(), f"{app_id}:{expires}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def sign_download(app_id: str, now: float = None) -> dict:
+    """{"expires", "signature"} valid for between one and two TTL windows"""
+    window = int(now if now is not None else time.time()) // DOWNLOAD_URL_TTL
+    expires = (window + 2) * DOWNLOAD_URL_TTL
+    return {"expires": expires, "signature": _signature(app_id, expires)}
+
+
+def verify_download(app_id: str, expires: int, signature: str):
+    if not hmac.compare_digest(_signature(app_id, expires), signature):
+        raise HTTPException(status_code=403, detail="Invalid download link")
+    if expires < time.time():
+        raise HTTPException(status_code=403, detail="Download link expired")
+
+
+# --- FILE RESPONSES ---
+
+def certificate_path(app_id: str) -> str:
+    return os.path.join(PDF_DIR, f"{app_id}.pdf")
+
+
+def strong_etag(path: str, stat: os.stat_result) -> str:
+    """Content hash of the file, cached until its size or mtime changes"""
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    etag = _etags.get(key)
+    if etag is None:
+        with open(path, "rb") as f:
+            etag = '"%s"' % hashlib.sha256(f.read()).hexdigest()[:32]
+        _etags[key] = etag
+        if len(_etags) > ETAG_CACHE_SIZE:
+            _etags.popitem(last=False)
+    else:
+        _etags.move_to_end(key)
+    return etag
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def certificate_response(request: Request, app_id: str) -> Response:
+    path = certificate_path(app_id)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Certificate not ready yet")
+
+    etag = strong_etag(path, stat)
+    headers = {
+        "ETag": etag,
+        # Signed URLs are per user; let the browser keep the file but revalidate it
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="Certificate_{app_id}.pdf"',
+    }
+
+    # 1. Unchanged since the browser's copy
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    # 2. Let the proxy send the body (it handles ranges itself)
+    if DOWNLOAD_OFFLOAD == "x-accel":
+        headers["X-Accel-Redirect"] = f"{DOWNLOAD_ACCEL_PREFIX}{app_id}.pdf"
+        return Response(media_type="application/pdf", headers=headers)
+    if DOWNLOAD_OFFLOAD == "x-sendfile":
+        headers["X-Sendfile"] = os.path.abspath(path)
+        return Response(media_type="application/pdf", headers=headers)
+
+    # 3. Whole file or a byte range - FileResponse answers Range / If-Range against our ETag
+    return FileResponse(path, media_type="application/pdf", headers=headers, stat_result=stat)
@@ -0,0 +1,102 @@
+import csv
+import io
+import os
+from datetime import datetime
+from typing import Optional
+from fastapi import Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from utils.projection import projection, shaper
+from utils.serialization import dumps
+
+# ==========================================
+# STREAMING EXPORTS
+# ==========================================
+# /export routes stream a whole query as NDJSON or CSV straight from the Mongo
+# cursor: rows are shaped by the route's response model, encoded batch_size at
+# a time and handed to the client, so memory stays flat however many rows the
+# query matches. The sort must be index-backed (see indexes.ROUTE_QUERIES) -
+# an in-memory sort would buffer the whole result inside MongoDB instead.
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+MAX_EXPORT_BATCH_SIZE = 10000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# Spreadsheet apps evaluate cells starting with these as formulas
+_FORMULA_PREFIXES = frozenset("=+-@\t\r")
+
+
+def export_params(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=MAX_EXPORT_BATCH_SIZE,
+                            description="Rows fetched from MongoDB and written per chunk"),
+) -> dict:
+    """Dependency: ?format=ndjson|csv&batch_size= for /export routes"""
+    return {"format": format, "batch_size": batch_size}
+
+
+def _cell(value):
+    # Rows are dumped in JSON mode, so only str / numbers / bools / None / dict / list arrive here
+    if value.__class__ is str:
+        return "'" + value if value[:1] in _FORMULA_PREFIXES else value
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode("utf-8")
+    return "" if value is None else value
+
+
+def _ndjson_chunk(rows: list, columns: list) -> bytes:
+    return b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def _csv_chunk(rows: list, columns: list) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_cell(row.get(column)) for column in columns] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def stream_export(
+    collection,
+    query: dict,
+    sort: list,
+    model: type[BaseModel],
+    fields: Optional[set],
+    params: dict,
+    filename: str,
+) -> StreamingResponse:
+    """Stream every document matching `query`, shaped by `model`, as an NDJSON or CSV attachment"""
+    columns = [
+        name for name in (*model.model_fields, *model.model_computed_fields)
+        if fields is None or name in fields
+    ]
+    batch_size = params["batch_size"]
+    encode = _csv_chunk if params["format"] == "csv" else _ndjson_chunk
+    shape = shaper(model, fields, mode="json" if params["format"] == "csv" else "python")
+
+    async def rows():
+        cursor = collection.find(query, projection(model, fields)).sort(sort).batch_size(batch_size)
+        try:
+            if params["format"] == "csv":
+                yield _csv_chunk([dict(zip(columns, columns))], columns)
+            batch = []
+            async for document in cursor:
+                batch.append(shape(document))
+                if len(batch) >= batch_size:
+                    yield encode(batch, columns)
+                    batch = []
+            if batch:
+                yield encode(batch, columns)
+        finally:
+            # Client went away mid-export: release the server-side cursor now
+            await cursor.close()
+
+    stamp = datetime.utcnow().strftime("%Y%m%d")
+    return StreamingResponse(
+        rows(),
+        media_type=MEDIA_TYPES[params["format"]],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}-{stamp}.{params["format"]}"',
+            "Cache-Control": "no-store",
+        },
+    )
@@ -0,0 +1,369 @@
+import asyncio
+import json
+import math
+import os
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+import numpy as np
+from bson import ObjectId
+from database import service_collection
+from utils.intents import describe_service, tokenize
+
+# ==========================================
+# FAQ RETRIEVAL
+# ==========================================
+# Free-form questions the intents do not cover are answered with the closest
+# curated FAQ entry or service description. Every document is a bag of hashed
+# features (words, word bigrams, character trigrams - robust to typos and
+# word order) weighted by TF-IDF and L2-normalized. The corpus is held as a
+# column-major sparse matrix (feature -> postings of doc / weight), so scoring
+# a query is one sparse matrix-vector product in NumPy: gather the postings of
+# the query's features and np.bincount them into per-document cosine scores.
+#
+# update_service re-featurizes just the service that changed: its old row is
+# masked out of the matrix and the new version scored on the side, so no
+# rebuild happens on the request path. Every (re)build - first use,
+# FAQ_INDEX_TTL (which bounds how long another process's changes take to show
+# up), or DELTA_LIMIT changed documents - assembles a new index in a worker
+# thread while the old one keeps answering. Services refreshed meanwhile are
+# replayed onto the new index before it is swapped in.
+
+FAQ_FILE = os.getenv("FAQ_FILE")
+FAQ_INDEX_TTL = float(os.getenv("FAQ_INDEX_TTL", "300"))  # seconds
+FAQ_MIN_SCORE = float(os.getenv("FAQ_MIN_SCORE", "0.2"))  # cosine similarity
+HASH_BITS = 20  # 1M feature buckets
+DELTA_LIMIT = 64  # changed documents scored outside the matrix before a background re-assembly
+# Query features found in more than COMMON_DF of the documents (and COMMON_MIN_DOCS) are not scored
+COMMON_DF = 0.1
+COMMON_MIN_DOCS = 500
+
+FAQ_ENTRIES = [
+    {"id": "faq:track-application", "question": "How do I track the status of my application?",
+     "answer": "Open your Dashboard and go to 'My Applications'. Each application shows its current approval stage (GS, DS, ...) and status."},
+    {"id": "faq:download-certificate", "question": "Where can I download my certificate after approval?",
+     "answer": "Approved certificates appear in your Digital Wallet. Use the Download button to get the signed PDF with its QR code."},
+    {"id": "faq:certificate-not-ready", "question": "My application is approved but the certificate is not ready to download",
+     "answer": "Certificates are generated shortly after final approval. Refresh your Digital Wallet in a minute; if it still fails, contact support."},
+    {"id": "faq:rejected", "question": "Why was my application rejected and can I apply again?",
+     "answer": "The officer's comments are shown in the application's approval history. Fix the issue they mention and submit a new application."},
+    {"id": "faq:lost-nic", "question": "I lost my national identity card, how do I get a replacement?",
+     "answer": "Apply for 'NIC Replacement' under E-Services. You will need a police report of the loss and your Birth Certificate."},
+    {"id": "faq:change-address", "question": "How do I change my address or phone number?",
+     "answer": "Go to your Profile and update your phone, email or address. Your Grama Niladhari may verify a new address."},
+    {"id": "faq:find-gs", "question": "Who is my Grama Niladhari officer and how do I contact them?",
+     "answer": "Your GS section is shown on your Profile. The GS officer for that section verifies residency and character certificate requests."},
+    {"id": "faq:processing-time", "question": "How long does it take to process an application?",
+     "answer": "Processing time depends on the service and how many approval levels it needs - from 1 day for Birth Certificate copies to about 30 days for passports."},
+    {"id": "faq:payment-failed", "question": "My payment failed or I was charged twice",
+     "answer": "Failed payments are reversed automatically by PayHere within 3-5 working days. Contact support with your application ID if you were charged twice."},
+    {"id": "faq:forgot-password", "question": "I forgot my password and cannot log in",
+     "answer": "Use 'Forgot password' on the login page, or visit your Divisional Secretariat with your NIC to reset your account."},
+    {"id": "faq:documents", "question": "What documents do I need to upload with an application?",
+     "answer": "Each service lists its required documents on the application form, usually an NIC copy and a Birth Certificate."},
+    {"id": "faq:marketplace", "question": "Why am I seeing product recommendations in the marketplace?",
+     "answer": "Recommendations are based on life events from your completed services, such as a birth registration."},
+]
+
+
+# --- FEATURES ---
+
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) & ((1 << HASH_BITS) - 1)
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str) -> tuple:
+    padded = f"<{word}>"
+    return (_bucket("w:" + word),) + tuple(_bucket("c:" + padded[j:j + 3]) for j in range(len(padded) - 2))
+
+
+def features(text: str) -> Counter:
+    """Hashed feature counts: words, word bigrams and character trigrams of each word"""
+    words = tokenize(text)
+    counts = Counter()
+    for i, word in enumerate(words):
+        counts.update(_word_features(word))
+        if i:
+            counts[_bucket(f"b:{words[i - 1]} {word}")] += 1
+    return counts
+
+
+class FAQIndex:
+    """
+    TF-IDF over hashed features. Assembled documents live in a column-major
+    sparse matrix; documents changed since then are masked out of it and scored
+    from a small side list. Searching never assembles: once more than
+    DELTA_LIMIT documents changed, `needs_assembly` asks the owner to build a
+    replacement (see from_documents()).
+    """
+
+    def __init__(self):
+        self.documents = {}  # key -> {"id", "title", "answer", "counts"}
+        self._assembled = False
+        self._keys = []  # matrix row -> key
+        self._rows = {}  # key -> matrix row
+        self._live = np.zeros(0, dtype=bool)  # rows not changed since assembly
+        self._delta = {}  # key -> (sorted features, weights) of documents changed since assembly
+        self._features = np.empty(0, dtype=np.int64)  # sorted distinct features
+        self._indptr = np.zeros(1, dtype=np.int64)  # postings of _features[i]: [_indptr[i], _indptr[i+1])
+        self._doc_ids = np.empty(0, dtype=np.int32)
+        self._weights = np.empty(0, dtype=np.float32)
+        self._idf = np.empty(0, dtype=np.float32)
+        self._unseen_idf = np.float32(1)
+
+    def put(self, key: str, title: str, answer: str, text: str):
+        self.documents[key] = {"id": key, "title": title, "answer": answer, "counts": features(text)}
+        self._changed(key)
+
+    def remove(self, key: str):
+        if self.documents.pop(key, None) is not None:
+            self._changed(key)
+
+    def _changed(self, key: str):
+        if not self._assembled:
+            return
+        row = self._rows.get(key)
+        if row is not None:
+            self._live[row] = False
+        self._delta.pop(key, None)
+        if key in self.documents:
+            features, weights, _, _ = self._vector(self.documents[key]["counts"])
+            self._delta[key] = (features, weights)
+
+    @property
+    def needs_assembly(self) -> bool:
+        return len(self._delta) > DELTA_LIMIT
+
+    def _vector(self, counts: Counter):
+        """(sorted features, L2-normalized tf-idf weights, matrix positions, known-feature mask)"""
+        features = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        order = np.argsort(features)
+        features, tf = features[order], tf[order]
+
+        positions = np.searchsorted(self._features, features)
+        known = np.zeros(len(features), dtype=bool)
+        if len(self._features):
+            known = (positions < len(self._features)) & (self._features[np.minimum(positions, len(self._features) - 1)] == features)
+        idf = np.full(len(features), self._unseen_idf, dtype=np.float32)
+        idf[known] = self._idf[positions[known]]
+
+        weights = (1 + np.log(tf)) * idf
+        norm = math.sqrt(float(weights @ weights))
+        return features, weights / norm if norm else weights, positions, known
+
+    @classmethod
+    def from_documents(cls, documents: dict) -> "FAQIndex":
+        """An assembled index over already-featurized documents (e.g. a copy of another index's)"""
+        index = cls()
+        index.documents = documents
+        index.assemble()
+        return index
+
+    def assemble(self):
+        """Rebuild the sparse matrix from the stored term counts"""
+        self._keys = list(self.documents)
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        all_counts = [self.documents[key]["counts"] for key in self._keys]
+        lengths = np.fromiter((len(counts) for counts in all_counts), dtype=np.int64, count=len(all_counts))
+        total = int(lengths.sum())
+        columns = np.fromiter((f for counts in all_counts for f in counts.keys()), dtype=np.int64, count=total)
+        values = np.fromiter((v for counts in all_counts for v in counts.values()), dtype=np.float32, count=total)
+        rows = np.repeat(np.arange(len(self._keys), dtype=np.int32), lengths)
+
+        order = np.argsort(columns, kind="stable")
+        columns, rows, values = columns[order], rows[order], values[order]
+        self._features, starts, df = np.unique(columns, return_index=True, return_counts=True)
+        self._indptr = np.append(starts, total).astype(np.int64)
+
+        # Sublinear tf, smoothed idf, then L2-normalize each document
+        self._idf = (np.log((len(self._keys) + 1) / (df + 1)) + 1).astype(np.float32)
+        self._unseen_idf = np.float32(math.log(len(self._keys) + 1) + 1)
+        values = (1 + np.log(values)) * np.repeat(self._idf, df)
+        norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(self._keys)))
+        self._weights = (values / norms[rows]).astype(np.float32)
+        self._doc_ids = rows
+        self._live = np.ones(len(self._keys), dtype=bool)
+        self._delta = {}
+        self._assembled = True
+
+    def search(self, text: str, limit: int = 3) -> list:
+        """Top `limit` documents by cosine similarity: [{"id", "title", "answer", "score"}]"""
+        counts = features(text)
+        if not counts or not self.documents:
+            return []
+        features_, weights, positions, known = self._vector(counts)
+
+        results = []
+        if known.any() and len(self._keys):
+            positions, query_weights = positions[known], weights[known]
+            starts, ends = self._indptr[positions], self._indptr[positions + 1]
+            lengths = ends - starts
+            # Features in most documents (stop words, common trigrams) hardly change the ranking
+            # but dominate the work - skip them on large corpora, if the query has anything rarer
+            common = lengths > max(COMMON_MIN_DOCS, COMMON_DF * len(self._keys))
+            if common.any() and not common.all():
+                starts, query_weights, lengths = starts[~common], query_weights[~common], lengths[~common]
+
+            # Sparse matrix-vector product: the postings of every query feature, summed per document
+            gather = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            scores = np.bincount(
+                self._doc_ids[gather], weights=self._weights[gather] * np.repeat(query_weights, lengths),
+                minlength=len(self._keys),
+            )
+            scores[~self._live] = 0
+            top = np.argpartition(-scores, min(limit, len(scores)) - 1)[:limit]
+            results = [(float(scores[row]), self._keys[row]) for row in top if scores[row] > 0]
+
+        for key, (doc_features, doc_weights) in self._delta.items():
+            _, query_at, doc_at = np.intersect1d(features_, doc_features, assume_unique=True, return_indices=True)
+            score = float(weights[query_at] @ doc_weights[doc_at])
+            if score > 0:
+                results.append((score, key))
+
+        results.sort(key=lambda result: -result[0])
+        return [
+            {**{field: self.documents[key][field] for field in ("id", "title", "answer")}, "score": round(score, 4)}
+            for score, key in results[:limit]
+        ]
+
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self._features, self._indptr, self._doc_ids, self._weights, self._idf))
+
+
+# --- CORPUS ---
+
+def _service_key(service_id) -> str:
+    return f"service:{service_id}"
+
+
+def _put_service(index: FAQIndex, service_id, service: Optional[dict]):
+    """Index the current version of a service (None = deleted)"""
+    key = _service_key(service_id)
+    if service is None or not service.get("name") or not service.get("active", True):
+        index.remove(key)
+        return
+    answer = describe_service(service)
+    text = " ".join(str(part) for part in (service["name"], service.get("dept"), service.get("description"), answer) if part)
+    index.put(key, service["name"], answer, text)
+
+
+def _faq_entries() -> list:
+    entries = {entry["id"]: entry for entry in FAQ_ENTRIES}
+    if FAQ_FILE:
+        with open(FAQ_FILE, encoding="utf-8") as f:
+            entries.update((entry["id"], entry) for entry in json.load(f))
+    return list(entries.values())
+
+
+_index: Optional[FAQIndex] = None
+_built_at = None
+_lock = asyncio.Lock()
+_pending: Optional[dict] = None  # service_id -> service (None = deleted) refreshed while a build runs
+_generation = 0  # bumped by invalidate_index(), so a build started before it is not swapped in
+_reassembly = None  # background task re-assembling after DELTA_LIMIT changes
+
+SERVICE_FIELDS = {"name": 1, "dept": 1, "description": 1, "price": 1, "days": 1, "active": 1}
+
+
+def _build(entries: list, services: list) -> FAQIndex:
+    index = FAQIndex()
+    for entry in entries:
+        index.put(entry["id"], entry["question"], entry["answer"], f"{entry['question']} {entry['answer']}")
+    for service in services:
+        _put_service(index, service["_id"], service)
+    index.assemble()
+    return index
+
+
+async def _replace_index(build) -> tuple:
+    """
+    Run `build` (a coroutine producing a new index), replay services refreshed while it
+    ran, and swap the result in. Returns (index, installed); nothing is awaited between
+    the replay and the swap, so no refresh can fall in between.
+    """
+    global _index, _pending
+    generation = _generation
+    _pending = {}
+    try:
+        index = await build
+        for service_id, service in _pending.items():
+            _put_service(index, service_id, service)
+    finally:
+        _pending = None
+    if generation != _generation:
+        # invalidate_index() ran meanwhile: the next question builds from fresh data
+        return index, False
+    _index = index
+    return index, True
+
+
+async def build_index() -> FAQIndex:
+    global _built_at
+
+    async def build():
+        services = await service_collection.find({}, SERVICE_FIELDS).to_list(length=None)
+        # Featurizing and assembling is CPU work - keep it off the event loop
+        return await asyncio.to_thread(_build, _faq_entries(), services)
+
+    index, installed = await _replace_index(build())
+    if installed:
+        _built_at = time.monotonic()
+    return index
+
+
+async def _reassemble():
+    async with _lock:
+        if _index is None or not _index.needs_assembly:
+            return
+        try:
+            # Copied here, on the loop: refreshes keep changing _index.documents while the thread runs
+            await _replace_index(asyncio.to_thread(FAQIndex.from_documents, dict(_index.documents)))
+        except Exception as e:
+            # The current index keeps answering (with a longer side list) until the next build
+            print(f"⚠️  FAQ index re-assembly failed: {e}")
+
+
+def _schedule_reassembly():
+    global _reassembly
+    if _reassembly is None or _reassembly.done():
+        _reassembly = asyncio.ensure_future(_reassemble())
+
+
+async def get_index() -> FAQIndex:
+    if _index is not None and time.monotonic() - _built_at < FAQ_INDEX_TTL:
+        return _index
+    async with _lock:
+        if _index is not None and time.monotonic() - _built_at < FAQ_INDEX_TTL:
+            return _index
+        return await build_index()
+
+
+async def refresh_service(service_id: str):
+    """Re-featurize one service after it changed (the rest of the index is kept)"""
+    if _index is None and _pending is None:
+        return
+    service = await service_collection.find_one({"_id": ObjectId(service_id)}, SERVICE_FIELDS)
+    if _pending is not None:
+        # A replacement is being built from data that may predate this change
+        _pending[service_id] = service
+    if _index is not None:
+        _put_service(_index, service_id, service)
+        if _index.needs_assembly:
+            _schedule_reassembly()
+
+
+def invalidate_index():
+    """Call after bulk changes to `services`: the next question rebuilds the index"""
+    global _index, _generation
+    _index = None
+    _generation += 1
+
+
+async def answer(text: str, limit: int = 3) -> list:
+    """Closest FAQ entries / services for a free-form question"""
+    index = await get_index()
+    return index.search(text, limit)
@@ -0,0 +1,382 @@
+import asyncio
+import hashlib
+import json
+import os
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from typing import Optional
+from database import user_collection
+from utils.counters import counter_nodes, node_key, LEVELS, NATION
+from utils.pagination import encode_cursor, decode_cursor
+
+# ==========================================
+# ORG TREE
+# ==========================================
+# In-memory view of the org structure, kept in step with `users`:
+#   nation > province > district > ds_division > gs_section   (same keys as utils/counters.py)
+# Each node counts the citizens and officers in its subtree; officers (gs/ds/admin)
+# are kept as records, citizens only as counts. It also routes new applications:
+#   gs_section  -> GS officer NICs,  ds_division -> DS officer NICs
+# Loaded at startup and updated in place by every route that writes users. Every
+# HIERARCHY_CHECK_SECONDS a checksum is compared against Mongo and the tree is
+# reloaded if it has drifted (e.g. writes made by another app process).
+
+HIERARCHY_CHECK_SECONDS = int(os.getenv("HIERARCHY_CHECK_SECONDS", "300"))
+
+OFFICER_ROLES = ("gs", "ds", "admin")
+COUNT_FIELDS = {"citizen": "citizens", "gs": "gs_officers", "ds": "ds_officers", "admin": "admins"}
+OFFICER_FIELDS = ("nic", "fullname", "role", "phone", "email", "address", "reports_to") + LEVELS
+
+_officers = {}        # nic -> officer record (stored OFFICER_FIELDS + _id + node)
+_officer_ids = []     # sorted _ids, for keyset pages
+_nic_by_id = {}       # _id -> nic
+_subordinates = defaultdict(list)  # reports_to nic -> [nic, ...]
+_gs_by_section = {}   # gs_section -> [gs nic, ...] in creation order
+_ds_by_division = {}  # ds_division -> [ds nic, ...] in creation order
+_nodes = {}           # key -> {"key", "level", "name", "parent", "children", "officers", "counts"}
+_loaded = False
+_checker = None
+
+
+# --- TREE MAINTENANCE ---
+
+def _count(location: dict, role: str, delta: int) -> str:
+    """Add delta users of a role to every node on the location's path; returns the deepest key"""
+    field = COUNT_FIELDS.get(role)
+    key = NATION
+    for key, level, name, parent in counter_nodes(location):
+        node = _nodes.get(key)
+        if node is None:
+            node = _nodes[key] = {
+                "key": key, "level": level, "name": name, "parent": parent,
+                "children": set(), "officers": [], "counts": dict.fromkeys(COUNT_FIELDS.values(), 0),
+            }
+            if parent:
+                _nodes[parent]["children"].add(key)
+        if field:
+            node["counts"][field] += delta
+        if not any(node["counts"].values()):
+            # Nothing left in this subtree
+            del _nodes[key]
+            if parent in _nodes:
+                _nodes[parent]["children"].discard(key)
+    return key
+
+
+def _append(index: dict, key, nic: str):
+    if key:
+        index.setdefault(key, []).append(nic)
+
+
+def _discard(index: dict, key, nic: str):
+    nics = index.get(key)
+    if nics and nic in nics:
+        nics.remove(nic)
+        if not nics:
+            del index[key]
+
+
+def _link(record: dict):
+    nic = record["nic"]
+    record["node"] = _count(record, record["role"], 1)
+    _nodes[record["node"]]["officers"].append(nic)
+    _subordinates[record.get("reports_to")].append(nic)
+    if record["role"] == "gs":
+        _append(_gs_by_section, record.get("gs_section"), nic)
+    if record["role"] == "ds":
+        _append(_ds_by_division, record.get("ds_division"), nic)
+
+
+def _unlink(record: dict):
+    nic = record["nic"]
+    _nodes[record["node"]]["officers"].remove(nic)
+    _count(record, record["role"], -1)
+    _discard(_subordinates, record.get("reports_to"), nic)
+    _discard(_gs_by_section, record.get("gs_section"), nic)
+    _discard(_ds_by_division, record.get("ds_division"), nic)
+
+
+def _add_officer(user: dict):
+    record = {field: user[field] for field in OFFICER_FIELDS if field in user}
+    record["_id"] = user["_id"]
+    _officers[record["nic"]] = record
+    insort(_officer_ids, record["_id"])
+    _nic_by_id[record["_id"]] = record["nic"]
+    _link(record)
+
+
+def _remove_officer(nic: str):
+    record = _officers.pop(nic)
+    _unlink(record)
+    position = bisect_left(_officer_ids, record["_id"])
+    del _officer_ids[position]
+    del _nic_by_id[record["_id"]]
+
+
+def _reset():
+    global _officers, _officer_ids, _nic_by_id, _subordinates, _gs_by_section, _ds_by_division, _nodes
+    _officers, _officer_ids, _nic_by_id = {}, [], {}
+    _subordinates = defaultdict(list)
+    _gs_by_section, _ds_by_division, _nodes = {}, {}, {}
+
+
+async def load_hierarchy():
+    """Rebuild the tree from `users`: officer records + citizen counts (2 queries, concurrent)"""
+    global _loaded
+    officer_projection = {field: 1 for field in OFFICER_FIELDS}
+    officers, citizen_groups = await asyncio.gather(
+        user_collection.find({"role": {"$in": list(OFFICER_ROLES)}}, officer_projection)
+            .sort("_id", 1).to_list(length=None),
+        user_collection.aggregate([
+            {"$match": {"role": "citizen"}},
+            {"$group": {"_id": {level: f"${level}" for level in LEVELS}, "count": {"$sum": 1}}},
+        ]).to_list(length=None),
+    )
+
+    # No awaits from here on, so lookups never see a half-built tree
+    _reset()
+    for user in officers:
+        _add_officer(user)
+    for group in citizen_groups:
+        _count(group["_id"], "citizen", group["count"])
+    _loaded = True
+
+
+# --- INCREMENTAL UPDATES (called by routes after writing `users`) ---
+
+def add_user(user: dict):
+    """A user was inserted (pass the stored document, with _id)"""
+    if user.get("role") in OFFICER_ROLES:
+        if user["nic"] in _officers:
+            _remove_officer(user["nic"])
+        _add_officer(user)
+    else:
+        _count(user, user.get("role"), 1)
+
+
+def remove_user(user: dict):
+    """A user was deleted (pass at least nic, role and location)"""
+    if user["nic"] in _officers:
+        _remove_officer(user["nic"])
+    elif user.get("role") not in OFFICER_ROLES:
+        _count(user, user.get("role"), -1)
+
+
+def update_officer(nic: str, fields: dict):
+    """An officer's profile, location or reports_to changed; citizens are ignored"""
+    record = _officers.get(nic)
+    if record is None:
+        return
+    _unlink(record)
+    record.update({field: value for field, value in fields.items() if field in OFFICER_FIELDS})
+    _link(record)
+
+
+# --- LOOKUPS ---
+
+async def ensure_loaded():
+    if not _loaded:
+        await load_hierarchy()
+
+
+async def resolve_assignment(gs_section: str):
+    """(gs_nic, ds_nic) for a citizen's GS section - the DS is the one over the GS's division"""
+    await ensure_loaded()
+    gs_nics = _gs_by_section.get(gs_section)
+    if not gs_nics:
+        return None, None
+    gs_nic = gs_nics[0]
+    ds_nics = _ds_by_division.get(_officers[gs_nic].get("ds_division"))
+    return gs_nic, ds_nics[0] if ds_nics else None
+
+
+async def division_sections(ds_division: str) -> dict:
+    """{gs_section: [gs nic, ...]} for every GS section of a DS division, with or without an officer"""
+    await ensure_loaded()
+    node = _nodes.get(node_key("ds_division", ds_division))
+    sections = {child["name"]: [] for child in _children(node)} if node else {}
+    for section, nics in _gs_by_section.items():
+        in_division = [nic for nic in nics if _officers[nic].get("ds_division") == ds_division]
+        if in_division:
+            sections.setdefault(section, []).extend(in_division)
+    return sections
+
+
+def officer_view(record: dict) -> dict:
+    view = {field: record.get(field) for field in OFFICER_FIELDS}
+    view["_id"] = str(record["_id"])
+    return view
+
+
+async def list_officers(role: str = None, reports_to: str = None) -> list:
+    """Officer records (copies) in creation order, optionally filtered"""
+    await ensure_loaded()
+    nics = _subordinates.get(reports_to, []) if reports_to else _officers
+    records = [_officers[nic] for nic in nics]
+    if role:
+        records = [record for record in records if record["role"] == role]
+    return [dict(record) for record in sorted(records, key=lambda record: record["_id"])]
+
+
+async def page_officers(page: dict, transform=officer_view) -> dict:
+    """Keyset page of all officers by _id, in the same shape and cursor format as utils.pagination"""
+    await ensure_loaded()
+    start = 0
+    if page.get("cursor"):
+        _, last_id = decode_cursor(page["cursor"])
+        start = bisect_right(_officer_ids, last_id)
+    ids = _officer_ids[start:start + page["limit"] + 1]
+
+    next_cursor = None
+    if len(ids) > page["limit"]:
+        ids = ids[:page["limit"]]
+        next_cursor = encode_cursor(ids[-1], ids[-1])
+    return {
+        "items": [transform(dict(_officers[_nic_by_id[_id]])) for _id in ids],
+        "next_cursor": next_cursor,
+    }
+
+
+def _summary(node: dict) -> dict:
+    return {
+        "key": node["key"],
+        "level": node["level"],
+        "name": node["name"],
+        "parent": node["parent"],
+        "counts": dict(node["counts"]),
+    }
+
+
+def _children(node: dict) -> list:
+    return sorted((_nodes[key] for key in node["children"]), key=lambda child: child["name"])
+
+
+async def subtree(key: str = NATION, depth: Optional[int] = None) -> Optional[dict]:
+    """Node with counts and nested children, `depth` levels deep (None = all); None if unknown"""
+    await ensure_loaded()
+    node = _nodes.get(key)
+    if node is None:
+        return None
+
+    def build(node, remaining):
+        view = _summary(node)
+        if remaining is None or remaining > 0:
+            view["children"] = [build(child, None if remaining is None else remaining - 1) for child in _children(node)]
+        return view
+
+    return build(node, depth)
+
+
+async def drilldown(key: str = NATION) -> Optional[dict]:
+    """Node summary, its path from the nation, direct children and the officers placed at it"""
+    await ensure_loaded()
+    node = _nodes.get(key)
+    if node is None:
+        return None
+    path = []
+    ancestor = node["parent"]
+    while ancestor:
+        path.insert(0, {"key": ancestor, "name": _nodes[ancestor]["name"]})
+        ancestor = _nodes[ancestor]["parent"]
+    return {
+        **_summary(node),
+        "path": path,
+        "children": [_summary(child) for child in _children(node)],
+        "officers": [officer_view(_officers[nic]) for nic in node["officers"]],
+    }
+
+
+# --- DRIFT CHECK ---
+
+def _checksum(shape: dict) -> str:
+    return hashlib.sha256(json.dumps(shape, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _memory_shape() -> dict:
+    # Users placed directly at each node (subtree counts minus the children's)
+    placed = {}
+    for key, node in _nodes.items():
+        own = dict(node["counts"])
+        for child in node["children"]:
+            for field, value in _nodes[child]["counts"].items():
+                own[field] -= value
+        for field, value in own.items():
+            if value:
+                placed[f"{key}|{field}"] = value
+    officers = {nic: [record["node"], record["role"], record.get("reports_to")] for nic, record in _officers.items()}
+    return {"placed": placed, "officers": officers}
+
+
+async def _mongo_shape() -> dict:
+    groups = await user_collection.aggregate([
+        {"$group": {
+            "_id": {"role": "$role", **{level: f"${level}" for level in LEVELS}},
+            "count": {"$sum": 1},
+            "officers": {"$push": {"$cond": [
+                {"$in": ["$role", list(OFFICER_ROLES)]},
+                {"nic": "$nic", "reports_to": "$reports_to"},
+                "$$REMOVE",
+            ]}},
+        }},
+    ]).to_list(length=None)
+
+    placed, officers = defaultdict(int), {}
+    for group in groups:
+        role = group["_id"].get("role")
+        if role not in COUNT_FIELDS:
+            continue
+        key = counter_nodes(group["_id"])[-1][0]
+        placed[f"{key}|{COUNT_FIELDS[role]}"] += group["count"]
+        for officer in group["officers"]:
+            officers[officer["nic"]] = [key, role, officer.get("reports_to")]
+    return {"placed": dict(placed), "officers": officers}
+
+
+async def verify_hierarchy(repair: bool = True) -> dict:
+    """Compare the tree's checksum with one computed from Mongo (1 aggregation); reload on drift"""
+    await ensure_loaded()
+    memory, mongo = _memory_shape(), await _mongo_shape()
+    memory_checksum, mongo_checksum = _checksum(memory), _checksum(mongo)
+    drift = []
+    if memory_checksum != mongo_checksum:
+        for entry in sorted(set(memory["placed"]) | set(mongo["placed"])):
+            held, actual = memory["placed"].get(entry, 0), mongo["placed"].get(entry, 0)
+            if held != actual:
+                key, field = entry.split("|")
+                drift.append({"key": key, "field": field, "tree": held, "mongo": actual})
+        for nic in sorted(set(memory["officers"]) | set(mongo["officers"])):
+            if memory["officers"].get(nic) != mongo["officers"].get(nic):
+                drift.append({"officer": nic, "tree": memory["officers"].get(nic), "mongo": mongo["officers"].get(nic)})
+        if repair:
+            await load_hierarchy()
+    return {
+        "in_sync": memory_checksum == mongo_checksum,
+        "checksum": memory_checksum,
+        "mongo_checksum": mongo_checksum,
+        "drift": drift,
+        "repaired": bool(drift) and repair,
+    }
+
+
+async def _check_loop():
+    while True:
+        await asyncio.sleep(HIERARCHY_CHECK_SECONDS)
+        try:
+            result = await verify_hierarchy()
+            if not result["in_sync"]:
+                print(f"⚠️  Org tree drifted from Mongo ({len(result['drift'])} differences), reloaded")
+        except Exception as e:
+            print(f"⚠️  Org tree check failed: {e}")
+
+
+async def start_hierarchy_index():
+    global _checker
+    await load_hierarchy()
+    _checker = asyncio.create_task(_check_loop())
+    print(f"✅ Org tree loaded ({len(_officers)} officers, {len(_nodes)} nodes)")
+
+
+async def stop_hierarchy_index():
+    if _checker is not None:
+        _checker.cancel()
+        await asyncio.gather(_checker, return_exceptions=True)
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Optional
+from database import service_collection
+
+# ==========================================
+# CHATBOT INTENTS
+# ==========================================
+# Intents are data: DEFAULT_INTENTS below, plus an optional JSON file
+# (CHAT_INTENTS_FILE, same shape, entries override by name), plus one intent
+# per active service in `services`. They are compiled once into a token index:
+# a message is tokenized (whole words only - "hi" no longer matches "this") and
+# each token looks up the phrases starting with it, so matching is a single
+# pass whatever the number of intents. The highest-priority matched intent
+# wins; ties go to the one mentioned first.
+#
+# An intent's "keywords" entries are alternatives. Each is a phrase
+# ("identity card") or a list of phrases that must all appear (["birth", "certificate"]).
+
+CHAT_INTENTS_FILE = os.getenv("CHAT_INTENTS_FILE")
+CHAT_INTENTS_TTL = float(os.getenv("CHAT_INTENTS_TTL", "300"))  # seconds, picks up service changes
+# Above the generic payment / greeting intents, below the curated service ones
+SERVICE_INTENT_PRIORITY = 25
+
+DEFAULT_INTENTS = [
+    {"name": "passport", "priority": 80, "keywords": ["passport"],
+     "response": "To apply for a Passport, go to 'E-Services' -> 'Travel & Visa'. The fee is LKR 20,000 for normal service."},
+    {"name": "nic", "priority": 70, "keywords": ["nic", "identity"],
+     "response": "National Identity Cards (NIC) are issued by the DRP. You need your Birth Certificate and a GS Character Certificate to apply."},
+    {"name": "birth_certificate", "priority": 60, "keywords": [["birth", "certificate"]],
+     "response": "You can request a copy of a Birth Certificate instantly via this portal. Go to 'E-Services' -> 'Personal Identity'."},
+    {"name": "police_clearance", "priority": 50, "keywords": ["police"],
+     "response": "Police Clearance Reports take approximately 14 days. You can apply online and track the status in your Dashboard."},
+    {"name": "driving_license", "priority": 40, "keywords": ["driver", "driving", "license", "licence"],
+     "response": "Driving Licenses are handled by the Dept of Motor Traffic. We currently offer Revenue License renewals."},
+    {"name": "grama_niladhari", "priority": 30, "keywords": ["grama", "gs", "niladhari"],
+     "response": "Your Grama Niladhari (GS) must verify all residency and character certificate requests before they are issued."},
+    {"name": "payment", "priority": 20, "keywords": ["payment", "fee", "pay"],
+     "response": "We accept VISA, MasterCard, and LankaQR. All payments are secured via PayHere."},
+    {"name": "greeting", "priority": 10, "keywords": ["hello", "hi", "hey", "ayubowan"],
+     "response": "Ayubowan! I am the Smart Citizen Virtual Assistant. How can I help you today?"},
+]
+
+FALLBACK = {
+    "name": "fallback",
+    "response": "I am sorry, I didn't quite understand that. Try asking about 'Passports', 'NIC', 'Birth Certificates', or 'Payments'.",
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(token: str) -> str:
+    # Plurals match their singular keyword ("passports", "fees")
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    return [_normalize(token) for token in _TOKEN.findall(text.lower())]
+
+
+class IntentMatcher:
+    """Intents compiled into a first-token -> phrases index"""
+
+    def __init__(self, intents: list):
+        self.intents = sorted(intents, key=lambda intent: -intent.get("priority", 0))
+        self._phrases = {}  # phrase tokens -> phrase id
+        self._index = defaultdict(list)  # first token -> [(phrase tokens, phrase id)]
+        self._groups = []  # (intent position, [phrase ids that must all appear])
+        self._groups_by_phrase = defaultdict(list)  # phrase id -> [group ids]
+
+        for position, intent in enumerate(self.intents):
+            for keyword in intent["keywords"]:
+                phrases = [keyword] if isinstance(keyword, str) else keyword
+                phrase_ids = [self._phrase_id(phrase) for phrase in phrases]
+                if None in phrase_ids:
+                    continue
+                group_id = len(self._groups)
+                self._groups.append((position, phrase_ids))
+                for phrase_id in set(phrase_ids):
+                    self._groups_by_phrase[phrase_id].append(group_id)
+
+    def _phrase_id(self, phrase: str) -> Optional[int]:
+        tokens = tuple(tokenize(phrase))
+        if not tokens:
+            return None
+        if tokens not in self._phrases:
+            self._phrases[tokens] = len(self._phrases)
+            self._index[tokens[0]].append((tokens, self._phrases[tokens]))
+        return self._phrases[tokens]
+
+    def match(self, message: str) -> dict:
+        """The best intent for `message`, or FALLBACK"""
+        tokens = tokenize(message)
+        found = {}  # phrase id -> first token position
+        for i, token in enumerate(tokens):
+            for phrase, phrase_id in self._index.get(token, ()):
+                if phrase_id not in found and tuple(tokens[i:i + len(phrase)]) == phrase:
+                    found[phrase_id] = i
+
+        best = None  # (intent position, first mention)
+        for phrase_id in found:
+            for group_id in self._groups_by_phrase[phrase_id]:
+                position, phrase_ids = self._groups[group_id]
+                if all(required in found for required in phrase_ids):
+                    candidate = (position, max(found[required] for required in phrase_ids))
+                    if best is None or candidate < best:
+                        best = candidate
+        return self.intents[best[0]] if best else FALLBACK
+
+
+def describe_service(service: dict) -> str:
+    """One-paragraph answer about a configured service"""
+    name = service["name"]
+    details = [f"{name} is handled by {service['dept']}." if service.get("dept") else f"{name} is available on this portal."]
+    if service.get("price") is not None:
+        details.append(f"The fee is LKR {service['price']:,.0f}.")
+    if service.get("days") is not None:
+        details.append(f"Processing takes about {service['days']} day(s).")
+    return " ".join(details)
+
+
+def service_intent(service: dict) -> Optional[dict]:
+    """Intent answering questions about one configured service"""
+    name = service.get("name")
+    if not name or not service.get("active", True):
+        return None
+    return {
+        "name": f"service:{name}",
+        "priority": SERVICE_INTENT_PRIORITY,
+        "keywords": [name],
+        "response": describe_service(service),
+    }
+
+
+def _configured_intents() -> list:
+    intents = {intent["name"]: intent for intent in DEFAULT_INTENTS}
+    if CHAT_INTENTS_FILE:
+        with open(CHAT_INTENTS_FILE, encoding="utf-8") as f:
+            intents.update((intent["name"], intent) for intent in json.load(f))
+    return list(intents.values())
+
+
+_matcher: Optional[IntentMatcher] = None
+_built_at = None
+_stale = False
+_lock = asyncio.Lock()
+
+
+async def build_matcher() -> IntentMatcher:
+    global _matcher, _built_at, _stale
+    _stale = False
+    intents = _configured_intents()
+    async for service in service_collection.find({}, {"name": 1, "dept": 1, "price": 1, "days": 1, "active": 1}):
+        intent = service_intent(service)
+        if intent:
+            intents.append(intent)
+    _matcher, _built_at = IntentMatcher(intents), time.monotonic()
+    return _matcher
+
+
+async def get_matcher() -> IntentMatcher:
+    if _matcher is not None and not _stale and time.monotonic() - _built_at < CHAT_INTENTS_TTL:
+        return _matcher
+    async with _lock:
+        if _matcher is not None and not _stale and time.monotonic() - _built_at < CHAT_INTENTS_TTL:
+            return _matcher
+        return await build_matcher()
+
+
+def invalidate_intents():
+    """Call after changing `services`: the next message recompiles the matcher"""
+    global _stale
+    _stale = True
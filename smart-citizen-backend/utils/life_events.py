@@ -0,0 +1,171 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Optional
+from pymongo import UpdateOne
+from database import application_collection, user_collection, life_event_rule_collection
+from utils.user_cache import invalidate_user
+
+# ==========================================
+# LIFE EVENTS
+# ==========================================
+# A completed service marks a life event (Birth Certificate -> "Birth") that
+# drives marketplace recommendations. Each user's events are materialized on
+# their document as `life_events` when an application reaches Completed, so
+# the recommendations endpoint reads them from the cached principal.
+# Users created before this existed get theirs computed on first use
+# (or all at once with `python -m utils.life_events`).
+#
+# Which service marks which event is data: the `life_event_rules` collection
+# holds {keyword, trigger, order} rules, matched case-insensitively against
+# the service name in `order`, first match wins. Each process caches the
+# rules like the fee table (utils/revenue.py); admins edit them through
+# /api/admin/life-event-rules, so a new service needs a rule, not a release.
+
+RULES_TTL = float(os.getenv("LIFE_EVENT_RULES_TTL", "300"))  # seconds, picks up rule edits
+# Written to `life_event_rules` when it is empty (the mapping this module used to hardcode)
+DEFAULT_RULES = (
+    {"keyword": "Birth", "trigger": "Birth", "order": 1},
+    {"keyword": "Marriage", "trigger": "Marriage", "order": 2},
+    {"keyword": "Vehicle", "trigger": "Vehicle", "order": 3},
+)
+# Shown to users without any life event yet
+DEFAULT_TRIGGERS = ("General",)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+# --- RULES ---
+
+def resolve_trigger(rules: tuple, service_type: Optional[str]) -> Optional[str]:
+    """Trigger of `service_type` from ((casefolded keyword, trigger), ...) rules"""
+    name = (service_type or "").casefold()
+    for keyword, trigger in rules:
+        if keyword in name:
+            return trigger
+    return None
+
+
+def resolve_triggers(rules: tuple, service_types) -> list:
+    """Distinct triggers of `service_types`, in first-seen order"""
+    triggers = (resolve_trigger(rules, service_type) for service_type in service_types)
+    return list(dict.fromkeys(trigger for trigger in triggers if trigger))
+
+
+_rules: Optional[tuple] = None
+_loaded_at = None
+_stale = False
+_lock = asyncio.Lock()
+
+
+async def load_rules() -> tuple:
+    global _rules, _loaded_at, _stale
+    _stale = False
+    rules = await life_event_rule_collection.find({}, {"_id": 0}).sort([("order", 1), ("keyword", 1)]).to_list(length=None)
+    if not rules:
+        # Upserts, so processes starting together do not seed twice
+        await life_event_rule_collection.bulk_write([
+            UpdateOne({"keyword": rule["keyword"]}, {"$setOnInsert": rule}, upsert=True) for rule in DEFAULT_RULES
+        ], ordered=False)
+        rules = DEFAULT_RULES
+    _rules = tuple(
+        (rule["keyword"].casefold(), rule["trigger"])
+        for rule in rules
+        if rule.get("keyword") and rule.get("trigger")
+    )
+    _loaded_at = time.monotonic()
+    return _rules
+
+
+async def rule_table() -> tuple:
+    if _rules is not None and not _stale and time.monotonic() - _loaded_at < RULES_TTL:
+        return _rules
+    async with _lock:
+        if _rules is not None and not _stale and time.monotonic() - _loaded_at < RULES_TTL:
+            return _rules
+        return await load_rules()
+
+
+async def trigger_for(service_type: Optional[str]) -> Optional[str]:
+    """Life-event trigger of a service type (cached rules, no query)"""
+    return resolve_trigger(await rule_table(), service_type)
+
+
+async def triggers_for(service_types) -> list:
+    return resolve_triggers(await rule_table(), service_types)
+
+
+def invalidate_rules():
+    """Call after changing life_event_rules: the next lookup reloads them"""
+    global _stale
+    _stale = True
+
+
+# --- MATERIALIZED EVENTS ---
+
+
+async def record_life_events(applications: list):
+    """Add the triggers of just-completed applications to their applicants (one bulk write)"""
+    rules = await rule_table()
+    by_nic = defaultdict(list)
+    for application in applications:
+        trigger = resolve_trigger(rules, application.get("service_type"))
+        if trigger:
+            by_nic[application["applicant_nic"]].append(trigger)
+    if not by_nic:
+        return
+    # Users not materialized yet are skipped: their first read computes everything
+    await user_collection.bulk_write([
+        UpdateOne({"nic": nic, "life_events": {"$exists": True}},
+                  {"$addToSet": {"life_events": {"$each": triggers}}})
+        for nic, triggers in by_nic.items()
+    ], ordered=False)
+    invalidate_user(*by_nic)
+
+
+async def life_events(user: dict) -> list:
+    """The user's life-event triggers (`user` is the principal); materializes them on first use"""
+    if "life_events" in user:
+        return user["life_events"]
+    cursor = application_collection.find(
+        {"applicant_nic": user["nic"], "status": "Completed"}, {"service_type": 1, "_id": 0}
+    )
+    events = await triggers_for([app.get("service_type") async for app in cursor])
+    await user_collection.update_one(
+        {"nic": user["nic"], "life_events": {"$exists": False}}, {"$set": {"life_events": events}}
+    )
+    invalidate_user(user["nic"])
+    return events
+
+
+async def backfill_life_events() -> int:
+    """Recompute every user's life_events from their completed applications (run after editing rules)"""
+    rules = await load_rules()
+    completed = defaultdict(list)
+    async for group in application_collection.aggregate([
+        {"$match": {"status": "Completed"}},
+        {"$group": {"_id": "$applicant_nic", "services": {"$addToSet": "$service_type"}}},
+    ]):
+        completed[group["_id"]] = group["services"]
+
+    updated, operations = 0, []
+    async for user in user_collection.find({}, {"nic": 1, "_id": 0}):
+        events = resolve_triggers(rules, completed.get(user.get("nic"), []))
+        operations.append(UpdateOne({"nic": user.get("nic")}, {"$set": {"life_events": events}}))
+        if len(operations) == BACKFILL_BATCH_SIZE:
+            await user_collection.bulk_write(operations, ordered=False)
+            updated, operations = updated + len(operations), []
+    if operations:
+        await user_collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    return updated
+
+
+if __name__ == "__main__":
+    async def main():
+        print("🔄 Materializing life events from completed applications...")
+        count = await backfill_life_events()
+        print(f"✅ life_events set on {count} users")
+
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+import base64
+import json
+from datetime import datetime
+from typing import Generic, List, Optional, TypeVar
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from pymongo import ASCENDING, DESCENDING
+
+# Page size limits shared by every list endpoint
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """Response model of a paginated list endpoint"""
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+def page_params(
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from the previous page"),
+) -> dict:
+    """Dependency: ?limit=&cursor= query parameters for keyset pagination"""
+    return {"limit": limit, "cursor": cursor}
+
+
+# --- CURSOR ENCODING ---
+# A cursor is the (sort_key, _id) of the last item on a page, tagged with the
+# sort value's type so datetimes and ObjectIds round-trip exactly.
+
+def encode_cursor(sort_value, doc_id: ObjectId) -> str:
+    if isinstance(sort_value, datetime):
+        value = {"t": "dt", "v": sort_value.isoformat()}
+    elif isinstance(sort_value, ObjectId):
+        value = {"t": "oid", "v": str(sort_value)}
+    else:
+        value = {"t": "raw", "v": sort_value}
+    payload = json.dumps({"k": value, "id": str(doc_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value = payload["k"]
+        if value["t"] == "dt":
+            sort_value = datetime.fromisoformat(value["v"])
+        elif value["t"] == "oid":
+            sort_value = ObjectId(value["v"])
+        else:
+            sort_value = value["v"]
+        return sort_value, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+async def paginate(
+    collection,
+    query: dict,
+    page: dict,
+    sort_field: str = "_id",
+    direction: int = DESCENDING,
+    projection: Optional[dict] = None,
+    transform=None,
+) -> dict:
+    """
+    Fetch one page of `query` ordered by (sort_field, _id).
+    Returns {"items": [...], "next_cursor": str | None}; next_cursor is None on the last page.
+    Items are the raw documents (ObjectIds included) unless a transform is given; return the
+    page with serialization.respond().
+    The collection needs an index on the query's equality fields followed by (sort_field, _id).
+    """
+    limit = page["limit"]
+    comparator = "$lt" if direction == DESCENDING else "$gt"
+
+    filters = dict(query)
+    if page.get("cursor"):
+        last_value, last_id = decode_cursor(page["cursor"])
+        if sort_field == "_id":
+            keyset = {"_id": {comparator: last_id}}
+        else:
+            keyset = {"$or": [
+                {sort_field: {comparator: last_value}},
+                {sort_field: last_value, "_id": {comparator: last_id}},
+            ]}
+        filters = {"$and": [query, keyset]} if query else keyset
+
+    sort = [("_id", direction)] if sort_field == "_id" else [(sort_field, direction), ("_id", direction)]
+    if projection:
+        # The cursor is built from the last row's sort key
+        projection = {**projection, sort_field: 1, "_id": 1}
+
+    # Fetch one extra row to learn whether another page exists
+    cursor = collection.find(filters, projection).sort(sort).limit(limit + 1)
+    documents = await cursor.to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["_id"])
+
+    return {
+        "items": [transform(document) for document in documents] if transform else documents,
+        "next_cursor": next_cursor,
+    }
+
@@ -0,0 +1,58 @@
+from typing import Annotated, Optional
+from fastapi import HTTPException, Query
+from pydantic import BaseModel, BeforeValidator
+
+# ==========================================
+# RESPONSE MODELS -> MONGO PROJECTIONS
+# ==========================================
+# A response model names the Mongo field each attribute is read from with
+# validation_alias (default: the attribute's own name). projection() turns the
+# model - or the ?fields= subset a caller asked for - into a Mongo projection, so
+# only those fields leave the database; shaper() turns fetched documents into
+# JSON-ready dicts. Every attribute needs a default, so sparse documents validate.
+# Routes declare the model as response_model (for the API docs) and return the
+# shaped data with serialization.respond(), so it is validated once, not twice.
+
+# ObjectId -> str while validating
+ObjectIdStr = Annotated[str, BeforeValidator(str)]
+
+
+def _source(name: str, field) -> str:
+    alias = field.validation_alias
+    return alias if isinstance(alias, str) else name
+
+
+def sparse_fields(model: type[BaseModel]):
+    """Dependency factory: ?fields=a,b validated against the model; None means every field"""
+    known = set(model.model_fields) | set(model.model_computed_fields)
+
+    def dependency(fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,fullname")):
+        if not fields:
+            return None
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = sorted(requested - known)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+        return requested
+
+    return dependency
+
+
+def projection(model: type[BaseModel], fields: Optional[set] = None) -> dict:
+    """Mongo projection reading only the documents fields behind `fields` (all of the model's by default)"""
+    sources = {
+        _source(name, field)
+        for name, field in model.model_fields.items()
+        if fields is None or name in fields
+    }
+    if not sources:
+        # Only computed fields asked for - still an inclusion projection
+        return {"_id": 1}
+    return {**{source: 1 for source in sources}, "_id": 1 if "_id" in sources else 0}
+
+
+def shaper(model: type[BaseModel], fields: Optional[set] = None, mode: str = "python"):
+    """Transform for fetched documents: validate into the model, dump only the requested fields"""
+    def shape(document: dict) -> dict:
+        return model.model_validate(document).model_dump(mode=mode, include=fields)
+    return shape
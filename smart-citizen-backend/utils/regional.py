@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from utils import hierarchy, stats
+
+# ==========================================
+# REGIONAL REPORTS
+# ==========================================
+# Per-GS-section application, completion and processing figures for one DS
+# division: the division's sections and GS officers come from the org tree,
+# the figures from one aggregation grouped on assigned_gs (stats.gs_performance).
+# DS officers keep this page open all day, so each process caches a division's
+# report for REGIONAL_REPORT_TTL seconds, and concurrent requests for an
+# expired report share a single recomputation.
+
+REGIONAL_REPORT_TTL = float(os.getenv("REGIONAL_REPORT_TTL", "60"))  # seconds
+
+_reports = {}   # ds_division -> (computed_at, report)
+_inflight = {}  # ds_division -> task computing its report
+
+
+def _rate(part: int, whole: int) -> str:
+    return f"{(part / whole * 100) if whole > 0 else 0:.1f}%"
+
+
+def _days(days) -> str:
+    return f"{days:.1f} days" if days is not None else "N/A"
+
+
+def _section_figures(performance: dict, gs_nics: list) -> dict:
+    """Sum the officers' figures; processing time is averaged over completed applications"""
+    figures = {"applications": 0, "completed": 0, "rejected": 0, "processing_days": 0.0}
+    for nic in gs_nics:
+        counts = performance.get(nic)
+        if not counts:
+            continue
+        figures["applications"] += counts["total"]
+        figures["completed"] += counts["approved"]
+        figures["rejected"] += counts["rejected"]
+        if counts["avg_processing_days"] is not None:
+            figures["processing_days"] += counts["avg_processing_days"] * counts["approved"]
+    return figures
+
+
+async def _compute(ds_division: str) -> dict:
+    sections = await hierarchy.division_sections(ds_division)
+    performance = await stats.gs_performance([nic for nics in sections.values() for nic in nics])
+
+    rows, totals = [], {"applications": 0, "completed": 0, "rejected": 0, "processing_days": 0.0}
+    for name, gs_nics in sorted(sections.items()):
+        figures = _section_figures(performance, gs_nics)
+        for field in totals:
+            totals[field] += figures[field]
+        completed = figures["completed"]
+        rows.append({
+            "name": name,
+            "gs_officers": len(gs_nics),
+            "applications": figures["applications"],
+            "completed": completed,
+            "rejected": figures["rejected"],
+            "completion_rate": _rate(completed, figures["applications"]),
+            "average_processing_time": _days(figures["processing_days"] / completed if completed else None),
+        })
+
+    completed = totals["completed"]
+    report = {
+        "division": ds_division,
+        "total_gs_sections": len(rows),
+        "total_applications": totals["applications"],
+        "completed": completed,
+        "rejected": totals["rejected"],
+        "completion_rate": _rate(completed, totals["applications"]),
+        "average_processing_time": _days(totals["processing_days"] / completed if completed else None),
+        "sections": rows,
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+    _reports[ds_division] = (time.monotonic(), report)
+    return report
+
+
+async def regional_report(ds_division: str) -> dict:
+    """A division's report: cached for REGIONAL_REPORT_TTL, one recomputation at a time"""
+    cached = _reports.get(ds_division)
+    if cached and time.monotonic() - cached[0] < REGIONAL_REPORT_TTL:
+        return cached[1]
+    task = _inflight.get(ds_division)
+    if task is None:
+        task = _inflight[ds_division] = asyncio.ensure_future(_compute(ds_division))
+        task.add_done_callback(lambda done: _inflight.pop(ds_division) if _inflight.get(ds_division) is done else None)
+    # Shielded: a client disconnecting must not cancel the others' computation
+    return await asyncio.shield(task)
@@ -0,0 +1,250 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+from pymongo import UpdateOne, ReplaceOne
+from database import application_collection, service_collection, revenue_collection
+
+# ==========================================
+# SERVICE FEES & REVENUE ROLLUPS
+# ==========================================
+# create_application snapshots the fee of the requested service (from
+# `services`) on the application as `fee`, so later price changes do not
+# rewrite history. apply_transitions (utils/counters.py) then adds the fee of
+# every application reaching Completed to the `revenue` of its hierarchy
+# counters and to a daily bucket per (day, DS division, service) in
+# `revenue_rollups`; withdrawing a completed application takes it back out.
+# Revenue endpoints read those instead of scanning applications.
+# `python -m utils.revenue` snapshots fees on older applications and rebuilds
+# the buckets and counters from scratch.
+
+FEE_TABLE_TTL = float(os.getenv("FEE_TABLE_TTL", "300"))  # seconds, picks up price changes
+# Charged for service types with no matching entry in `services` (the old flat rate)
+DEFAULT_FEE = float(os.getenv("DEFAULT_SERVICE_FEE", "1500"))
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+# --- FEES ---
+
+def resolve_fee(fees: dict, service_type: Optional[str]) -> float:
+    """Fee of `service_type` from a {casefolded service name: price} table"""
+    name = (service_type or "").casefold()
+    if not name:
+        return DEFAULT_FEE
+    if name in fees:
+        return fees[name]
+    # Application titles and service names drift ("Passport" / "Passport Issue"): longest overlap wins
+    overlapping = [key for key in fees if key and (key in name or name in key)]
+    return fees[max(overlapping, key=len)] if overlapping else DEFAULT_FEE
+
+
+_fees: Optional[dict] = None
+_loaded_at = None
+_stale = False
+_lock = asyncio.Lock()
+
+
+async def load_fees() -> dict:
+    global _fees, _loaded_at, _stale
+    _stale = False
+    fees = {}
+    async for service in service_collection.find({}, {"name": 1, "price": 1, "_id": 0}):
+        if service.get("name") and service.get("price") is not None:
+            fees[service["name"].casefold()] = float(service["price"])
+    _fees, _loaded_at = fees, time.monotonic()
+    return _fees
+
+
+async def fee_table() -> dict:
+    if _fees is not None and not _stale and time.monotonic() - _loaded_at < FEE_TABLE_TTL:
+        return _fees
+    async with _lock:
+        if _fees is not None and not _stale and time.monotonic() - _loaded_at < FEE_TABLE_TTL:
+            return _fees
+        return await load_fees()
+
+
+async def fee_for(service_type: Optional[str]) -> float:
+    """Current fee of a service type (cached table, no query)"""
+    return resolve_fee(await fee_table(), service_type)
+
+
+async def application_fee(application: dict) -> float:
+    """The fee snapshotted at submission; applications from before snapshots get today's"""
+    if application.get("fee") is not None:
+        return application["fee"]
+    return await fee_for(application.get("service_type"))
+
+
+def invalidate_fees():
+    """Call after changing service prices: the next lookup reloads the table"""
+    global _stale
+    _stale = True
+
+
+# --- DAILY BUCKETS ---
+
+def day_bucket(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def bucket_key(day: datetime, ds_division: Optional[str], service_type: Optional[str]) -> str:
+    return f"{day:%Y-%m-%d}|{ds_division or ''}|{service_type or ''}"
+
+
+async def apply_revenue(completions: list):
+    """
+    Add (sign=1) or take back (sign=-1) completed applications' fees, in one bulk_write.
+    Each completion is (application, fee, sign). Additions land on today's bucket,
+    removals on the day the application was completed.
+    """
+    increments = defaultdict(lambda: {"count": 0, "revenue": 0.0})
+    buckets = {}
+    today = day_bucket(datetime.utcnow())
+    for application, fee, sign in completions:
+        day = today if sign > 0 else day_bucket(application.get("completed_at") or application.get("created_at") or today)
+        key = bucket_key(day, application.get("ds_division"), application.get("service_type"))
+        buckets[key] = {
+            "day": day,
+            "province": application.get("province"),
+            "district": application.get("district"),
+            "ds_division": application.get("ds_division"),
+            "service_type": application.get("service_type"),
+        }
+        increments[key]["count"] += sign
+        increments[key]["revenue"] += sign * fee
+
+    requests = [
+        UpdateOne({"_id": key}, {"$inc": inc, "$setOnInsert": buckets[key]}, upsert=True)
+        for key, inc in increments.items()
+        if inc["count"] or inc["revenue"]
+    ]
+    if requests:
+        await revenue_collection.bulk_write(requests, ordered=False)
+
+
+async def revenue_breakdown(start: Optional[date] = None, end: Optional[date] = None, ds_division: Optional[str] = None) -> dict:
+    """Revenue per service and per DS division over [start, end] (inclusive days), one aggregation"""
+    match = {}
+    if start or end:
+        match["day"] = {}
+        if start:
+            match["day"]["$gte"] = datetime(start.year, start.month, start.day)
+        if end:
+            match["day"]["$lt"] = datetime(end.year, end.month, end.day) + timedelta(days=1)
+    if ds_division:
+        match["ds_division"] = ds_division
+
+    def totals(field):
+        return [
+            {"$group": {"_id": field, "count": {"$sum": "$count"}, "revenue": {"$sum": "$revenue"}}},
+            {"$sort": {"revenue": -1, "_id": 1}},
+        ]
+
+    pipeline = [{"$match": match}] if match else []
+    pipeline.append({"$facet": {"services": totals("$service_type"), "divisions": totals("$ds_division")}})
+    rows = await revenue_collection.aggregate(pipeline).to_list(length=1)
+    row = rows[0] if rows else {}
+
+    breakdown = [
+        {"service": group["_id"], "count": group["count"], "revenue": group["revenue"]}
+        for group in row.get("services", [])
+    ]
+    return {
+        "total_revenue": sum(entry["revenue"] for entry in breakdown),
+        "breakdown": breakdown,
+        "divisions": [
+            {"division": group["_id"], "count": group["count"], "revenue": group["revenue"]}
+            for group in row.get("divisions", [])
+        ],
+    }
+
+
+# ==========================================
+# BACKFILL
+# ==========================================
+
+async def backfill_fees() -> int:
+    """Snapshot today's fee on every application that has none (one update per service type)"""
+    fees = await load_fees()
+    updated = 0
+    # Missing or null: the applications application_fee() prices at today's fee
+    for service_type in await application_collection.distinct("service_type", {"fee": None}):
+        result = await application_collection.update_many(
+            {"service_type": service_type, "fee": None},
+            {"$set": {"fee": resolve_fee(fees, service_type)}}
+        )
+        updated += result.modified_count
+    return updated
+
+
+async def rebuild_rollups() -> int:
+    """Recompute every daily bucket from completed applications; returns the bucket count"""
+    pipeline = [
+        {"$match": {"status": "Completed"}},
+        {"$group": {
+            "_id": {
+                # Older documents have no completed_at: fall back to the last approval, then submission
+                "day": {"$dateTrunc": {"unit": "day", "date": {"$ifNull": [
+                    "$completed_at",
+                    {"$dateFromString": {
+                        "dateString": {"$arrayElemAt": ["$approval_chain.timestamp", -1]},
+                        "onError": None,
+                        "onNull": None,
+                    }},
+                    "$created_at",
+                ]}}},
+                "ds_division": "$ds_division",
+                "service_type": "$service_type",
+            },
+            "province": {"$first": "$province"},
+            "district": {"$first": "$district"},
+            "count": {"$sum": 1},
+            "revenue": {"$sum": {"$ifNull": ["$fee", 0]}},
+        }},
+    ]
+    keys, operations = set(), []
+    async for group in application_collection.aggregate(pipeline, allowDiskUse=True):
+        bucket = group["_id"]
+        key = bucket_key(bucket["day"], bucket.get("ds_division"), bucket.get("service_type"))
+        keys.add(key)
+        operations.append(ReplaceOne({"_id": key}, {
+            "day": bucket["day"],
+            "province": group.get("province"),
+            "district": group.get("district"),
+            "ds_division": bucket.get("ds_division"),
+            "service_type": bucket.get("service_type"),
+            "count": group["count"],
+            "revenue": group["revenue"],
+        }, upsert=True))
+        if len(operations) == BACKFILL_BATCH_SIZE:
+            await revenue_collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await revenue_collection.bulk_write(operations, ordered=False)
+
+    # Buckets with no completed applications left
+    stale = [bucket["_id"] async for bucket in revenue_collection.find({}, {"_id": 1}) if bucket["_id"] not in keys]
+    for i in range(0, len(stale), BACKFILL_BATCH_SIZE):
+        await revenue_collection.delete_many({"_id": {"$in": stale[i:i + BACKFILL_BATCH_SIZE]}})
+    return len(keys)
+
+
+if __name__ == "__main__":
+    from utils.counters import backfill_locations, reconcile_counters
+
+    async def main():
+        located = await backfill_locations()
+        if located:
+            print(f"✅ location set on {located} older applications")
+        print("🔄 Snapshotting service fees on older applications...")
+        print(f"✅ fee set on {await backfill_fees()} applications")
+        print("🔄 Rebuilding daily revenue rollups...")
+        print(f"✅ {await rebuild_rollups()} revenue buckets rebuilt")
+        result = await reconcile_counters()
+        print(f"✅ {result['nodes']} counter nodes rebuilt with revenue, {len(result['drift'])} drifted")
+
+    asyncio.run(main())
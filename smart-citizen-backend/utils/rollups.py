@@ -0,0 +1,259 @@
+import asyncio
+import os
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from pymongo import UpdateOne, ReplaceOne
+from database import application_collection, rollup_collection
+# Module import: counters calls record_events, so the two import each other
+from utils import counters
+
+# ==========================================
+# PERIOD ROLLUPS
+# ==========================================
+# Application events - submitted, completed, rejected, escalated - counted per
+# period (day / month / year), hierarchy node (the counter keys: "nation",
+# "ds_division:<name>", ...) and service type, one document per bucket in
+# `period_rollups`. apply_transitions records every event into its day, month
+# and year buckets as it happens, so a period report merges a handful of
+# buckets instead of counting applications.
+#
+# Events are stamped when they happen, so a period that has ended never
+# changes again: its buckets are cached in-process for good. Only the
+# current periods are read from Mongo on every report.
+
+EVENT_FIELDS = ("submitted", "completed", "rejected", "escalated")
+# Status an application moves to -> event counted
+STATUS_EVENTS = {"Completed": "completed", "Rejected": "rejected", "Escalated": "escalated"}
+
+CLOSED_CACHE_SIZE = int(os.getenv("ROLLUP_CACHE_SIZE", "10000"))  # (period, node) entries per process
+# Writes stamped just before midnight may still be in flight just after it
+CLOSE_GRACE = timedelta(minutes=5)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+# --- PERIODS ---
+
+def period_ids(moment: datetime) -> list:
+    """The day, month and year buckets `moment` falls in, e.g. ["day:2025-01-03", "month:2025-01", "year:2025"]"""
+    return [f"day:{moment:%Y-%m-%d}", f"month:{moment:%Y-%m}", f"year:{moment:%Y}"]
+
+
+def period_bounds(period: str):
+    """(start, end) of a period id; end is exclusive"""
+    granularity, value = period.split(":", 1)
+    if granularity == "day":
+        start = datetime.strptime(value, "%Y-%m-%d")
+        return start, start + timedelta(days=1)
+    if granularity == "month":
+        start = datetime.strptime(value, "%Y-%m")
+        return start, datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    start = datetime(int(value), 1, 1)
+    return start, datetime(start.year + 1, 1, 1)
+
+
+def is_closed(period: str, now: datetime = None) -> bool:
+    return period_bounds(period)[1] + CLOSE_GRACE <= (now or datetime.utcnow())
+
+
+def report_periods(report_type: str, year: int, month: int = None, day: int = None):
+    """
+    (label, [period ids]) a report covers: Daily -> one day bucket, Monthly -> one
+    month bucket, Quarterly -> the three month buckets of the quarter containing
+    `month`, Annual -> one year bucket. Raises ValueError for incomplete requests.
+    """
+    kind = report_type.lower()
+    if kind == "annual":
+        return f"{year}", [f"year:{year}"]
+    if not month or not 1 <= month <= 12:
+        raise ValueError(f"A month (1-12) is required for {report_type} reports")
+    if kind == "monthly":
+        return f"{year}-{month:02d}", [f"month:{year}-{month:02d}"]
+    if kind == "quarterly":
+        quarter = (month - 1) // 3 + 1
+        return f"{year}-Q{quarter}", [f"month:{year}-{m:02d}" for m in range(quarter * 3 - 2, quarter * 3 + 1)]
+    if kind == "daily":
+        if not day:
+            raise ValueError("A day is required for Daily reports")
+        moment = datetime(year, month, day)  # ValueError for a day the month does not have
+        return f"{moment:%Y-%m-%d}", [f"day:{moment:%Y-%m-%d}"]
+    raise ValueError("report_type must be Daily, Monthly, Quarterly or Annual")
+
+
+# --- RECORDING ---
+
+def transition_event(old_status, new_status):
+    """Event a status change counts as, or None (deletions and no-op updates count nothing)"""
+    if old_status is None and new_status is not None:
+        return "submitted"
+    if new_status != old_status:
+        return STATUS_EVENTS.get(new_status)
+    return None
+
+
+def bucket_key(period: str, node: str, service_type) -> str:
+    return f"{period}|{node}|{service_type or ''}"
+
+
+def _bucket_fields(period: str, node: str, service_type) -> dict:
+    granularity = period.split(":", 1)[0]
+    return {
+        "period": period,
+        "granularity": granularity,
+        "start": period_bounds(period)[0],
+        "node": node,
+        "service_type": service_type,
+    }
+
+
+async def record_events(events: list):
+    """Count [(application, event)] in their current day / month / year buckets, in one bulk_write"""
+    increments = defaultdict(lambda: defaultdict(int))
+    fields = {}
+    periods = period_ids(datetime.utcnow())
+    for application, event in events:
+        service_type = application.get("service_type")
+        for node, _, _, _ in counters.counter_nodes(application):
+            for period in periods:
+                key = bucket_key(period, node, service_type)
+                fields[key] = (period, node, service_type)
+                increments[key][event] += 1
+
+    requests = [
+        UpdateOne({"_id": key}, {"$inc": dict(inc), "$setOnInsert": _bucket_fields(*fields[key])}, upsert=True)
+        for key, inc in increments.items()
+    ]
+    if requests:
+        await rollup_collection.bulk_write(requests, ordered=False)
+
+
+# --- READING ---
+
+_closed = OrderedDict()  # (period, node) -> {service_type: counts}
+
+
+def _as_counts(document) -> dict:
+    return {field: document.get(field, 0) for field in EVENT_FIELDS}
+
+
+async def period_counts(node: str, periods: list) -> dict:
+    """{period: {service_type: counts}} for one node; at most one query, none when every period is closed and cached"""
+    result, missing = {}, []
+    for period in periods:
+        if (period, node) in _closed:
+            _closed.move_to_end((period, node))
+            result[period] = _closed[(period, node)]
+        else:
+            missing.append(period)
+
+    if missing:
+        fetched = {period: {} for period in missing}
+        async for bucket in rollup_collection.find({"node": node, "period": {"$in": missing}}):
+            fetched[bucket["period"]][bucket.get("service_type")] = _as_counts(bucket)
+        now = datetime.utcnow()
+        for period, services in fetched.items():
+            result[period] = services
+            if is_closed(period, now):
+                _closed[(period, node)] = services
+                if len(_closed) > CLOSED_CACHE_SIZE:
+                    _closed.popitem(last=False)
+    return result
+
+
+async def merged_counts(node: str, periods: list) -> dict:
+    """{"totals": counts, "by_service": {service_type: counts}} over several periods"""
+    totals = dict.fromkeys(EVENT_FIELDS, 0)
+    by_service = defaultdict(lambda: dict.fromkeys(EVENT_FIELDS, 0))
+    for services in (await period_counts(node, periods)).values():
+        for service_type, counts in services.items():
+            for field, value in counts.items():
+                totals[field] += value
+                by_service[service_type][field] += value
+    return {"totals": totals, "by_service": dict(by_service)}
+
+
+# ==========================================
+# BACKFILL
+# ==========================================
+# Only the current status of older applications is known, so each is counted
+# as submitted (at created_at) plus one event for its current status, dated by
+# completed_at or its last approval-chain entry.
+
+async def rebuild_rollups() -> int:
+    """Recompute every bucket from the applications collection; returns the bucket count"""
+    pipeline = [
+        {"$project": {
+            "service_type": 1,
+            **{level: 1 for level in counters.LEVELS},
+            "events": {"$concatArrays": [
+                [{"event": "submitted", "at": "$created_at"}],
+                {"$cond": [
+                    {"$in": ["$status", list(STATUS_EVENTS)]},
+                    [{
+                        "event": {"$switch": {
+                            "branches": [{"case": {"$eq": ["$status", status]}, "then": event} for status, event in STATUS_EVENTS.items()],
+                            "default": None,
+                        }},
+                        "at": {"$ifNull": [
+                            "$completed_at",
+                            {"$dateFromString": {
+                                "dateString": {"$arrayElemAt": ["$approval_chain.timestamp", -1]},
+                                "onError": None,
+                                "onNull": None,
+                            }},
+                            "$created_at",
+                        ]},
+                    }],
+                    [],
+                ]},
+            ]},
+        }},
+        {"$unwind": "$events"},
+        {"$match": {"events.at": {"$type": "date"}}},
+        {"$group": {
+            "_id": {
+                "day": {"$dateTrunc": {"unit": "day", "date": "$events.at"}},
+                "event": "$events.event",
+                "service_type": "$service_type",
+                **{level: f"${level}" for level in counters.LEVELS},
+            },
+            "count": {"$sum": 1},
+        }},
+    ]
+    buckets = defaultdict(lambda: dict.fromkeys(EVENT_FIELDS, 0))
+    fields = {}
+    async for group in application_collection.aggregate(pipeline, allowDiskUse=True):
+        location = group["_id"]
+        service_type = location.get("service_type")
+        for node, _, _, _ in counters.counter_nodes(location):
+            for period in period_ids(location["day"]):
+                key = bucket_key(period, node, service_type)
+                fields[key] = (period, node, service_type)
+                buckets[key][location["event"]] += group["count"]
+
+    operations = []
+    for key, counts in buckets.items():
+        operations.append(ReplaceOne({"_id": key}, {**_bucket_fields(*fields[key]), **counts}, upsert=True))
+        if len(operations) == BACKFILL_BATCH_SIZE:
+            await rollup_collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        await rollup_collection.bulk_write(operations, ordered=False)
+
+    # Buckets with no events left
+    stale = [bucket["_id"] async for bucket in rollup_collection.find({}, {"_id": 1}) if bucket["_id"] not in buckets]
+    for i in range(0, len(stale), BACKFILL_BATCH_SIZE):
+        await rollup_collection.delete_many({"_id": {"$in": stale[i:i + BACKFILL_BATCH_SIZE]}})
+    _closed.clear()
+    return len(buckets)
+
+
+if __name__ == "__main__":
+    async def main():
+        located = await counters.backfill_locations()
+        if located:
+            print(f"✅ location set on {located} older applications")
+        print("🔄 Rebuilding period rollups from applications...")
+        print(f"✅ {await rebuild_rollups()} period buckets rebuilt")
+
+    asyncio.run(main())
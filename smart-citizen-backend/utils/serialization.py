@@ -0,0 +1,162 @@
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+import orjson
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware, IdentityResponder
+
+try:
+    import msgpack  # optional: MessagePack bodies for the mobile client
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli  # optional: Content-Encoding: br
+except ImportError:
+    brotli = None
+
+# ==========================================
+# RESPONSE SERIALIZATION
+# ==========================================
+# FastJSONResponse is the app's default response class: orjson encodes
+# ObjectId, datetime and Decimal128 natively, so routes hand Mongo documents
+# over as they come out of the cursor. respond() also skips FastAPI's
+# jsonable_encoder pass and answers `Accept: application/msgpack` with
+# MessagePack when msgpack is installed. CompressionMiddleware gzips (or
+# brotli-encodes) bodies of at least COMPRESS_MIN_BYTES.
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# Certificates are already compressed and served with Range support
+EXCLUDED_CONTENT_TYPES = DEFAULT_EXCLUDED_CONTENT_TYPES + ("application/pdf",)
+
+
+def _default(value):
+    """Types orjson does not encode by itself"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _msgpack_default(value):
+    # Same wire values as the JSON body, so clients can switch formats freely
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return _default(value)
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default, use_bin_type=True)
+
+
+def _quality(accept: str, media_types) -> float:
+    """Highest q the Accept header gives any of `media_types` (exact match only)"""
+    best = 0.0
+    for part in accept.split(","):
+        media_type, _, params = part.partition(";")
+        if media_type.strip().lower() not in media_types:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        best = max(best, q)
+    return best
+
+
+def wants_msgpack(request: Request) -> bool:
+    """True if the client explicitly prefers MessagePack to JSON"""
+    if msgpack is None:
+        return False
+    accept = request.headers.get("accept", "")
+    msgpack_q = _quality(accept, MSGPACK_TYPES)
+    return msgpack_q > 0 and msgpack_q >= _quality(accept, ("application/json",))
+
+
+def respond(request: Request, content, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """Serialize `content` in the negotiated format, bypassing jsonable_encoder"""
+    response_class = MsgPackResponse if wants_msgpack(request) else FastJSONResponse
+    response = response_class(content, status_code=status_code, headers=headers)
+    if msgpack is not None:
+        response.headers.append("Vary", "Accept")
+    return response
+
+
+# ==========================================
+# COMPRESSION
+# ==========================================
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware that prefers brotli when it is installed and the client accepts it"""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES, compresslevel: int = GZIP_LEVEL,
+                 brotli_quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=compresslevel,
+                         exclude_content_types=EXCLUDED_CONTENT_TYPES)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and brotli is not None and _accepts_brotli(scope):
+            responder = BrotliResponder(
+                self.app, self.minimum_size, self.brotli_quality,
+                exclude_content_types=self.exclude_content_types,
+            )
+            await responder(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+def _accepts_brotli(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"accept-encoding":
+            return _quality(value.decode("latin-1"), ("br",)) > 0
+    return False
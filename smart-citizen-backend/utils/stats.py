@@ -0,0 +1,171 @@
+import asyncio
+from database import application_collection, user_collection, land_collection
+from utils.counters import get_counters, node_key, NATION
+from utils.user_cache import get_user
+from utils import hierarchy
+
+# ==========================================
+# STATS QUERY ENGINE
+# ==========================================
+# Application counts are read from the hierarchical counters (utils/counters.py);
+# other collections are counted with one $facet aggregation each. Below the
+# nation, user counts come from the in-memory org tree (utils/hierarchy.py).
+# Endpoints that need several collections run them concurrently with asyncio.gather.
+
+# Mongo round trips each stats endpoint is allowed (enforced by test_stats_budget.py)
+ROUND_TRIP_BUDGETS = {
+    "gs_stats": 3,            # officer scope, then counters + land_disputes concurrent (users from the org tree)
+    "ds_stats": 2,            # officer scope + counters
+    "workflow_analytics": 2,  # officer scope + counters
+    "system_stats": 2,        # counters + users, concurrent
+    "generate_report": 2,     # officer scope + period rollups (none for cached past periods)
+    "performance_metrics": 1, # one $group on applications (GS officers come from the org tree)
+    "revenue_stats": 1,       # one $facet over the daily revenue buckets
+    "regional_reports": 1,    # one $group on applications per REGIONAL_REPORT_TTL (sections from the org tree)
+}
+
+
+async def facet_counts(collection, facets: dict, match: dict = None) -> dict:
+    """
+    Count documents per distinct value of several fields in a single aggregation.
+    `facets` maps a result name to the field to group on, e.g. {"status": "$status"}.
+    Returns {"total": n, name: {value: count, ...}, ...}.
+    """
+    facet_stages = {
+        name: [{"$group": {"_id": field, "count": {"$sum": 1}}}]
+        for name, field in facets.items()
+    }
+    facet_stages["total"] = [{"$count": "count"}]
+
+    pipeline = [{"$match": match}] if match else []
+    pipeline.append({"$facet": facet_stages})
+
+    rows = await collection.aggregate(pipeline).to_list(length=1)
+    row = rows[0] if rows else {}
+
+    counts = {"total": row["total"][0]["count"] if row.get("total") else 0}
+    for name in facets:
+        counts[name] = {group["_id"]: group["count"] for group in row.get(name, [])}
+    return counts
+
+
+async def scope_key(current_user: dict) -> str:
+    """Counter node an officer's dashboard covers: their GS section / DS division, or the nation"""
+    level = {"gs": "gs_section", "ds": "ds_division"}.get(current_user["role"])
+    if level is None:
+        return NATION
+    # A full principal already carries its hierarchy; bare token claims go through the user cache
+    officer = current_user if level in current_user else await get_user(current_user["nic"])
+    if not officer or not officer.get(level):
+        return NATION
+    return node_key(level, officer[level])
+
+
+# --- PER-COLLECTION COUNTS (one round trip each) ---
+
+async def application_counts(key: str = NATION) -> dict:
+    """{"total", "pending", "completed", "rejected", "escalated", "revenue"} for one hierarchy node"""
+    return await get_counters(key)
+
+
+async def user_counts(key: str = NATION) -> dict:
+    """{"total", "citizens", "gs", "ds", "admins"} for one hierarchy node (no round trip below the nation)"""
+    if key != NATION:
+        node = await hierarchy.subtree(key, depth=0)
+        counts = node["counts"] if node else {}
+        by_role = {role: counts.get(field, 0) for role, field in hierarchy.COUNT_FIELDS.items()}
+        return {
+            "total": sum(by_role.values()),
+            "citizens": by_role["citizen"],
+            "gs": by_role["gs"],
+            "ds": by_role["ds"],
+            "admins": by_role["admin"],
+        }
+    counts = await facet_counts(user_collection, {"role": "$role"})
+    by_role = counts["role"]
+    return {
+        "total": counts["total"],
+        "citizens": by_role.get("citizen", 0),
+        "gs": by_role.get("gs", 0),
+        "ds": by_role.get("ds", 0),
+        "admins": by_role.get("admin", 0),
+    }
+
+
+async def dispute_counts(key: str = NATION) -> dict:
+    """{"total", "open", "resolved"} over the land disputes registered in one hierarchy node"""
+    match = None
+    if key != NATION:
+        level, name = key.split(":", 1)
+        match = {level: name}
+    counts = await facet_counts(land_collection, {"status": "$status"}, match)
+    by_status = counts["status"]
+    return {
+        "total": counts["total"],
+        "open": by_status.get("Active", 0),
+        "resolved": by_status.get("Resolved", 0),
+    }
+
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+
+async def gs_performance(gs_nics: list) -> dict:
+    """
+    Per-GS totals and processing times in one $group keyed by assigned_gs.
+    Returns {gs_nic: {"total", "approved", "rejected", "avg_processing_days", "max_processing_days"}};
+    processing days are None for officers with no completed applications.
+    """
+    pipeline = [
+        {"$match": {"assigned_gs": {"$in": gs_nics}}},
+        {"$project": {
+            "assigned_gs": 1,
+            "status": 1,
+            # Milliseconds from submission to completion. Older documents have no
+            # completed_at, so fall back to the last approval_chain timestamp.
+            "processing_ms": {"$cond": [
+                {"$eq": ["$status", "Completed"]},
+                {"$subtract": [
+                    {"$ifNull": ["$completed_at", {"$dateFromString": {
+                        "dateString": {"$arrayElemAt": ["$approval_chain.timestamp", -1]},
+                        "onError": None,
+                        "onNull": None,
+                    }}]},
+                    "$created_at",
+                ]},
+                None,
+            ]},
+        }},
+        {"$group": {
+            "_id": "$assigned_gs",
+            "total": {"$sum": 1},
+            "approved": {"$sum": {"$cond": [{"$eq": ["$status", "Completed"]}, 1, 0]}},
+            "rejected": {"$sum": {"$cond": [{"$eq": ["$status", "Rejected"]}, 1, 0]}},
+            "avg_processing_ms": {"$avg": "$processing_ms"},
+            "max_processing_ms": {"$max": "$processing_ms"},
+        }},
+    ]
+
+    performance = {}
+    async for group in application_collection.aggregate(pipeline):
+        avg_ms, max_ms = group.get("avg_processing_ms"), group.get("max_processing_ms")
+        performance[group["_id"]] = {
+            "total": group["total"],
+            "approved": group["approved"],
+            "rejected": group["rejected"],
+            "avg_processing_days": avg_ms / MS_PER_DAY if avg_ms is not None else None,
+            "max_processing_days": max_ms / MS_PER_DAY if max_ms is not None else None,
+        }
+    return performance
+
+
+# --- ENDPOINT BUNDLES ---
+
+async def gs_dashboard_counts(key: str = NATION):
+    """(applications, users, disputes) of one hierarchy node, fetched concurrently - 2 round trips (3 for the nation)"""
+    return await asyncio.gather(application_counts(key), user_counts(key), dispute_counts(key))
+
+
+async def system_counts():
+    """(applications, users) fetched concurrently - 2 round trips"""
+    return await asyncio.gather(application_counts(), user_counts())
@@ -0,0 +1,53 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from database import user_collection
+
+# ==========================================
+# USER CACHE
+# ==========================================
+# In-process TTL + LRU cache of user documents (without the password hash), keyed
+# by NIC. Routes that write to `users` call invalidate_user(); the TTL bounds how
+# stale another app process can be.
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))  # seconds
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+_users = OrderedDict()  # nic -> (expires_at, user)
+_metrics = {"hits": 0, "misses": 0}
+
+
+async def get_user(nic: str) -> Optional[dict]:
+    """The user's document (copy, no password), or None if there is no such user"""
+    now = time.monotonic()
+    entry = _users.get(nic)
+    if entry and entry[0] > now:
+        _users.move_to_end(nic)
+        _metrics["hits"] += 1
+        return dict(entry[1])
+
+    _metrics["misses"] += 1
+    user = await user_collection.find_one({"nic": nic}, {"password": 0})
+    if user is None:
+        _users.pop(nic, None)
+        return None
+
+    _users[nic] = (now + USER_CACHE_TTL, user)
+    _users.move_to_end(nic)
+    if len(_users) > USER_CACHE_SIZE:
+        _users.popitem(last=False)
+    return dict(user)
+
+
+def invalidate_user(*nics: str):
+    for nic in nics:
+        _users.pop(nic, None)
+
+
+def clear_user_cache():
+    _users.clear()
+
+
+def user_cache_metrics() -> dict:
+    return {"size": len(_users), "ttl_seconds": USER_CACHE_TTL, **_metrics}
@@ -0,0 +1,79 @@
+from datetime import datetime
+from typing import Optional
+
+# ==========================================
+# MULTI-LEVEL APPROVAL WORKFLOW
+# ==========================================
+
+# Stages each approval level passes through, in order, before "completed"
+APPROVAL_STAGES = {
+    "gs_only": ["gs"],
+    "gs_ds": ["gs", "ds"],
+    "gs_ds_district": ["gs", "ds", "district"],
+    "gs_ds_district_ministry": ["gs", "ds", "district", "ministry"],
+}
+
+# Roles (besides admin) allowed to act at a stage; stages not listed are open to any officer
+STAGE_ROLES = {
+    "gs": "gs",
+    "ds": "ds",
+}
+
+
+def stage_permission_error(stage: str, role: str) -> Optional[str]:
+    """Reason the role may not act at this stage, or None if it may"""
+    required = STAGE_ROLES.get(stage)
+    if required and role not in {required, "admin"}:
+        return f"Only {required.upper()} can approve at this stage"
+    return None
+
+
+def next_stage(approval_level: str, current_stage: str):
+    """(next_stage, status) after approving at current_stage; ValueError if the level or stage is unknown"""
+    stages = APPROVAL_STAGES.get(approval_level)
+    if not stages:
+        raise ValueError(f"Unknown approval level {approval_level!r}")
+    if current_stage not in stages:
+        raise ValueError(f"No approval is pending at stage {current_stage!r} of {approval_level!r}")
+    position = stages.index(current_stage)
+    if position == len(stages) - 1:
+        return "completed", "Completed"
+    return stages[position + 1], "Pending"
+
+
+def chain_entry(stage: str, actor_nic: str, action: str, comments: str = "", **extra) -> dict:
+    entry = {
+        "level": stage,
+        "nic": actor_nic,
+        "action": action,
+        "timestamp": datetime.utcnow().isoformat(),
+        "comments": comments,
+    }
+    entry.update(extra)
+    return entry
+
+
+def approval_update(application: dict, actor_nic: str, comments: str = "", **entry_extra):
+    """
+    Work out an approval at the application's current stage.
+    Returns (filter, update, next_stage, status) - the filter only matches while the
+    application is still at the stage we read, so concurrent approvals cannot both apply.
+    Raises ValueError if the application is at no stage of its approval level.
+    """
+    stage = application.get("current_approval_stage", "gs")
+    upcoming, status = next_stage(application.get("approval_level", "gs_ds"), stage)
+
+    update_set = {"current_approval_stage": upcoming, "status": status}
+    if status == "Completed":
+        update_set["completed_at"] = datetime.utcnow()
+
+    query = {
+        "_id": application["_id"],
+        "status": application.get("status"),
+        "current_approval_stage": application.get("current_approval_stage"),
+    }
+    update = {
+        "$set": update_set,
+        "$push": {"approval_chain": chain_entry(stage, actor_nic, "Approved", comments, **entry_extra)},
+    }
+    return query, update, upcoming, status
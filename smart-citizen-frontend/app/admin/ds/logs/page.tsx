@@ -8,6 +8,8 @@ export default function DSLogsPage() {
   const [logs, setLogs] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchLogs();
@@ -16,8 +18,9 @@ export default function DSLogsPage() {
   const fetchLogs = async () => {
     try {
       setError('');
-      const data = await getAuditLogs();
-      setLogs(Array.isArray(data) ? data : []);
+      const page = await getAuditLogs();
+      setLogs(page.items);
+      setNextCursor(page.next_cursor);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load logs');
     } finally {
@@ -25,6 +28,21 @@ export default function DSLogsPage() {
     }
   };
 
+  // Older entries, one page at a time (newest first)
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await getAuditLogs(nextCursor);
+      setLogs((current) => [...current, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      setError(err.message || 'Failed to load audit logs');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) return <div className="flex justify-center py-8"><Loader2 className="animate-spin" size={32} /></div>;
   if (error) return <div className="bg-red-50 border border-red-200 text-red-700 px-4 py-3 rounded-lg flex items-center gap-2"><AlertCircle size={16} /> {error}</div>;
 
@@ -71,6 +89,13 @@ export default function DSLogsPage() {
           </table>
         </div>
       )}
+      {nextCursor && (
+        <div className="mt-4 text-center">
+          <button onClick={loadMore} disabled={loadingMore} className="px-4 py-2 text-sm font-semibold text-blue-700 bg-blue-50 rounded-lg hover:bg-blue-100 disabled:opacity-50">
+            {loadingMore ? 'Loading...' : 'Load older entries'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
@@ -15,10 +15,10 @@ export default function DSRegionalPage() {
 			try {
 				setError('');
 				const divsData = await getAllDivisions();
-				const logsData = await getAuditLogs();
+				const logsPage = await getAuditLogs(null, 5);
 				
 				setDivisions(Array.isArray(divsData) ? divsData : divsData.divisions || []);
-				setIncidents(Array.isArray(logsData) ? logsData.slice(0, 5) : logsData.logs?.slice(0, 5) || []);
+				setIncidents(logsPage.items);
 			} catch (err: any) {
 				setError(err.message || 'Failed to load regional data');
 			} finally {
@@ -8,13 +8,16 @@ export default function AuditPage() {
   const [logs, setLogs] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     async function loadLogs() {
       try {
         setError('');
-        const data = await getAuditLogs();
-        setLogs(Array.isArray(data) ? data : data.logs || []);
+        const page = await getAuditLogs();
+        setLogs(page.items);
+        setNextCursor(page.next_cursor);
       } catch (err: any) {
         setError(err.message || 'Failed to load audit logs');
         setLogs([]);
@@ -25,6 +28,21 @@ export default function AuditPage() {
     loadLogs();
   }, []);
 
+  // Older entries, one page at a time (newest first)
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await getAuditLogs(nextCursor);
+      setLogs((current) => [...current, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      setError(err.message || 'Failed to load audit logs');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) return (
     <div className="flex items-center justify-center h-64">
       <Loader2 className="animate-spin text-blue-600" size={32} />
@@ -80,6 +98,13 @@ export default function AuditPage() {
           </tbody>
         </table>
       </div>
+      {nextCursor && (
+        <div className="mt-4 text-center">
+          <button onClick={loadMore} disabled={loadingMore} className="px-4 py-2 text-sm font-semibold text-blue-700 bg-blue-50 rounded-lg hover:bg-blue-100 disabled:opacity-50">
+            {loadingMore ? 'Loading...' : 'Load older entries'}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
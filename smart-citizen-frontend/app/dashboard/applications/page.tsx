@@ -86,6 +86,15 @@ export default function ApplicationsPage() {
     }
   };
 
+  // 2b. Handle Download (signed link, served as an attachment)
+  const handleDownload = async (id: string) => {
+    try {
+      window.location.assign(await getDownloadUrl(id));
+    } catch (err) {
+      alert("Certificate is not ready yet. Please try again shortly.");
+    }
+  };
+
   // 3. Helper: Copy ID
   const copyToClipboard = (text: string) => {
     navigator.clipboard.writeText(text);
@@ -217,15 +226,13 @@ export default function ApplicationsPage() {
                                         
                                         {/* Download (Only if Completed) */}
                                         {app.status === 'Completed' && (
-                                            <a 
-                                                href={getDownloadUrl(app._id)} 
-                                                target="_blank" 
-                                                rel="noopener noreferrer"
+                                            <button 
+                                                onClick={() => handleDownload(app._id)}
                                                 className="p-2 text-green-600 hover:text-green-800 hover:bg-green-50 rounded-lg transition"
                                                 title="Download Certificate"
                                             >
                                                 <Download size={18}/>
-                                            </a>
+                                            </button>
                                         )}
                                     </div>
                                 </td>
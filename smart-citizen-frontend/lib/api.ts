@@ -67,14 +67,20 @@ export const getAuthHeader = (): Record<string, string> => {
 };
 
 // ==========================================
-// 3. CITIZEN SERVICES (Protected)
+// 2b. HELPER: Keyset Pagination
 // ==========================================
+// List endpoints return { items, next_cursor }; pass next_cursor back to get the following page.
+export type Page<T = any> = { items: T[]; next_cursor: string | null };
 
-export const submitApplication = async (data: any) => {
-  const response = await fetch(`${API_URL}/api/applications/`, {
-    method: "POST",
+export const fetchPage = async <T = any>(path: string, cursor?: string | null, limit?: number): Promise<Page<T>> => {
+  const params = new URLSearchParams();
+  if (cursor) params.set("cursor", cursor);
+  if (limit) params.set("limit", String(limit));
+  const query = params.toString();
+
+  const response = await fetch(`${API_URL}${path}${query ? `?${query}` : ""}`, {
+    method: "GET",
     headers: getAuthHeader(),
-    body: JSON.stringify(data),
   });
 
   const resData = await response.json();
@@ -82,25 +88,30 @@ export const submitApplication = async (data: any) => {
   return resData;
 };
 
-export const getMyApplications = async () => {
-  const response = await fetch(`${API_URL}/api/applications/my-apps`, {
-    method: "GET",
-    headers: getAuthHeader(),
-  });
+// Largest page the backend serves (page_params limit bound)
+const MAX_PAGE_SIZE = 200;
 
-  const resData = await response.json();
-  if (!response.ok) throw new Error(getErrorMessage(resData));
-  return resData;
+// Follows next_cursor to the last page, for screens that list or count everything
+export const fetchAll = async <T = any>(path: string): Promise<T[]> => {
+  const items: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const page: Page<T> = await fetchPage<T>(path, cursor, MAX_PAGE_SIZE);
+    items.push(...page.items);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return items;
 };
 
 // ==========================================
-// 4. ADMIN SERVICES (Protected)
+// 3. CITIZEN SERVICES (Protected)
 // ==========================================
 
-export const getPendingApplications = async () => {
-  const response = await fetch(`${API_URL}/api/applications/pending`, {
-    method: "GET",
+export const submitApplication = async (data: any) => {
+  const response = await fetch(`${API_URL}/api/applications/`, {
+    method: "POST",
     headers: getAuthHeader(),
+    body: JSON.stringify(data),
   });
 
   const resData = await response.json();
@@ -108,6 +119,14 @@ export const getPendingApplications = async () => {
   return resData;
 };
 
+export const getMyApplications = async () => fetchAll(`/api/applications/my-apps`);
+
+// ==========================================
+// 4. ADMIN SERVICES (Protected)
+// ==========================================
+
+export const getPendingApplications = async () => fetchAll(`/api/applications/pending`);
+
 export const updateApplicationStatus = async (id: string, status: string) => {
   const response = await fetch(`${API_URL}/api/applications/${id}/status`, {
     method: "PUT",
@@ -124,16 +143,7 @@ export const updateApplicationStatus = async (id: string, status: string) => {
 // 5. MARKETPLACE API
 // ==========================================
 
-export const getAllProducts = async () => {
-  const response = await fetch(`${API_URL}/api/products/`, {
-    method: "GET",
-    headers: { "Content-Type": "application/json" },
-  });
-
-  const resData = await response.json();
-  if (!response.ok) throw new Error(getErrorMessage(resData));
-  return resData;
-};
+export const getAllProducts = async () => fetchAll(`/api/products/`);
 
 export const addProduct = async (productData: any) => {
   const response = await fetch(`${API_URL}/api/products/`, {
@@ -206,25 +216,9 @@ export const getGSStats = async () => {
   return resData;
 };
 
-export const getVillagers = async () => {
-  const response = await fetch(`${API_URL}/api/gs/villagers`, {
-    method: "GET",
-    headers: getAuthHeader(),
-  });
-  const resData = await response.json();
-  if (!response.ok) throw new Error(getErrorMessage(resData));
-  return resData;
-};
+export const getVillagers = async () => fetchAll(`/api/gs/villagers`);
 
-export const getLandDisputes = async () => {
-  const response = await fetch(`${API_URL}/api/gs/land`, {
-    method: "GET",
-    headers: getAuthHeader(),
-  });
-  const resData = await response.json();
-  if (!response.ok) throw new Error(getErrorMessage(resData));
-  return resData;
-};
+export const getLandDisputes = async () => fetchAll(`/api/gs/land`);
 
 export const getGSApplications = async () => {
   const response = await fetch(`${API_URL}/api/gs/applications`, {
@@ -339,25 +333,9 @@ export const getDSStats = async () => {
   return resData;
 };
 
-export const getDSQueue = async () => {
-  const response = await fetch(`${API_URL}/api/ds/queue`, {
-    method: "GET",
-    headers: getAuthHeader(),
-  });
-  const resData = await response.json();
-  if (!response.ok) throw new Error(getErrorMessage(resData));
-  return resData;
-};
+export const getDSQueue = async () => fetchAll(`/api/ds/queue`);
 
-export const getDSCertificates = async () => {
-  const response = await fetch(`${API_URL}/api/ds/certificates`, {
-    method: "GET",
-    headers: getAuthHeader(),
-  });
-  const resData = await response.json();
-  if (!response.ok) throw new Error(getErrorMessage(resData));
-  return resData;
-};
+export const getDSCertificates = async () => fetchAll(`/api/ds/certificates`);
 
 // use getGSOfficers/addGSOfficer below for DS GS management
 
@@ -365,13 +343,7 @@ export const getDSCertificates = async () => {
 // 9. SUPER ADMIN API
 // ==========================================
 
-export const getAllOfficers = async () => {
-  const response = await fetch(`${API_URL}/api/admin/users`, {
-    method: "GET",
-    headers: getAuthHeader(),
-  });
-  return await response.json();
-};
+export const getAllOfficers = async () => fetchAll(`/api/admin/users`);
 
 export const deleteOfficer = async (id: string) => {
   const response = await fetch(`${API_URL}/api/admin/users/${id}`, {
@@ -494,9 +466,26 @@ export const addCitizen = async (data: {
   return result;
 };
 
-// Download Certificate URL Builder
-export const getDownloadUrl = (appId: string) => {
-  return `${API_URL}/api/applications/${appId}/download`;
+// Download Certificate: fetch a short-lived signed link (plain links can't send the auth header)
+export const getDownloadUrl = async (appId: string) => {
+  const response = await fetch(`${API_URL}/api/applications/${appId}/download-url`, {
+    method: "GET",
+    headers: getAuthHeader(),
+  });
+  const resData = await response.json();
+  if (!response.ok) throw new Error(getErrorMessage(resData));
+  return `${API_URL}${resData.url}`;
+};
+
+// Certificates render in the background after approval: "queued" | "rendering" | "ready" | "failed"
+export const getCertificateStatus = async (appId: string) => {
+  const response = await fetch(`${API_URL}/api/applications/${appId}/certificate-status`, {
+    method: "GET",
+    headers: getAuthHeader(),
+  });
+  const resData = await response.json();
+  if (!response.ok) throw new Error(getErrorMessage(resData));
+  return resData;
 };
 
 // Add this to your APPLICATION API section
@@ -605,15 +594,7 @@ export const getPerformanceMetrics = async () => {
 };
 
 // Complaints Management
-export const getComplaints = async () => {
-  const response = await fetch(`${API_URL}/api/ds/complaints`, {
-    method: "GET",
-    headers: getAuthHeader(),
-  });
-  const resData = await response.json();
-  if (!response.ok) throw new Error(getErrorMessage(resData));
-  return resData;
-};
+export const getComplaints = async () => fetchAll(`/api/ds/complaints`);
 
 export const createComplaint = async (complaintData: any) => {
   const response = await fetch(`${API_URL}/api/ds/complaints`, {
@@ -636,16 +617,10 @@ export const updateComplaintStatus = async (complaintId: string, status: string)
   return resData;
 };
 
-// Audit Logs
-export const getAuditLogs = async () => {
-  const response = await fetch(`${API_URL}/api/ds/audit-logs`, {
-    method: "GET",
-    headers: getAuthHeader(),
-  });
-  const resData = await response.json();
-  if (!response.ok) throw new Error(getErrorMessage(resData));
-  return resData;
-};
+// Audit Logs: one page, newest first - pass next_cursor back for older entries
+// (the backend also takes start/end/user_nic/action/application_id filters)
+export const getAuditLogs = async (cursor?: string | null, limit?: number) =>
+  fetchPage(`/api/ds/audit-logs`, cursor, limit);
 
 // Digital Signatures
 export const getSignatureTemplates = async () => {